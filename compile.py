@@ -9,49 +9,46 @@ def UTCTimestamp(datestring):
   dt_utc = dt.replace(tzinfo=timezone.utc)
   return int(dt_utc.timestamp())
 
+def loadMetadata(name):
+  with open("%s/metadata/%s.json" % (cwd, name)) as f:
+    metadata = json.load(f)
+  return sp.big_map(
+    {
+      "": sp.utils.bytes_of_string("tezos-storage:content"),
+      "content": sp.utils.bytes_of_string(json.dumps(metadata))
+    }
+  )
+
 cwd = os.getcwd()
 Store = sp.io.import_script_from_url("file://%s/contracts/store.py" % cwd)
 Controller = sp.io.import_script_from_url("file://%s/contracts/controller.py" % cwd)
 admin = sp.address(env['TEZID_ADMIN'])
 store = sp.address(env['TEZID_STORE'])
 
-TezIDStoreMetadata = {
-  "name": "TezID Store",
-  "description": "Datastore for TezID",
-  "version": "2.0.0",
-  "homepage": "https://tezid.net",
-  "authors": ["asbjornenge <asbjorn@tezid.net>"],
-  "interfaces": ["TZIP-016"]
-}
-TezIDControllerMetadata = {
-  "name": "TezID Controller",
-  "description": "Controller for TezID",
-  "version": "4.1.0",
-  "homepage": "https://tezid.net",
-  "authors": ["asbjornenge <asbjorn@tezid.net>"],
-  "interfaces": ["TZIP-016"]
-}
-
-sp.add_compilation_target("store", Store.TezIDStore(
-    sp.set([admin]), 
-    sp.big_map(),
-    sp.big_map(
-      {
-        "": sp.utils.bytes_of_string("tezos-storage:content"),
-        "content": sp.utils.bytes_of_string(json.dumps(TezIDStoreMetadata))
-      }
+# Comma separated subset of targets to compile, used by tools/build.py
+targets = [t for t in env.get('TEZID_TARGETS', 'store,controller').split(',') if t]
+
+# TEZID_LAZY=1 keeps the entrypoints in a big_map, loaded on demand
+lazy = env.get('TEZID_LAZY', '') not in ('', '0')
+
+def addCompilationTarget(name, contract):
+  if lazy:
+    contract.add_flag("lazy-entry-points")
+  sp.add_compilation_target(name, contract)
+
+if "store" in targets:
+  addCompilationTarget("store", Store.TezIDStore(
+      sp.set([admin]),
+      sp.big_map(),
+      sp.big_map(),
+      loadMetadata("store")
     )
   )
-)
-
-sp.add_compilation_target("controller", Controller.TezIDController(
-    admin, 
-    store, 
-    sp.big_map(
-      {
-        "": sp.utils.bytes_of_string("tezos-storage:content"),
-        "content": sp.utils.bytes_of_string(json.dumps(TezIDControllerMetadata))
-      }
+
+if "controller" in targets:
+  addCompilationTarget("controller", Controller.TezIDController(
+      admin,
+      store,
+      loadMetadata("controller")
     )
   )
-)
@@ -15,6 +15,8 @@ class TezIDController(sp.Contract):
       idstore = sp.TAddress,
       cost = sp.TMap(sp.TString, sp.TMutez),
       kycPlatforms = sp.TSet(sp.TString),
+      verifier = sp.TOption(sp.TKey),
+      nonces = sp.TBigMap(sp.TAddress, sp.TNat),
       metadata = sp.TBigMap(sp.TString, sp.TBytes)
     ))
     self.init(
@@ -22,6 +24,8 @@ class TezIDController(sp.Contract):
       idstore = idstore,
       cost = { 'default': sp.tez(5) },
       kycPlatforms = sp.set(),
+      verifier = sp.none,
+      nonces = sp.big_map(),
       metadata = metadata
     )
 
@@ -39,21 +43,27 @@ class TezIDController(sp.Contract):
       cost.value = self.data.cost[proofType]
     sp.verify(sp.amount >= cost.value, 'Amount too low')
 
-  def checkProofExistence(self, proofs, proofType):
-    sp.verify(proofs.contains(proofType), 'Missing required proof for this entrypoint')
-
   def checkSupportedKycPlatform(self, platform):
     sp.verify(self.data.kycPlatforms.contains(platform), 'KYC platform not supported')
 
-  def getOrCreateProof(self, proofs, proofType):
-    localProof = sp.local('localProof', sp.record(
-      register_date = sp.now,
-      verified = False,
-      meta = sp.map()
-    ))
-    sp.if proofs.contains(proofType):
-      localProof.value =  proofs[proofType]
-    return localProof.value
+  def proofPatch(self, address, proofType, create = False, register_date = sp.none, verified = sp.none, meta = None):
+    return sp.record(
+      address = address,
+      prooftype = proofType,
+      create = create,
+      register_date = register_date,
+      verified = verified,
+      meta = meta if meta is not None else sp.map(tkey = sp.TString, tvalue = sp.TOption(sp.TString))
+    )
+
+  def metaPatch(self, key, value):
+    meta = sp.local('meta', sp.map(tkey = sp.TString, tvalue = sp.TOption(sp.TString)))
+    meta.value[key] = sp.some(value)
+    return meta.value
+
+  def sendPatches(self, patches):
+    c = sp.contract(Types.TProofPatches, self.data.idstore, entry_point="patchProofs").open_some()
+    sp.transfer(patches, sp.mutez(0), c)
 
   ## Default 
   #
@@ -105,38 +115,44 @@ class TezIDController(sp.Contract):
     self.checkAdmin()
     self.data.kycPlatforms = kycPlatforms
 
+  @sp.entry_point
+  def setVerifier(self, verifier):
+    self.checkAdmin()
+    sp.set_type(verifier, sp.TOption(sp.TKey))
+    self.data.verifier = verifier
+
   ## User Proof Functions
   #
 
   @sp.entry_point
   def registerProof(self, proofType):
     self.checkCost(proofType)
-    proofs = sp.view('getProofsForAddress', self.data.idstore, sp.sender, t = Types.TProofs).open_some('Invalid view')
-    proof = self.getOrCreateProof(proofs, proofType)
-    proof.verified = False
-    proof.register_date = sp.now
-    c = sp.contract(Types.TSetProofPayload, self.data.idstore, entry_point="setProof").open_some()
-    sp.transfer(sp.record(address=sp.sender, prooftype=proofType, proof=proof), sp.mutez(0), c)
+    self.sendPatches([self.proofPatch(sp.sender, proofType, create = True, register_date = sp.some(sp.now), verified = sp.some(False))])
+
+  @sp.entry_point
+  def attestProof(self, params):
+    sp.set_type(params, Types.TAttestProofPayload)
+    attestation = params.attestation
+    self.checkCost(attestation.prooftype)
+    verifier = self.data.verifier.open_some('No verifier')
+    sp.verify(sp.now <= attestation.expiry, 'Attestation expired')
+    sp.verify(attestation.nonce == self.data.nonces.get(attestation.address, 0), 'Invalid nonce')
+    payload = sp.pack(sp.record(attestation = attestation, chain_id = sp.chain_id, controller = sp.self_address))
+    sp.verify(sp.check_signature(verifier, params.signature, payload), 'Invalid signature')
+    self.data.nonces[attestation.address] = attestation.nonce + 1
+    meta = sp.local('meta', sp.map(tkey = sp.TString, tvalue = sp.TOption(sp.TString)))
+    sp.for item in attestation.meta.items():
+      meta.value[item.key] = sp.some(item.value)
+    self.sendPatches([self.proofPatch(attestation.address, attestation.prooftype, create = True, register_date = sp.some(sp.now), verified = sp.some(attestation.verified), meta = meta.value)])
 
   @sp.entry_point
   def enableKYC(self):
-    proofs = sp.view('getProofsForAddress', self.data.idstore, sp.sender, t = Types.TProofs).open_some('Invalid view')
-    self.checkProofExistence(proofs, 'gov')
-    proof = self.getOrCreateProof(proofs, 'gov') 
-    proof.meta['kyc'] = 'true'
-    proof.verified = False
-    c = sp.contract(Types.TSetProofPayload, self.data.idstore, entry_point="setProof").open_some()
-    sp.transfer(sp.record(address=sp.sender, prooftype='gov', proof=proof), sp.mutez(0), c)
+    self.sendPatches([self.proofPatch(sp.sender, 'gov', verified = sp.some(False), meta = self.metaPatch('kyc', 'true'))])
 
   @sp.entry_point
   def enableKYCPlatform(self, platform):
     self.checkSupportedKycPlatform(platform)
-    proofs = sp.view('getProofsForAddress', self.data.idstore, sp.sender, t = Types.TProofs).open_some('Invalid view')
-    self.checkProofExistence(proofs, 'gov')
-    proof = self.getOrCreateProof(proofs, 'gov') 
-    proof.meta[platform] = "true"
-    c = sp.contract(Types.TSetProofPayload, self.data.idstore, entry_point="setProof").open_some()
-    sp.transfer(sp.record(address=sp.sender, prooftype='gov', proof=proof), sp.mutez(0), c)
+    self.sendPatches([self.proofPatch(sp.sender, 'gov', meta = self.metaPatch(platform, 'true'))])
 
   ## Admin Proof Functions
   #
@@ -144,32 +160,27 @@ class TezIDController(sp.Contract):
   @sp.entry_point
   def registerProofAdmin(self, address, proofType):
     self.checkAdmin()
-    proofs = sp.view('getProofsForAddress', self.data.idstore, sp.sender, t = Types.TProofs).open_some('Invalid view')
-    proof = self.getOrCreateProof(proofs, proofType)
-    proof.verified = False
-    proof.register_date = sp.now
-    c = sp.contract(Types.TSetProofPayload, self.data.idstore, entry_point="setProof").open_some()
-    sp.transfer(sp.record(address=address, prooftype=proofType, proof=proof), sp.mutez(0), c)
+    self.sendPatches([self.proofPatch(address, proofType, create = True, register_date = sp.some(sp.now), verified = sp.some(False))])
 
   @sp.entry_point
   def verifyProof(self, address, prooftype):
     self.checkAdmin()
-    proofs = sp.view('getProofsForAddress', self.data.idstore, address, t = Types.TProofs).open_some('Invalid view')
-    self.checkProofExistence(proofs, prooftype)
-    proof = self.getOrCreateProof(proofs, prooftype)
-    proof.verified = True
-    c = sp.contract(Types.TSetProofPayload, self.data.idstore, entry_point="setProof").open_some()
-    sp.transfer(sp.record(address=address, prooftype=prooftype, proof=proof), sp.mutez(0), c)
+    self.sendPatches([self.proofPatch(address, prooftype, verified = sp.some(True))])
+
+  @sp.entry_point
+  def verifyProofs(self, proofs):
+    self.checkAdmin()
+    sp.set_type(proofs, sp.TList(Types.TProofKey))
+    patches = sp.local('patches', sp.list(t = Types.TProofPatch))
+    sp.for item in proofs:
+      patches.value.push(self.proofPatch(item.address, item.prooftype, verified = sp.some(True)))
+    # push prepends, so reverse to apply the patches in the admin's order
+    self.sendPatches(patches.value.rev())
 
   @sp.entry_point
   def setProofMeta(self, address, prooftype, key, value):
     self.checkAdmin()
-    proofs = sp.view('getProofsForAddress', self.data.idstore, address, t = Types.TProofs).open_some('Invalid view')
-    self.checkProofExistence(proofs, prooftype)
-    proof = self.getOrCreateProof(proofs, prooftype)
-    proof.meta[key] = value
-    c = sp.contract(Types.TSetProofPayload, self.data.idstore, entry_point="setProof").open_some()
-    sp.transfer(sp.record(address=address, prooftype=prooftype, proof=proof), sp.mutez(0), c)
+    self.sendPatches([self.proofPatch(address, prooftype, meta = self.metaPatch(key, value))])
 
   @sp.entry_point
   def removeProof(self, prooftype, address):
@@ -6,18 +6,36 @@ Types = sp.io.import_script_from_url("file://%s/contracts/types.py" % cwd)
 
 ## TODO: proofToken
 
+# Scale of rewardPerTokenStored, keeps precision for small rewards on large stakes
+PRECISION = 1000000000000000000
+
 ## TezID Forever Farm
 #
+# Rewards are accounted with a reward-per-token accumulator: addRewards
+# raises rewardPerTokenStored by amount / totalStaked, and every stake
+# remembers the accumulator value it was last paid at. Claiming costs the
+# same no matter how many rewards were added since.
+#
+# Every addRewards is logged as an epoch in the rewards big_map, so the
+# history is kept without being loaded by other calls.
+#
+# Each stake is a position stored under its own (address, position) key;
+# compact merges several positions of a user into one.
 
 class TezIDForeverFarm(sp.Contract):
   def __init__(self, admins, metadata):
+    self.init_type(Types.TFarmStorage)
     self.init(
-      admins = admins, 
+      admins = admins,
       metadata = metadata,
       stakers = sp.big_map({}),
-      rewards = sp.map({}),
+      nextPosition = 0,
+      rewards = sp.big_map({}),
+      rewardEpoch = 0,
       paused = False,
       totalStaked = 0,
+      totalRewards = 0,
+      rewardPerTokenStored = 0,
       stakeToken = sp.record(
         address  = sp.none,
         token_id = 0
@@ -38,8 +56,8 @@ class TezIDForeverFarm(sp.Contract):
         txs.value.push(sp.record(
           to_      = params.receiver,
           token_id = _id,
-          amount   = params.amount 
-        )) 
+          amount   = params.amount
+        ))
       arg = [
         sp.record(
           from_ = params.sender,
@@ -48,31 +66,41 @@ class TezIDForeverFarm(sp.Contract):
       ]
 
       transferHandle = sp.contract(
-          sp.TList(sp.TRecord(from_ = sp.TAddress, txs = sp.TList(sp.TRecord(amount = sp.TNat, to_ = sp.TAddress, token_id = sp.TNat).layout(("to_", ("token_id", "amount")))))), 
+          Types.TFA2Transfer,
           params.token,
           entry_point='transfer').open_some()
 
       sp.transfer(arg, sp.mutez(0), transferHandle)
 
-  @sp.private_lambda(with_storage='read-only', with_operations=True, wrap_call=True)
-  def calculateRewards(self, stakes):
-    rewards = sp.local('rewards', 0)
-    sp.for stakeDate in stakes:
-      sp.for rewardDate in self.data.rewards.keys():
-        sp.if stakeDate < rewardDate:
-          claimDate = self.data.stakers[sp.sender][stakeDate].claimed
-          sp.if claimDate < rewardDate:
-            amountStaked = self.data.stakers[sp.sender][stakeDate].amount
-            totalStaked = self.data.rewards[rewardDate]
-            rewards.value += totalStaked / amountStaked
-    sp.result(rewards.value)
+  def stakeKey(self, position):
+    return sp.record(address = sp.sender, position = position)
+
+  def pendingRewards(self, stake):
+    return stake.amount * sp.as_nat(self.data.rewardPerTokenStored - stake.rewardPerTokenPaid) / PRECISION
+
+  def releasePositions(self, positions, rewards, staked):
+    sp.for position in positions:
+      stake = sp.local('stake', self.data.stakers.get(self.stakeKey(position), message = 'Not staked'))
+      rewards.value += self.pendingRewards(stake.value)
+      staked.value += stake.value.amount
+      del self.data.stakers[self.stakeKey(position)]
+
+  def sendRewards(self, amount):
+    sp.if amount > 0:
+      self.TransferTokens(sp.record(
+        sender=sp.self_address,
+        receiver=sp.sender,
+        token=self.data.rewardToken.address.open_some('rewardToken address not set'),
+        ids=[self.data.rewardToken.token_id],
+        amount=amount
+      ))
 
   ## Checks
   #
 
   @sp.private_lambda(with_storage='read-only', wrap_call=True)
   def checkAdmin(self):
-    sp.verify(self.data.admins.contains(sp.sender), 'Only admin can call this entrypoint')    
+    sp.verify(self.data.admins.contains(sp.sender), 'Only admin can call this entrypoint')
 
   @sp.private_lambda(with_storage='read-only', wrap_call=True)
   def checkNotPaused(self):
@@ -87,7 +115,7 @@ class TezIDForeverFarm(sp.Contract):
 
   ## Admin entrypoints
   #
-   
+
   @sp.entry_point
   def addAdmin(self, admin):
     self.checkAdmin()
@@ -97,45 +125,67 @@ class TezIDForeverFarm(sp.Contract):
   def delAdmin(self, admin):
     self.checkAdmin()
     self.data.admins.remove(admin)
-      
+
   @sp.entry_point
   def setBaker(self, new_delegate):
     self.checkAdmin()
     sp.set_delegate(new_delegate)
-      
+
   @sp.entry_point
   def send(self, receiverAddress, amount):
     self.checkAdmin()
     sp.send(receiverAddress, amount)
 
+  @sp.entry_point
+  def setPaused(self, paused):
+    self.checkAdmin()
+    self.data.paused = paused
+
+  @sp.entry_point
+  def setStakeToken(self, address, token_id):
+    self.checkAdmin()
+    sp.verify(self.data.totalStaked == 0, 'Cannot change stakeToken while staked')
+    self.data.stakeToken = sp.record(address = sp.some(address), token_id = token_id)
+
+  @sp.entry_point
+  def setRewardToken(self, address, token_id):
+    self.checkAdmin()
+    self.data.rewardToken = sp.record(address = sp.some(address), token_id = token_id)
+
   @sp.entry_point
   def adminTransferTokens(self, sender, receiver, tokenAddress, token_ids, amount):
     self.checkAdmin()
     self.TransferTokens(sp.record(
-      sender=sender, 
-      receiver=receiver, 
-      token=tokenAddress, 
-      ids=token_ids, 
+      sender=sender,
+      receiver=receiver,
+      token=tokenAddress,
+      ids=token_ids,
       amount=amount
     ))
 
-  ## Reward 
+  ## Reward
   #
 
   @sp.entry_point
   def addRewards(self, amount):
     self.checkAdmin()
+    sp.verify(self.data.totalStaked > 0, 'Nothing staked')
     self.TransferTokens(sp.record(
-      sender=sp.sender, 
-      receiver=sp.self_address, 
+      sender=sp.sender,
+      receiver=sp.self_address,
       token=self.data.rewardToken.address.open_some('rewardToken address not set'),
       ids=[self.data.rewardToken.token_id],
       amount=amount
     ))
-    self.rewards[sp.now] = sp.record(
+    self.data.rewardPerTokenStored += amount * PRECISION / self.data.totalStaked
+    self.data.totalRewards += amount
+    self.data.rewards[self.data.rewardEpoch] = sp.record(
       amount = amount,
-      totalStaked = self.data.totalStaked
+      date = sp.now,
+      totalStaked = self.data.totalStaked,
+      rewardPerTokenStored = self.data.rewardPerTokenStored
     )
+    self.data.rewardEpoch += 1
 
   ## Stake
   #
@@ -143,50 +193,68 @@ class TezIDForeverFarm(sp.Contract):
   @sp.entry_point
   def stake(self, amount):
     self.checkNotPaused()
+    sp.verify(amount > 0, 'Amount too low')
     self.TransferTokens(sp.record(
-      sender=sp.sender, 
-      receiver=sp.self_address, 
+      sender=sp.sender,
+      receiver=sp.self_address,
       token=self.data.stakeToken.address.open_some('stakeToken address not set'),
       ids=[self.data.stakeToken.token_id],
       amount=amount
     ))
-    stakes = sp.lokal('stakes', sp.map({}))
-    sp.if self.data.stakers.contains(sp.sender):
-      stakes.value = self.data.stakers[sp.sender]
-    stakes.value[sp.now] = sp.record(
+    self.data.stakers[self.stakeKey(self.data.nextPosition)] = sp.record(
       amount = amount,
-      claimed = sp.now
+      date = sp.now,
+      rewardPerTokenPaid = self.data.rewardPerTokenStored
     )
+    self.data.nextPosition += 1
     self.data.totalStaked += amount
 
   ## Claim
   #
 
   @sp.entry_point
-  def claim(self, stakes):
+  def claim(self, positions):
     self.checkNotPaused()
-    rewards = self.calculateRewards(stakes)
-    sp.for stakeDate in stakes:
-      # Note: more secure to handle this in calculateRewards and use rewardDate
-      self.data.stakers[sp.sender][stakeDate].claimed = sp.now
-    self.TransferTokens(sp.record(
-      sender=sp.self_address, 
-      receiver=sp.sender, 
-      token=self.data.rewardToken.address.open_some('rewardToken address not set'),
-      ids=[self.data.rewardToken.token_id],
-      amount=rewards.value
-    ))
+    sp.set_type(positions, sp.TList(sp.TNat))
+    rewards = sp.local('rewards', sp.nat(0))
+    sp.for position in positions:
+      stake = sp.local('stake', self.data.stakers.get(self.stakeKey(position), message = 'Not staked'))
+      rewards.value += self.pendingRewards(stake.value)
+      stake.value.rewardPerTokenPaid = self.data.rewardPerTokenStored
+      self.data.stakers[self.stakeKey(position)] = stake.value
+    self.sendRewards(rewards.value)
 
   @sp.entry_point
-  def unstake(self, stakes):
+  def unstake(self, positions):
     self.checkNotPaused()
-    rewards = self.calculateRewards(stakes)
-    sp.for stakeDate in stakes:
-      del self.data.stakers[sp.sender][stakeDate]
+    sp.set_type(positions, sp.TList(sp.TNat))
+    rewards = sp.local('rewards', sp.nat(0))
+    staked = sp.local('staked', sp.nat(0))
+    self.releasePositions(positions, rewards, staked)
+    self.data.totalStaked = sp.as_nat(self.data.totalStaked - staked.value)
     self.TransferTokens(sp.record(
-      sender=sp.self_address, 
-      receiver=sp.sender, 
-      token=self.data.rewardToken.address.open_some('rewardToken address not set'),
-      ids=[self.data.rewardToken.token_id],
-      amount=rewards.value
+      sender=sp.self_address,
+      receiver=sp.sender,
+      token=self.data.stakeToken.address.open_some('stakeToken address not set'),
+      ids=[self.data.stakeToken.token_id],
+      amount=staked.value
     ))
+    self.sendRewards(rewards.value)
+
+  ## Compact
+  #
+
+  @sp.entry_point
+  def compact(self, positions):
+    self.checkNotPaused()
+    sp.set_type(positions, sp.TList(sp.TNat))
+    rewards = sp.local('rewards', sp.nat(0))
+    staked = sp.local('staked', sp.nat(0))
+    self.releasePositions(positions, rewards, staked)
+    with sp.match_cons(positions) as merged:
+      self.data.stakers[self.stakeKey(merged.head)] = sp.record(
+        amount = staked.value,
+        date = sp.now,
+        rewardPerTokenPaid = self.data.rewardPerTokenStored
+      )
+    self.sendRewards(rewards.value)
@@ -9,11 +9,12 @@ Types = sp.io.import_script_from_url("file://%s/contracts/types.py" % cwd)
 #
 
 class TezIDStore(sp.Contract):
-  def __init__(self, admins, initialIdentities, metadata):
+  def __init__(self, admins, initialIdentities, initialProofs, metadata):
     self.init_type(Types.TStoreStorage)
     self.init(
       admins = admins, 
       identities = initialIdentities,
+      proofs = initialProofs,
       metadata = metadata
     )
 
@@ -24,6 +25,81 @@ class TezIDStore(sp.Contract):
   def checkAdmin(self):
     sp.verify(self.data.admins.contains(sp.sender), 'Only admin can call this entrypoint')    
 
+  # Proofs live in their own big_map keyed by (address, prooftype), and
+  # identities only index which prooftypes an address holds. The index is
+  # only written when a prooftype is added or removed.
+
+  def indexProof(self, address, prooftype):
+    sp.if self.data.identities.contains(address) == False:
+      self.data.identities[address] = sp.set()
+    self.data.identities[address].add(prooftype)
+
+  # Every mutation emits an event, so indexers can follow the store
+  # without decoding big_map diffs.
+
+  def emitProofSet(self, address, prooftype, verified):
+    sp.emit(
+      sp.set_type_expr(sp.record(address = address, prooftype = prooftype, verified = verified), Types.TProofSetEvent),
+      tag = "proof_set",
+      with_type = True
+    )
+
+  def emitProofDeleted(self, address, prooftype):
+    sp.emit(
+      sp.set_type_expr(sp.record(address = address, prooftype = prooftype), Types.TProofDeletedEvent),
+      tag = "proof_deleted",
+      with_type = True
+    )
+
+  def emitIdentityRemoved(self, address):
+    sp.emit(sp.set_type_expr(address, Types.TIdentityRemovedEvent), tag = "identity_removed", with_type = True)
+
+  def writeProof(self, address, prooftype, proof):
+    key = sp.record(address = address, prooftype = prooftype)
+    sp.if self.data.proofs.contains(key) == False:
+      self.indexProof(address, prooftype)
+    self.data.proofs[key] = proof
+    self.emitProofSet(address, prooftype, proof.verified)
+
+  def patchProof(self, patch):
+    key = sp.record(address = patch.address, prooftype = patch.prooftype)
+    stored = sp.local('stored', self.data.proofs.get_opt(key))
+    proof = sp.local('proof', sp.record(
+      register_date = sp.now,
+      verified = False,
+      meta = sp.map(tkey = sp.TString, tvalue = sp.TString)
+    ))
+    sp.if stored.value.is_some():
+      proof.value = stored.value.open_some()
+    sp.else:
+      sp.verify(patch.create, 'Missing required proof for this entrypoint')
+      self.indexProof(patch.address, patch.prooftype)
+    with sp.match_some(patch.register_date) as register_date:
+      proof.value.register_date = register_date
+    with sp.match_some(patch.verified) as verified:
+      proof.value.verified = verified
+    sp.for entry in patch.meta.items():
+      sp.if entry.value.is_some():
+        proof.value.meta[entry.key] = entry.value.open_some()
+      sp.else:
+        del proof.value.meta[entry.key]
+    self.data.proofs[key] = proof.value
+    self.emitProofSet(patch.address, patch.prooftype, proof.value.verified)
+
+  def clearIdentity(self, address):
+    sp.if self.data.identities.contains(address):
+      sp.for prooftype in self.data.identities[address].elements():
+        del self.data.proofs[sp.record(address = address, prooftype = prooftype)]
+      del self.data.identities[address]
+      self.emitIdentityRemoved(address)
+
+  def collectProofs(self, address):
+    proofs = sp.local('proofs', sp.map(tkey = sp.TString, tvalue = Types.TProof))
+    sp.if self.data.identities.contains(address):
+      sp.for prooftype in self.data.identities[address].elements():
+        proofs.value[prooftype] = self.data.proofs[sp.record(address = address, prooftype = prooftype)]
+    return proofs.value
+
   ## Default
   #
 
@@ -57,26 +133,58 @@ class TezIDStore(sp.Contract):
   @sp.entry_point
   def setProof(self, address, prooftype, proof):
     self.checkAdmin()
-    sp.if self.data.identities.contains(address) == False:
-      self.data.identities[address] = sp.map({})
-    self.data.identities[address][prooftype] = proof
+    self.writeProof(address, prooftype, proof)
+      
+  @sp.entry_point
+  def setProofBatch(self, proofs):
+    self.checkAdmin()
+    sp.set_type(proofs, Types.TSetProofBatchPayload)
+    sp.for item in proofs:
+      self.writeProof(item.address, item.prooftype, item.proof)
+      
+  @sp.entry_point
+  def patchProofs(self, patches):
+    self.checkAdmin()
+    sp.set_type(patches, Types.TProofPatches)
+    sp.for patch in patches:
+      self.patchProof(patch)
       
   @sp.entry_point
   def delProof(self, address, prooftype):
     self.checkAdmin()
-    del self.data.identities[address][prooftype]
+    key = sp.record(address = address, prooftype = prooftype)
+    sp.verify(self.data.proofs.contains(key), 'Missing required proof for this entrypoint')
+    self.data.identities[address].remove(prooftype)
+    sp.if sp.len(self.data.identities[address]) == 0:
+      del self.data.identities[address]
+    del self.data.proofs[key]
+    self.emitProofDeleted(address, prooftype)
       
   @sp.entry_point
   def removeIdentity(self, address):
     self.checkAdmin()
-    del self.data.identities[address]
+    self.clearIdentity(address)
 
   @sp.entry_point
   def setProofs(self, proofs):
     self.checkAdmin()
     sp.set_type(proofs, Types.TSetProofs)
-    sp.for proof in proofs.items():
-      self.data.identities[proof.key] = proof.value
+    sp.for identity in proofs.items():
+      self.clearIdentity(identity.key)
+      sp.for proof in identity.value.items():
+        self.writeProof(identity.key, proof.key, proof.value)
+
+  ## Migration
+  #
+
+  @sp.entry_point
+  def importIdentities(self, source, addresses):
+    self.checkAdmin()
+    sp.set_type(addresses, sp.TList(sp.TAddress))
+    sp.for address in addresses:
+      proofs = sp.view('getProofsForAddress', source, address, t = Types.TProofs).open_some('Invalid view')
+      sp.for proof in proofs.items():
+        self.writeProof(address, proof.key, proof.value)
 
   ## Failsafe updateable entrypoint
   #
@@ -98,16 +206,39 @@ class TezIDStore(sp.Contract):
 
   @sp.entry_point
   def getProofs(self, address, callback_address):
-    proofs = sp.local('proofs', sp.map())
-    sp.if self.data.identities.contains(address):
-      proofs.value = self.data.identities[address]
+    proofs = self.collectProofs(address)
     c = sp.contract(Types.TGetProofsResponsePayload, callback_address).open_some()
-    sp.transfer(sp.record(address=address, proofs=proofs.value), sp.mutez(0), c)
+    sp.transfer(sp.record(address=address, proofs=proofs), sp.mutez(0), c)
 
   @sp.onchain_view()
   def getProofsForAddress(self, address):
-    proofs = sp.local('proofs', sp.map({}))
-    sp.if self.data.identities.contains(address):
-      proofs.value = self.data.identities[address]
-    sp.result(proofs.value)
+    sp.result(self.collectProofs(address))
 
+  @sp.onchain_view()
+  def getProof(self, params):
+    sp.set_type(params, Types.TProofKey)
+    sp.result(self.data.proofs.get_opt(params))
+
+  @sp.onchain_view()
+  def checkProofs(self, params):
+    sp.set_type(params, Types.TCheckProofsPayload)
+    valid = sp.local('valid', True)
+    done = sp.local('done', False)
+    remaining = sp.local('remaining', params.prooftypes)
+    sp.while ~done.value:
+      with sp.match_cons(remaining.value) as required:
+        remaining.value = required.tail
+        proof = sp.local('proof', self.data.proofs.get_opt(sp.record(address = params.address, prooftype = required.head)))
+        sp.if proof.value.is_some():
+          found = proof.value.open_some()
+          sp.if ~found.verified:
+            valid.value = False
+          with sp.match_some(params.max_age) as max_age:
+            sp.if sp.now - found.register_date > max_age:
+              valid.value = False
+        sp.else:
+          valid.value = False
+        done.value = ~valid.value
+      sp.else:
+        done.value = True
+    sp.result(valid.value)
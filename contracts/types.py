@@ -9,18 +9,30 @@ TProof = sp.TRecord(
     meta = sp.TMap(sp.TString, sp.TString)
 )
 TProofs = sp.TMap(sp.TString, TProof)
+TProofKey = sp.TRecord(
+    address=sp.TAddress,
+    prooftype=sp.TString
+)
 TSetProofs = sp.TMap(sp.TAddress, TProofs)
-TIdentities = sp.TBigMap(sp.TAddress, TProofs)
+TIdentities = sp.TBigMap(sp.TAddress, sp.TSet(sp.TString))
+TProofStore = sp.TBigMap(TProofKey, TProof)
 TSendPayload = sp.TRecord(receiverAddress = sp.TAddress, amount = sp.TMutez)
 TSetProofPayload = sp.TRecord(
     address=sp.TAddress,
     prooftype=sp.TString,
     proof=TProof
 )
-TDelProofPayload = sp.TRecord(
+TSetProofBatchPayload = sp.TList(TSetProofPayload)
+TProofPatch = sp.TRecord(
     address=sp.TAddress,
-    prooftype=sp.TString
+    prooftype=sp.TString,
+    create=sp.TBool,
+    register_date=sp.TOption(sp.TTimestamp),
+    verified=sp.TOption(sp.TBool),
+    meta=sp.TMap(sp.TString, sp.TOption(sp.TString))
 )
+TProofPatches = sp.TList(TProofPatch)
+TDelProofPayload = TProofKey
 TGetProofsRequestPayload = sp.TRecord(
     address=sp.TAddress, 
     callback_address=sp.TAddress
@@ -29,6 +41,78 @@ TGetProofsResponsePayload = sp.TRecord(
   address = sp.TAddress,
   proofs = TProofs
 )
+TCheckProofsPayload = sp.TRecord(
+  address = sp.TAddress,
+  prooftypes = sp.TList(sp.TString),
+  max_age = sp.TOption(sp.TInt)
+)
+
+## Attestation Types
+#
+# A verifier key signs PACK(TAttestationPayload) off-chain; anyone can then
+# submit the attestation and its signature to the controller.
+
+TAttestation = sp.TRecord(
+  address = sp.TAddress,
+  prooftype = sp.TString,
+  verified = sp.TBool,
+  meta = sp.TMap(sp.TString, sp.TString),
+  expiry = sp.TTimestamp,
+  nonce = sp.TNat
+)
+TAttestationPayload = sp.TRecord(
+  attestation = TAttestation,
+  chain_id = sp.TChainId,
+  controller = sp.TAddress
+)
+TAttestProofPayload = sp.TRecord(
+  attestation = TAttestation,
+  signature = sp.TSignature
+)
+
+## Event Types
+#
+# Emitted by the store on every mutation, tagged proof_set, proof_deleted
+# and identity_removed.
+
+TProofSetEvent = sp.TRecord(
+  address = sp.TAddress,
+  prooftype = sp.TString,
+  verified = sp.TBool
+)
+TProofDeletedEvent = TProofKey
+TIdentityRemovedEvent = sp.TAddress
+
+## Farm Types
+#
+
+TStakeKey = sp.TRecord(
+  address = sp.TAddress,
+  position = sp.TNat
+)
+TStake = sp.TRecord(
+  amount = sp.TNat,
+  date = sp.TTimestamp,
+  rewardPerTokenPaid = sp.TNat
+)
+TRewardEpoch = sp.TRecord(
+  amount = sp.TNat,
+  date = sp.TTimestamp,
+  totalStaked = sp.TNat,
+  rewardPerTokenStored = sp.TNat
+)
+TToken = sp.TRecord(
+  address = sp.TOption(sp.TAddress),
+  token_id = sp.TNat
+)
+TFA2Transfer = sp.TList(sp.TRecord(
+  from_ = sp.TAddress,
+  txs = sp.TList(sp.TRecord(
+    amount = sp.TNat,
+    to_ = sp.TAddress,
+    token_id = sp.TNat
+  ).layout(("to_", ("token_id", "amount"))))
+))
 
 ## Storage Types
 #
@@ -36,9 +120,25 @@ TGetProofsResponsePayload = sp.TRecord(
 TStoreStorage = sp.TRecord(
   admins = sp.TSet(sp.TAddress),
   identities = TIdentities,
+  proofs = TProofStore,
   metadata = sp.TBigMap(sp.TString, sp.TBytes)
 )
 
+TFarmStorage = sp.TRecord(
+  admins = sp.TSet(sp.TAddress),
+  metadata = sp.TBigMap(sp.TString, sp.TBytes),
+  stakers = sp.TBigMap(TStakeKey, TStake),
+  nextPosition = sp.TNat,
+  paused = sp.TBool,
+  totalStaked = sp.TNat,
+  rewards = sp.TBigMap(sp.TNat, TRewardEpoch),
+  rewardEpoch = sp.TNat,
+  totalRewards = sp.TNat,
+  rewardPerTokenStored = sp.TNat,
+  stakeToken = TToken,
+  rewardToken = TToken
+)
+
 ## Labmda Types
 #
 
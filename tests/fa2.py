@@ -0,0 +1,53 @@
+import os
+import smartpy as sp
+
+cwd = os.getcwd()
+Types = sp.io.import_script_from_url("file://%s/contracts/types.py" % cwd)
+
+## Minimal FA2 token for farm scenarios
+#
+# Only what TezIDForeverFarm needs: balances, operators and transfer.
+
+class TestToken(sp.Contract):
+  def __init__(self, admin):
+    self.init(
+      admin = admin,
+      ledger = sp.big_map(tkey = sp.TPair(sp.TAddress, sp.TNat), tvalue = sp.TNat),
+      operators = sp.big_map(tkey = sp.TRecord(owner = sp.TAddress, operator = sp.TAddress, token_id = sp.TNat), tvalue = sp.TUnit)
+    )
+
+  def balance(self, owner, token_id):
+    return self.data.ledger.get((owner, token_id), 0)
+
+  @sp.entry_point
+  def mint(self, address, token_id, amount):
+    sp.verify(sp.sender == self.data.admin, 'FA2_NOT_ADMIN')
+    self.data.ledger[(address, token_id)] = self.balance(address, token_id) + amount
+
+  @sp.entry_point
+  def update_operators(self, params):
+    sp.set_type(params, sp.TList(sp.TVariant(
+      add_operator = sp.TRecord(owner = sp.TAddress, operator = sp.TAddress, token_id = sp.TNat),
+      remove_operator = sp.TRecord(owner = sp.TAddress, operator = sp.TAddress, token_id = sp.TNat)
+    )))
+    sp.for update in params:
+      with update.match_cases() as arg:
+        with arg.match('add_operator') as op:
+          sp.verify(op.owner == sp.sender, 'FA2_NOT_OWNER')
+          self.data.operators[op] = sp.unit
+        with arg.match('remove_operator') as op:
+          sp.verify(op.owner == sp.sender, 'FA2_NOT_OWNER')
+          del self.data.operators[op]
+
+  @sp.entry_point
+  def transfer(self, batch):
+    sp.set_type(batch, Types.TFA2Transfer)
+    sp.for transfer in batch:
+      sp.for tx in transfer.txs:
+        sp.verify(
+          (transfer.from_ == sp.sender) | self.data.operators.contains(sp.record(owner = transfer.from_, operator = sp.sender, token_id = tx.token_id)),
+          'FA2_NOT_OPERATOR'
+        )
+        sp.verify(self.balance(transfer.from_, tx.token_id) >= tx.amount, 'FA2_INSUFFICIENT_BALANCE')
+        self.data.ledger[(transfer.from_, tx.token_id)] = sp.as_nat(self.balance(transfer.from_, tx.token_id) - tx.amount)
+        self.data.ledger[(tx.to_, tx.token_id)] = self.balance(tx.to_, tx.token_id) + tx.amount
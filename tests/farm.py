@@ -0,0 +1,163 @@
+import os
+import smartpy as sp
+
+cwd = os.getcwd()
+Farm = sp.io.import_script_from_url("file://%s/contracts/farm.py" % cwd)
+FA2 = sp.io.import_script_from_url("file://%s/tests/fa2.py" % cwd)
+Targets = sp.io.import_script_from_url("file://%s/tests/targets.py" % cwd)
+
+## Tests
+#
+
+allKind = 'all'
+stakeTokenId = 0
+rewardTokenId = 1
+
+def init(admin, scenario):
+  token = FA2.TestToken(admin.address)
+  scenario += token
+  farm = Farm.TezIDForeverFarm(
+    sp.set([admin.address]),
+    sp.big_map(
+      {
+        "": sp.utils.bytes_of_string("tezos-storage:content"),
+        "content": sp.utils.bytes_of_string('{"name": "TezID Forever Farm"}')
+      }
+    )
+  )
+  scenario += farm
+  scenario += farm.setStakeToken(sp.record(address=token.address, token_id=stakeTokenId)).run(sender = admin)
+  scenario += farm.setRewardToken(sp.record(address=token.address, token_id=rewardTokenId)).run(sender = admin)
+  return token, farm
+
+def fund(scenario, token, farm, admin, account, amount):
+  scenario += token.mint(sp.record(address=account.address, token_id=stakeTokenId, amount=amount)).run(sender = admin)
+  scenario += token.mint(sp.record(address=account.address, token_id=rewardTokenId, amount=amount)).run(sender = admin)
+  scenario += token.update_operators([
+    sp.variant('add_operator', sp.record(owner=account.address, operator=farm.address, token_id=stakeTokenId)),
+    sp.variant('add_operator', sp.record(owner=account.address, operator=farm.address, token_id=rewardTokenId))
+  ]).run(sender = account)
+
+def balance(token, account, token_id):
+  return token.data.ledger[(account.address, token_id)]
+
+@Targets.addTarget(name = "Stake and claim", kind=allKind)
+def test():
+  admin = sp.test_account("admin")
+  user1 = sp.test_account("User1")
+  user2 = sp.test_account("User2")
+  user3 = sp.test_account("User3")
+
+  scenario = sp.test_scenario()
+  token, farm = init(admin, scenario)
+  for account in [admin, user1, user2, user3]:
+    fund(scenario, token, farm, admin, account, 1000)
+
+  ## Rewards are shared by stake at the time they are added
+  #
+  scenario += farm.stake(100).run(sender = user1, now = sp.timestamp(1))
+  scenario += farm.stake(300).run(sender = user2, now = sp.timestamp(2))
+  scenario.verify_equal(farm.data.totalStaked, 400)
+  scenario.verify_equal(farm.data.stakers[sp.record(address=user2.address, position=1)].amount, 300)
+  scenario += farm.addRewards(400).run(sender = admin, now = sp.timestamp(3))
+  scenario += farm.claim([0]).run(sender = user1, now = sp.timestamp(4))
+  scenario.verify_equal(balance(token, user1, rewardTokenId), 1100)
+
+  ## Stakes added after a reward do not earn it
+  #
+  scenario += farm.stake(100).run(sender = user3, now = sp.timestamp(5))
+  scenario += farm.addRewards(200).run(sender = admin, now = sp.timestamp(6))
+  scenario.verify_equal(farm.data.rewardEpoch, 2)
+  scenario.verify_equal(farm.data.totalRewards, 600)
+  scenario.verify_equal(farm.data.rewards[0].amount, 400)
+  scenario.verify_equal(farm.data.rewards[0].totalStaked, 400)
+  scenario.verify_equal(farm.data.rewards[1].date, sp.timestamp(6))
+  scenario.verify_equal(farm.data.rewards[1].totalStaked, 500)
+  scenario += farm.claim([0]).run(sender = user1, now = sp.timestamp(7))
+  scenario.verify_equal(balance(token, user1, rewardTokenId), 1140)
+  scenario += farm.claim([2]).run(sender = user3, now = sp.timestamp(7))
+  scenario.verify_equal(balance(token, user3, rewardTokenId), 1040)
+
+  ## Claiming twice pays nothing more
+  #
+  scenario += farm.claim([0]).run(sender = user1, now = sp.timestamp(8))
+  scenario.verify_equal(balance(token, user1, rewardTokenId), 1140)
+
+  ## Unstake returns the stake and pending rewards
+  #
+  scenario += farm.unstake([1]).run(sender = user2, now = sp.timestamp(9))
+  scenario.verify_equal(balance(token, user2, stakeTokenId), 1000)
+  scenario.verify_equal(balance(token, user2, rewardTokenId), 1420)
+  scenario.verify_equal(farm.data.totalStaked, 200)
+  scenario += farm.unstake([1]).run(sender = user2, now = sp.timestamp(10), valid = False, exception = 'Not staked')
+
+  ## Claiming a stake that does not exist or belongs to someone else fails
+  #
+  scenario += farm.claim([2]).run(sender = user1, valid = False, exception = 'Not staked')
+  scenario += farm.claim([1]).run(sender = user1, valid = False, exception = 'Not staked')
+
+@Targets.addTarget(name = "Compact positions", kind=allKind)
+def test():
+  admin = sp.test_account("admin")
+  user1 = sp.test_account("User1")
+  user2 = sp.test_account("User2")
+
+  scenario = sp.test_scenario()
+  token, farm = init(admin, scenario)
+  for account in [admin, user1, user2]:
+    fund(scenario, token, farm, admin, account, 1000)
+  scenario += farm.stake(100).run(sender = user1, now = sp.timestamp(1))
+  scenario += farm.stake(100).run(sender = user2, now = sp.timestamp(1))
+  scenario += farm.addRewards(200).run(sender = admin, now = sp.timestamp(2))
+  scenario += farm.stake(50).run(sender = user1, now = sp.timestamp(3))
+  scenario += farm.stake(50).run(sender = user1, now = sp.timestamp(3))
+
+  ## A user can merge positions into the first one, collecting their rewards
+  #
+  scenario += farm.compact([0, 2, 3]).run(sender = user1, now = sp.timestamp(4))
+  scenario.verify_equal(balance(token, user1, rewardTokenId), 1100)
+  scenario.verify_equal(farm.data.stakers[sp.record(address=user1.address, position=0)].amount, 200)
+  scenario.verify(farm.data.stakers.contains(sp.record(address=user1.address, position=2)) == False)
+  scenario.verify(farm.data.stakers.contains(sp.record(address=user1.address, position=3)) == False)
+  scenario.verify_equal(farm.data.totalStaked, 300)
+
+  ## The merged position keeps earning
+  #
+  scenario += farm.addRewards(300).run(sender = admin, now = sp.timestamp(5))
+  scenario += farm.claim([0]).run(sender = user1, now = sp.timestamp(6))
+  scenario.verify_equal(balance(token, user1, rewardTokenId), 1300)
+
+  ## Positions of other users cannot be merged
+  #
+  scenario += farm.compact([0, 1]).run(sender = user1, valid = False, exception = 'Not staked')
+
+@Targets.addTarget(name = "Farm admin", kind=allKind)
+def test():
+  admin = sp.test_account("admin")
+  user = sp.test_account("User")
+
+  scenario = sp.test_scenario()
+  token, farm = init(admin, scenario)
+  fund(scenario, token, farm, admin, admin, 1000)
+  fund(scenario, token, farm, admin, user, 1000)
+
+  ## Rewards cannot be added before anything is staked
+  #
+  scenario += farm.addRewards(100).run(sender = admin, valid = False, exception = 'Nothing staked')
+
+  ## Only admin can add rewards
+  #
+  scenario += farm.stake(100).run(sender = user, now = sp.timestamp(1))
+  scenario += farm.addRewards(100).run(sender = user, valid = False, exception = 'Only admin can call this entrypoint')
+
+  ## Stake token cannot change while staked
+  #
+  scenario += farm.setStakeToken(sp.record(address=token.address, token_id=rewardTokenId)).run(sender = admin, valid = False)
+
+  ## Paused farm rejects stakes and claims
+  #
+  scenario += farm.setPaused(True).run(sender = admin)
+  scenario += farm.stake(100).run(sender = user, now = sp.timestamp(2), valid = False, exception = 'Farm paused')
+  scenario += farm.claim([0]).run(sender = user, valid = False, exception = 'Farm paused')
+  scenario += farm.setPaused(False).run(sender = admin)
+  scenario += farm.setPaused(True).run(sender = user, valid = False)
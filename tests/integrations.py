@@ -6,6 +6,7 @@ Types = sp.io.import_script_from_url("file://%s/contracts/types.py" % cwd)
 Store = sp.io.import_script_from_url("file://%s/contracts/store.py" % cwd)
 Controller = sp.io.import_script_from_url("file://%s/contracts/controller.py" % cwd)
 TezIDTests = sp.io.import_script_from_url("file://%s/tests/tezid.py" % cwd)
+Targets = sp.io.import_script_from_url("file://%s/tests/targets.py" % cwd)
 
 one_year_in_seconds = 31556926
 proof_register_time = 1637752889
@@ -59,7 +60,33 @@ class AirDrop(sp.Contract):
       self.check_proofs(proofs)
       self.data.participants[sp.sender] = True
 
-@sp.add_target(name="Call getProofs from other contract", kind=TezIDTests.allKind)
+  @sp.entry_point
+  def signup_check(self):
+      valid = sp.view('checkProofs', self.data.tezidStore, sp.record(
+        address = sp.sender,
+        prooftypes = self.data.requiredProofs,
+        max_age = sp.some(sp.int(one_year_in_seconds))
+      ), t=sp.TBool).open_some('Invalid view')
+      sp.if ~valid:
+        sp.failwith('Invalid TezID proofs')
+      self.data.participants[sp.sender] = True
+
+class KYCGate(sp.Contract):
+  def __init__(self, tezidStore):
+    self.init(
+      tezidStore = tezidStore,
+      members = {}
+    )
+
+  @sp.entry_point
+  def join(self):
+      proof = sp.view('getProof', self.data.tezidStore, sp.record(address=sp.sender, prooftype='gov'), t=sp.TOption(Types.TProof)).open_some('Invalid view')
+      gov = sp.local('gov', proof.open_some('Invalid TezID proofs'))
+      sp.if ~gov.value.verified | ~gov.value.meta.contains('kyc'):
+        sp.failwith('Invalid TezID proofs')
+      self.data.members[sp.sender] = True
+
+@Targets.addTarget(name="Call getProofs from other contract", kind=TezIDTests.allKind)
 def test():
   admin = sp.test_account("admin")
   user1 = sp.test_account("User1")
@@ -121,7 +148,7 @@ def test():
   scenario += ico.signup_callback().run(sender=user3, now=sp.timestamp(proof_register_time + one_year_in_seconds - 10))
   scenario.verify(ico.data.participants.contains(user3.address) == True)
 
-@sp.add_target(name="Call getProofsForAddress from other contract", kind=TezIDTests.allKind)
+@Targets.addTarget(name="Call getProofsForAddress from other contract", kind=TezIDTests.allKind)
 def test():
   admin = sp.test_account("admin")
   user1 = sp.test_account("User1")
@@ -152,3 +179,76 @@ def test():
   scenario.verify(ico.data.participants.contains(user3.address) == False)
   scenario += ico.signup_direct().run(sender=user3, now=sp.timestamp(proof_register_time + one_year_in_seconds - 10))
   scenario.verify(ico.data.participants.contains(user3.address) == True)
+
+@Targets.addTarget(name="Call checkProofs from other contract", kind=TezIDTests.allKind)
+def test():
+  admin = sp.test_account("admin")
+  user1 = sp.test_account("User1")
+  user2 = sp.test_account("User2")
+  user3 = sp.test_account("User3")
+
+  scenario = sp.test_scenario()
+  store, ctrl = TezIDTests.init(admin, scenario)
+  ico = AirDrop(store.address, ["email","phone"])
+  scenario += ico
+
+  ## Users with valid proofs can sign up using signup_check
+  #
+  scenario += ctrl.registerProof('email').run(sender = user1, amount = sp.tez(5))
+  scenario += ctrl.registerProof('phone').run(sender = user1, amount = sp.tez(5))
+  scenario += ctrl.verifyProof(sp.record(address=user1.address, prooftype='email')).run(sender = admin)
+  scenario += ctrl.verifyProof(sp.record(address=user1.address, prooftype='phone')).run(sender = admin)
+  scenario += ico.signup_check().run(sender = user1)
+  scenario.verify(ico.data.participants.contains(user1.address))
+
+  ## A user with a missing or unverified proof cannot sign up
+  #
+  scenario += ctrl.registerProof('email').run(sender = user2, amount = sp.tez(5))
+  scenario += ctrl.verifyProof(sp.record(address=user2.address, prooftype='email')).run(sender = admin)
+  scenario += ico.signup_check().run(sender=user2, valid=False, exception='Invalid TezID proofs')
+  scenario += ctrl.registerProof('phone').run(sender = user2, amount = sp.tez(5))
+  scenario += ico.signup_check().run(sender=user2, valid=False, exception='Invalid TezID proofs')
+  scenario.verify(ico.data.participants.contains(user2.address) == False)
+
+  ## A user with outdated proofs cannot sign up
+  #
+  scenario += ctrl.registerProof('email').run(sender=user3, amount=sp.tez(5), now=sp.timestamp(proof_register_time))
+  scenario += ctrl.registerProof('phone').run(sender=user3, amount=sp.tez(5), now=sp.timestamp(proof_register_time))
+  scenario += ctrl.verifyProof(sp.record(address=user3.address, prooftype='email')).run(sender=admin)
+  scenario += ctrl.verifyProof(sp.record(address=user3.address, prooftype='phone')).run(sender=admin)
+  scenario += ico.signup_check().run(sender=user3, now=sp.timestamp(proof_register_time + one_year_in_seconds + 10), valid=False, exception="Invalid TezID proofs")
+  scenario.verify(ico.data.participants.contains(user3.address) == False)
+  scenario += ico.signup_check().run(sender=user3, now=sp.timestamp(proof_register_time + one_year_in_seconds - 10))
+  scenario.verify(ico.data.participants.contains(user3.address) == True)
+
+  ## The view can be called without an age limit
+  #
+  scenario.verify(store.checkProofs(sp.record(address=user3.address, prooftypes=["email", "phone"], max_age=sp.none)))
+  scenario.verify(store.checkProofs(sp.record(address=user3.address, prooftypes=["email", "gov"], max_age=sp.none)) == False)
+
+@Targets.addTarget(name="Call getProof from other contract", kind=TezIDTests.allKind)
+def test():
+  admin = sp.test_account("admin")
+  user1 = sp.test_account("User1")
+  user2 = sp.test_account("User2")
+
+  scenario = sp.test_scenario()
+  store, ctrl = TezIDTests.init(admin, scenario)
+  gate = KYCGate(store.address)
+  scenario += gate
+
+  ## A user with a verified KYC gov proof can join
+  #
+  scenario += ctrl.registerProof('gov').run(sender = user1, amount = sp.tez(5))
+  scenario += ctrl.enableKYC().run(sender = user1)
+  scenario += ctrl.verifyProof(sp.record(address=user1.address, prooftype='gov')).run(sender = admin)
+  scenario += gate.join().run(sender = user1)
+  scenario.verify(gate.data.members.contains(user1.address))
+
+  ## A user without a gov proof or without KYC cannot join
+  #
+  scenario += gate.join().run(sender = user2, valid = False, exception = 'Invalid TezID proofs')
+  scenario += ctrl.registerProof('gov').run(sender = user2, amount = sp.tez(5))
+  scenario += ctrl.verifyProof(sp.record(address=user2.address, prooftype='gov')).run(sender = admin)
+  scenario += gate.join().run(sender = user2, valid = False, exception = 'Invalid TezID proofs')
+  scenario.verify(gate.data.members.contains(user2.address) == False)
@@ -0,0 +1,14 @@
+import os
+import smartpy as sp
+
+## Scenario selection
+#
+# tools/scenarios.py runs every target in its own process with
+# TEZID_TEST_TARGET set to its name; all other targets are skipped.
+
+selected = os.environ.get('TEZID_TEST_TARGET')
+
+def addTarget(name, kind):
+  if selected is not None and name != selected:
+    return lambda test: test
+  return sp.add_target(name = name, kind = kind)
@@ -0,0 +1,73 @@
+import pytest
+
+from tools import attest, micheline
+from tools.attest import Attestation
+from tools.encoding import make_address
+
+# RFC 8032, section 7.1, tests 1 to 3: (secret, public, message, signature)
+VECTORS = [
+  ('9d61b19deffd5a60ba844af492ec2cc44449c5697b326919703bac031cae7f60',
+   'd75a980182b10ab7d54bfed3c964073a0ee172f3daa62325af021a68f707511a', '',
+   'e5564300c360ac729086e2cc806e828a84877f1eb8e5d974d873e065224901555fb8821590a33bacc61e39701cf9b46bd25bf5f0595bbe24655141438e7a100b'),
+  ('4ccd089b28ff96da9db6c346ec114e0f5b8a319f35aba624da8cf6ed4fb8a6fb',
+   '3d4017c3e843895a92b70aa74d1b7ebc9c982ccf2ec4968cc0cd55f12af4660c', '72',
+   '92a009a9f0d4cab8720e820b5f642540a2b27b5416503f8fb3762223ebdb69da085ac1e43e15996e458f3613d0f11d8c387b2eaeb4302aeeb00d291612bb0c00'),
+  ('c5aa8df43f9f837bedb7442f31dcb7b166d38535076f094b85ce3a2e0b4458f7',
+   'fc51cd8e6218a1a38da47ed00230f0580816ed13ba3303ac5deb911548908025', 'af82',
+   '6291d657deec24024827e69c3abe01a30ce548a284743a445e3680d7db5ac3ac18ff9b538d16f290ae67f760984dc6594a7c15e9716ed28dc027beceea1ec40a'),
+]
+
+# The mockup's bootstrap1 account
+SECRET = 'edsk3gUfUPyBSfrS9CCgmCiQsTCHGkviBDusMxDJstFtojtc1zcpsh'
+PUBLIC = 'edpkuBknW28nW72KG6RoHtYW7p12T6GKc7nAbwYX5m8Wd9sDVC9yav'
+OTHER = 'edsk39qAm1fiMjgmPkw1EgQYkMzkJezLNewd7PLNHTkr6w9XA2zdfo'
+CONTROLLER = make_address('controller', 'KT1')
+CHAIN = 'NetXdQprcVkpaWU'
+USER = make_address('user')
+
+@pytest.mark.parametrize('secret,public,message,signature', VECTORS)
+def test_rfc8032(secret, public, message, signature):
+  seed, message = bytes.fromhex(secret), bytes.fromhex(message)
+  assert attest.public_key(seed).hex() == public
+  assert attest.sign_bytes(seed, message).hex() == signature
+  assert attest.verify_bytes(bytes.fromhex(public), message, bytes.fromhex(signature))
+  assert not attest.verify_bytes(bytes.fromhex(public), message + b'!', bytes.fromhex(signature))
+
+def test_tezos_keys():
+  assert attest.edpk(SECRET) == PUBLIC
+  assert attest.tz1(PUBLIC) == 'tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx'
+
+def test_payload_layout():
+  attestation = Attestation(USER, 'email', True, {'b': '2', 'a': '1'}, 100, 7)
+  node = attest.payload(attestation, CONTROLLER, CHAIN)
+  fields, rest = node['args']
+  assert rest['args'][0] == {'bytes': '7a06a770'}
+  # (address, (expiry, meta)), (nonce, (prooftype, verified))
+  left, right = fields['args']
+  assert left['args'][1]['args'][0] == {'int': '100'}
+  assert [elt['args'][0]['string'] for elt in left['args'][1]['args'][1]] == ['a', 'b']
+  assert right['args'][0] == {'int': '7'} and right['args'][1]['args'] == [{'string': 'email'}, {'prim': 'True'}]
+  assert micheline.pack(node)[:3] == bytes.fromhex('050707')
+
+def test_signatures_do_not_replay():
+  attestation = Attestation(USER, 'email', True, {}, 100, 0)
+  signature = attest.sign(SECRET, attestation, CONTROLLER, CHAIN)
+  assert signature.startswith('edsig')
+  assert attest.verify(PUBLIC, signature, attestation, CONTROLLER, CHAIN)
+  # Any other nonce, field, controller, chain or key fails CHECK_SIGNATURE
+  assert not attest.verify(PUBLIC, signature, attestation._replace(nonce=1), CONTROLLER, CHAIN)
+  assert not attest.verify(PUBLIC, signature, attestation._replace(verified=False), CONTROLLER, CHAIN)
+  assert not attest.verify(PUBLIC, signature, attestation._replace(expiry=1000), CONTROLLER, CHAIN)
+  assert not attest.verify(PUBLIC, signature, attestation._replace(meta={'kyc': 'true'}), CONTROLLER, CHAIN)
+  assert not attest.verify(PUBLIC, signature, attestation, make_address('other', 'KT1'), CHAIN)
+  assert not attest.verify(PUBLIC, signature, attestation, CONTROLLER, 'NetXnHfVqm9iesp')
+  assert not attest.verify(attest.edpk(OTHER), signature, attestation, CONTROLLER, CHAIN)
+
+def test_cli(monkeypatch, capsys):
+  monkeypatch.setenv('TEZID_VERIFIER_SECRET', SECRET)
+  assert attest.main(['sign', USER, 'email', '--controller', CONTROLLER, '--chain-id', CHAIN,
+    '--nonce', '3', '--expiry', '1970-01-01T00:01:40Z', '--meta', 'handle=@tezid']) == 0
+  node = micheline.parse(capsys.readouterr().out)
+  attestation, signature = node['args']
+  assert attest.verify(PUBLIC, signature['string'], Attestation(USER, 'email', True, {'handle': '@tezid'}, 100, 3), CONTROLLER, CHAIN)
+  assert attestation['args'][1]['args'][0] == {'int': '3'}
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from tools import batcher, micheline
+from tools.encoding import make_address
+from tools.mocknode import MockNode
+
+USERS = [make_address('user%d' % i) for i in range(60)]
+ADMIN = make_address('admin')
+ADDRESSES = {'Controller': make_address('controller', 'KT1'), 'Store': make_address('store', 'KT1')}
+SMALL = batcher.Limits(gas=40000, bytes=4000, storage=60000)
+
+def queue():
+  for user in USERS:
+    yield batcher.register_proof_admin(user, 'gov')
+  for user in USERS:
+    yield batcher.verify_proof(user, 'gov')
+    yield batcher.set_proof_meta(user, 'gov', 'country', 'NO')
+  yield batcher.remove_proof(USERS[0], 'gov')
+
+def test_pack_under_limits():
+  calls = list(queue())
+  groups = batcher.pack(calls, SMALL)
+  assert sorted(c for g in groups for c in g.calls) == sorted(calls)
+  assert len(groups) < len(calls) / 5
+  for group in groups:
+    assert group.gas <= SMALL.gas and group.bytes <= SMALL.bytes
+    assert group.gas == sum(batcher.estimate(c)[0] for c in group.calls)
+    assert group.bytes == batcher.GROUP_BYTES + sum(batcher.estimate(c)[1] for c in group.calls)
+  assert 'calls per group' in batcher.report(groups, SMALL)
+  with pytest.raises(batcher.BatchError):
+    batcher.pack(calls, batcher.Limits(gas=1000, bytes=4000, storage=60000))
+
+def test_pack_keeps_order_per_address():
+  groups = batcher.pack(queue(), SMALL)
+  seen = {}
+  for index, group in enumerate(groups):
+    for position, call in enumerate(group.calls):
+      seen.setdefault(call.address, []).append((index, position, call.entrypoint))
+  for calls in seen.values():
+    assert calls == sorted(calls)
+  assert [e for _, _, e in seen[USERS[0]]] == ['registerProofAdmin', 'verifyProof', 'setProofMeta', 'removeProof']
+
+def test_calibrate_from_baseline():
+  baseline = {'tezid/Controller.verifyProof': {'gas': 5000.0, 'storage_diff': 0, 'paid_storage': 0}, 'farm/claim': {}}
+  costs = batcher.calibrate(baseline)
+  assert costs['Controller.verifyProof'] == batcher.Cost(5501, 0)
+  assert costs['Store.setProof'] == batcher.COSTS['Store.setProof']
+  with pytest.raises(batcher.BatchError):
+    batcher.estimate(batcher.Call('Store', 'setProofs', '{}', USERS[0], 0))
+
+def test_load_costs(tmp_path):
+  path = tmp_path / 'baseline.json'
+  assert batcher.load_costs() == batcher.COSTS
+  with pytest.raises(batcher.BatchError, match='tools.bench --update'):
+    batcher.load_costs(str(path))
+  path.write_text(json.dumps({'farm/claim': {'gas': 1.0, 'storage_diff': 0, 'paid_storage': 0}}))
+  with pytest.raises(batcher.BatchError, match='no tezid case'):
+    batcher.load_costs(str(path))
+  path.write_text(json.dumps({'tezid/Store.delProof': {'gas': 1000.0, 'storage_diff': -50, 'paid_storage': 0}}))
+  assert batcher.load_costs(str(path))['Store.delProof'] == batcher.Cost(1101, 0)
+
+def test_simulate_against_node():
+  group = batcher.pack(queue(), SMALL)[0]
+  with MockNode() as node:
+    node.add_block({'hash': 'BHead', 'header': {'level': 1}, 'operations': []})
+    node.set_counter(ADMIN, 7)
+    node.simulate(lambda content: {'status': 'applied', 'consumed_milligas': '3000500'})
+    gas = batcher.simulate(batcher.rpc.Node(node.url), ADMIN, group, ADDRESSES)
+    contents = node.requests[-1][2]['operation']['contents']
+  assert gas == 3001 * len(group.calls)
+  assert [int(c['counter']) for c in contents] == list(range(8, 8 + len(group.calls)))
+  assert contents[0]['destination'] == ADDRESSES['Controller']
+  assert contents[0]['parameters']['value'] == micheline.parse(group.calls[0].arg)
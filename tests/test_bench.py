@@ -0,0 +1,119 @@
+import pytest
+
+from tools import michelson as m
+from tools.bench import BenchmarkError, Measurement, check_falling, compare, load_baseline, main, save_baseline, table
+from tools.encoding import address_bytes, make_address
+from tools.octez import parse_receipt, tez
+
+RECEIPT = """
+Node is bootstrapped.
+Estimated gas: 5130.416 units (will add 100 for safety)
+Manager signed operations:
+  From: tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx
+  Fee to the baker: ꝩ0.000859
+  Gas limit: 5231
+  Transaction:
+    Amount: ꝩ0
+    From: tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx
+    To: KT1DpaE6NJ3ubJAdwJMFxcoTD9ya76K8QFxt
+    Entrypoint: verifyProofs
+
+This sequence of operations was run:
+  Manager signed operations:
+    From: tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx
+    Fee to the baker: ꝩ0.000859
+    Transaction:
+      Amount: ꝩ0
+      From: tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx
+      To: KT1DpaE6NJ3ubJAdwJMFxcoTD9ya76K8QFxt
+      Entrypoint: verifyProofs
+      Parameter: { Pair "tz1QsqMStSBNWMxYkQ3VvG7SNbdxNYQeS86e" "email" }
+      This transaction was successfully applied
+      Updated storage:
+        (Pair (Pair { "tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx" } { Elt "default" 5000000 })
+              (Pair "KT1RaNxxgmVRXpyu927rbBFq835pnQk6cfvM" (Pair {} 2)))
+      Storage size: 4178 bytes
+      Consumed gas: 2210.123
+      Internal operations:
+        Internal Transaction:
+          Amount: ꝩ0
+          From: KT1DpaE6NJ3ubJAdwJMFxcoTD9ya76K8QFxt
+          To: KT1RaNxxgmVRXpyu927rbBFq835pnQk6cfvM
+          Entrypoint: setProofBatch
+          This transaction was successfully applied
+          Updated big_maps:
+            Set map(4)[Pair "tz1QsqMStSBNWMxYkQ3VvG7SNbdxNYQeS86e" "email"] to (Pair {} (Pair 0 True))
+          Storage size: 9012 bytes
+          Paid storage size diff: 67 bytes
+          Consumed gas: 2920.293
+"""
+
+def test_parse_receipt_reads_applied_results_only():
+  receipt = parse_receipt(RECEIPT)
+  assert [op.entrypoint for op in receipt.operations] == ['verifyProofs', 'setProofBatch']
+  assert receipt.consumed_gas == pytest.approx(5130.416)
+  assert receipt.paid_storage_size_diff == 67
+  assert receipt.storage_size('KT1RaNxxgmVRXpyu927rbBFq835pnQk6cfvM') == 9012
+  assert receipt.storage_size('KT1DpaE6NJ3ubJAdwJMFxcoTD9ya76K8QFxt') == 4178
+
+def test_tez():
+  assert tez(0) == '0.000000'
+  assert tez(5000001) == '5.000001'
+
+def test_address_bytes():
+  assert address_bytes('tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx').hex() == '000002298c03ed7d454a101eb7022bc95f7e5f41ac78'
+  assert address_bytes(make_address('x', 'KT1'))[0] == 1
+
+def test_record_layout():
+  # Sorted field names laid out as a balanced tree, like SmartPy's default
+  assert m.record(c='3', a='1', b='2') == '(Pair 1 (Pair 2 3))'
+  assert m.record(a='1', b='2', c='3', d='4') == '(Pair (Pair 1 2) (Pair 3 4))'
+  assert m.proof_key('tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx', 'gov') == '(Pair "tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx" "gov")'
+
+def test_mapping_orders_keys():
+  kt1 = make_address('a', 'KT1')
+  tz1 = make_address('b')
+  assert m.mapping({kt1: '1', tz1: '2'}, m.address, str) == '{ Elt "%s" 2 ; Elt "%s" 1 }' % (tz1, kt1)
+  assert m.mapping({'b': 'x', 'a': 'y'}, m.string, m.string) == '{ Elt "a" "y" ; Elt "b" "x" }'
+  assert m.string('say "hi"') == '"say \\"hi\\""'
+
+def test_check_falling():
+  falling = [Measurement('c', 'x1', 1, 100.0, 0, 0), Measurement('c', 'x10', 10, 500.0, 0, 0)]
+  check_falling(falling, 'c')
+  with pytest.raises(BenchmarkError):
+    check_falling(list(reversed(falling)) + [Measurement('c', 'x100', 100, 100000.0, 0, 0)], 'c')
+  assert 'gas/item' in table(compare(falling, {}, 0.01))
+
+def test_compare_flags_regressions_past_threshold():
+  baseline = {
+    'c/a': {'gas': 1000.0, 'storage_diff': 10, 'paid_storage': 10},
+    'c/b': {'gas': 1000.0, 'storage_diff': 0, 'paid_storage': 0},
+  }
+  rows = compare([
+    Measurement('c', 'a', 1, 1005.0, 10, 10),
+    Measurement('c', 'b', 1, 900.0, 1, 0),
+    Measurement('c', 'n', 1, 1.0, 0, 0),
+  ], baseline, 0.01)
+  assert [metrics for _, _, metrics in rows] == [[], ['storage_diff'], []]
+  assert rows[2][1] is None
+  report = table(rows)
+  assert 'REGRESSION (storage_diff)' in report
+  assert '-10.0%' in report and 'new' in report
+
+def test_save_baseline_keeps_other_cases(tmp_path):
+  path = str(tmp_path / 'baseline.json')
+  assert load_baseline(path, missing_ok=True) == {}
+  save_baseline(path, [Measurement('a', 'x', 1, 10.0, 1, 1)])
+  save_baseline(path, [Measurement('b', 'y', 1, 20.0, 2, 2)], load_baseline(path))
+  assert load_baseline(path) == {
+    'a/x': {'gas': 10.0, 'storage_diff': 1, 'paid_storage': 1},
+    'b/y': {'gas': 20.0, 'storage_diff': 2, 'paid_storage': 2},
+  }
+
+def test_missing_baseline_fails_without_update(tmp_path, capsys):
+  path = str(tmp_path / 'baseline.json')
+  with pytest.raises(BenchmarkError):
+    load_baseline(path)
+  # Fails before compiling or running anything
+  assert main(['--baseline', path]) == 1
+  assert '--update' in capsys.readouterr().err
@@ -0,0 +1,104 @@
+import os
+
+import pytest
+
+from tools.build import STAMP, TARGETS, BuildError, build, build_networks, profiles, read_profile, target_key
+
+ENV = {
+  'TEZID_ADMIN': 'tz1iAAJhH465Cf3BnsKQ744XHypQGY1v7Ps9',
+  'TEZID_STORE': 'KT1RaNxxgmVRXpyu927rbBFq835pnQk6cfvM',
+  'SMARTPY_VERSION': 'test',
+}
+
+@pytest.fixture
+def root(tmp_path):
+  for target in TARGETS.values():
+    for path in ('compile.py', 'contracts/types.py', target.metadata) + target.sources:
+      path = tmp_path / path
+      path.parent.mkdir(parents=True, exist_ok=True)
+      path.write_text(path.name)
+  return tmp_path
+
+class FakeCompiler:
+  def __init__(self):
+    self.calls = []
+
+  def __call__(self, targets, outdir, env, root):
+    self.calls.append(list(targets))
+    for name in targets:
+      os.makedirs(os.path.join(outdir, name))
+      with open(os.path.join(outdir, name, 'step_000_cont_0_contract.tz'), 'w') as f:
+        f.write('%s %s' % (name, env['TEZID_ADMIN']))
+
+class LoggingCompiler(FakeCompiler):
+  """Picklable compiler for the process pool, logging runs to a file."""
+  def __init__(self, log):
+    self.log = log
+    self.calls = []
+
+  def __call__(self, targets, outdir, env, root):
+    FakeCompiler.__call__(self, targets, outdir, env, root)
+    with open(self.log, 'a') as f:
+      f.write('%s %s\n' % (','.join(targets), env['TEZID_STORE']))
+
+def run(root, env=ENV, **kwargs):
+  compiler = FakeCompiler()
+  status = build(str(root / 'output'), env=env, root=str(root), compile=compiler, **kwargs)
+  return status, compiler.calls
+
+def test_noop_build_does_not_compile(root):
+  assert run(root) == ({'controller': 'compiled', 'store': 'compiled'}, [['controller', 'store']])
+  assert run(root) == ({'controller': 'fresh', 'store': 'fresh'}, [])
+  assert (root / 'output' / 'store' / STAMP).exists()
+
+def test_only_changed_targets_are_recompiled(root):
+  run(root)
+  (root / 'metadata' / 'controller.json').write_text('{"version": "6.0.0"}')
+  assert run(root) == ({'controller': 'compiled', 'store': 'fresh'}, [['controller']])
+  run(root, env=dict(ENV, TEZID_STORE='KT1N2HacRzgmKZNmJ6DzRJ9q5bLVUvT6ZdnB'))
+  assert run(root) == ({'controller': 'cached', 'store': 'fresh'}, [])
+
+def test_types_and_smartpy_version_invalidate_everything(root):
+  run(root)
+  assert run(root, env=dict(ENV, SMARTPY_VERSION='other'))[1] == [['controller', 'store']]
+  (root / 'contracts' / 'types.py').write_text('changed')
+  assert run(root)[1] == [['controller', 'store']]
+
+def test_missing_constructor_argument(root):
+  env = dict(ENV)
+  del env['TEZID_STORE']
+  target_key('store', env, 'test', str(root))
+  with pytest.raises(BuildError):
+    target_key('controller', env, 'test', str(root))
+
+def test_read_profile(tmp_path):
+  path = tmp_path / 'ghostnet.env'
+  path.write_text('setenv TEZID_ADMIN tz1iAAJhH465Cf3BnsKQ744XHypQGY1v7Ps9\n\nsetenv TEZID_STORE KT1N2HacRzgmKZNmJ6DzRJ9q5bLVUvT6ZdnB \n')
+  assert profiles(str(tmp_path)) == {'ghostnet': {
+    'TEZID_ADMIN': 'tz1iAAJhH465Cf3BnsKQ744XHypQGY1v7Ps9',
+    'TEZID_STORE': 'KT1N2HacRzgmKZNmJ6DzRJ9q5bLVUvT6ZdnB',
+  }}
+  path.write_text('export TEZID_ADMIN=tz1\n')
+  with pytest.raises(BuildError):
+    read_profile(str(path))
+
+def test_build_networks(root):
+  networks = {
+    'mainnet': {'TEZID_STORE': 'KT1RaNxxgmVRXpyu927rbBFq835pnQk6cfvM'},
+    'ghostnet': {'TEZID_STORE': 'KT1N2HacRzgmKZNmJ6DzRJ9q5bLVUvT6ZdnB'},
+  }
+  log = root / 'compiles.log'
+  def run_networks():
+    return build_networks(str(root / 'output'), networks, env=ENV, root=str(root), compile=LoggingCompiler(str(log)), jobs=2)
+  assert set(run_networks().values()) == {'compiled'}
+  # The store only depends on the shared admin, so it is compiled once
+  assert sorted(log.read_text().splitlines()) == [
+    'controller KT1N2HacRzgmKZNmJ6DzRJ9q5bLVUvT6ZdnB',
+    'controller KT1RaNxxgmVRXpyu927rbBFq835pnQk6cfvM',
+    'store KT1N2HacRzgmKZNmJ6DzRJ9q5bLVUvT6ZdnB',
+  ]
+  for network in networks:
+    for name in TARGETS:
+      assert (root / 'output' / network / name / 'step_000_cont_0_contract.tz').exists()
+  assert set(run_networks().values()) == {'fresh'}
+  assert len(log.read_text().splitlines()) == 3
@@ -0,0 +1,60 @@
+import json
+
+from tools import micheline
+from tools.constants import REFERENCE_SIZE, extract
+
+def prim(name, *args, annots=None):
+  node = {'prim': name}
+  if args:
+    node['args'] = list(args)
+  if annots:
+    node['annots'] = annots
+  return node
+
+PROOF = prim('pair', prim('map', prim('string'), prim('string')), prim('pair', prim('timestamp'), prim('bool')))
+PROOFS = prim('map', prim('string'), PROOF)
+
+def script(body):
+  return [
+    prim('parameter', prim('unit', annots=['%default'])),
+    prim('storage', PROOFS),
+    prim('code', [prim('CDR')] + body + [prim('NIL', prim('operation')), prim('PAIR')]),
+  ]
+
+def test_expr_hash():
+  # The address octez-client register global constant gives 999
+  assert micheline.expr_hash({'int': '999'}) == 'expruQN5r2umbZVHy6WynYM8f71F8zS4AERz9bugF8UkPBEqrHLuU8'
+  assert micheline.expr_hash(prim('Unit')) == 'expruJpGVgueH6vjZDZQRjgXUuHBi4Y6UQ3cbz6swP2FMVybvnDjm5'
+  assert micheline.to_text(prim('PUSH', prim('string'), {'string': 'a"b'})) == 'PUSH string "a\\"b"'
+
+def test_parse_inverts_to_text():
+  node = script([prim('PUSH', prim('string', annots=['%s']), {'string': 'a"b\n'}), prim('PUSH', prim('int'), {'int': '-3'}), prim('DROP', {'int': '2'})])
+  node.append(prim('Pair', {'bytes': '00ff'}, [prim('Elt', {'string': 'k'}, prim('None'))]))
+  for item in node:
+    assert micheline.parse(micheline.to_text(item)) == item
+  assert micheline.parse('{ Elt "a" 1 ; }') == [prim('Elt', {'string': 'a'}, {'int': '1'})]
+
+def test_extract_shared_fragments():
+  lam = prim('LAMBDA', PROOFS, PROOFS, [prim('DUP'), prim('PUSH', prim('string'), {'string': 'Only admin can call this entrypoint'}), prim('FAILWITH')])
+  scripts = {
+    'store': script([lam, prim('SWAP'), prim('EXEC')]),
+    'probe': script([prim('EMPTY_MAP', prim('string'), PROOF), prim('DROP'), lam, prim('SWAP'), prim('EXEC')]),
+  }
+  original = json.loads(json.dumps(scripts))
+  before = sum(micheline.size(s) for s in scripts.values())
+  constants = extract(scripts, min_saving=1)
+  after = sum(micheline.size(s) for s in scripts.values())
+
+  assert constants and constants[0].value == lam and constants[0].uses == 2
+  assert constants[0].hash == micheline.expr_hash(lam)
+  assert after < before
+  # Storage and parameter types are never rewritten
+  for target in scripts:
+    assert scripts[target][:2] == original[target][:2]
+  text = json.dumps(scripts)
+  assert text.count(constants[0].hash) == 2
+  assert all(c.size > REFERENCE_SIZE for c in constants)
+
+def test_extract_nothing_below_threshold():
+  scripts = {'a': script([prim('DROP')]), 'b': script([prim('DROP')])}
+  assert extract(scripts, min_saving=1) == []
@@ -0,0 +1,164 @@
+from tools import batcher, dispatch, rpc
+from tools.dispatch import Dispatcher, Entry, Key
+from tools.encoding import make_address
+from tools.mocknode import MockNode
+
+USERS = [make_address('user%d' % i) for i in range(40)]
+ADDRESSES = {'Controller': make_address('controller', 'KT1'), 'Store': make_address('store', 'KT1')}
+SMALL = batcher.Limits(gas=20000, bytes=4000, storage=60000)
+
+class Clock:
+  """Time that only moves when the dispatcher sleeps; every sleep bakes a block."""
+
+  def __init__(self, node):
+    self.node = node
+    self.now = 0.0
+    self.sleeps = []
+
+  def sleep(self, seconds):
+    self.sleeps.append(seconds)
+    self.now += seconds
+    self.node.bake()
+
+  def __call__(self):
+    return self.now
+
+def groups(users=USERS):
+  calls = [batcher.register_proof_admin(user, 'gov') for user in users]
+  calls += [batcher.verify_proof(user, 'gov') for user in users]
+  return batcher.pack(calls, SMALL)
+
+def run(node, keys, users=USERS, **kwargs):
+  clock = Clock(node)
+  dispatcher = Dispatcher(rpc.Node(node.url), keys, ADDRESSES, sleep=clock.sleep, clock=clock, log=lambda line: None, **kwargs)
+  return dispatcher, dispatcher.dispatch(groups(users)), clock
+
+def setup(node, count):
+  node.accept_operations()
+  node.bake()
+  keys = [Key(make_address('admin%d' % i), lambda data: bytes(64)) for i in range(count)]
+  for i, key in enumerate(keys):
+    node.set_counter(key.address, 10 * i)
+  return keys
+
+def order(node):
+  """(user, entrypoint) in the order the node received them."""
+  return [(c['parameters']['value']['args'][0]['string'], c['parameters']['entrypoint'])
+    for op in node.injected for c in op['contents']]
+
+def test_round_robin_over_keys():
+  with MockNode() as node:
+    keys = setup(node, 3)
+    dispatcher, result, clock = run(node, keys)
+    blocks = len(node.blocks)
+  packed = groups()
+  assert sorted(result.hashes) == list(range(len(packed))) and not result.failed
+  assert sum(key.calls for key in keys) == 80
+  assert max(k.groups for k in keys) - min(k.groups for k in keys) <= 1
+  # Each key injects once per block, so three keys need a third of the blocks
+  assert blocks - 1 <= len(packed) // 3 + 2
+  assert all(node.counters[key.address] == 10 * i + key.calls for i, key in enumerate(keys))
+  assert 'calls/s' in dispatcher.report(result)
+
+def test_calls_on_one_address_keep_their_order():
+  with MockNode() as node:
+    _, result, _ = run(node, setup(node, 4))
+    received = order(node)
+  for user in USERS:
+    assert [e for u, e in received if u == user] == ['registerProofAdmin', 'verifyProof']
+
+def test_failed_injections_are_retried_with_backoff():
+  with MockNode() as node:
+    keys = setup(node, 2)
+    node.fail_injections(3)
+    _, result, clock = run(node, keys, users=USERS[:2], backoff=0.5, poll=0.1)
+  assert len(groups(USERS[:2])) == 1
+  assert result.hashes.keys() == {0} and result.retries == 3
+  assert [key.failures for key in keys] == [2, 1]
+  # One group, retried after 0.5, 1 and 2 seconds
+  assert 0.5 + 1.0 + 2.0 <= sum(clock.sleeps) < 0.5 + 1.0 + 2.0 + 0.5
+
+def test_stale_counter_is_resynced():
+  with MockNode() as node:
+    keys = setup(node, 2)
+    keys[0].counter = 3
+    _, result, _ = run(node, keys)
+  assert not result.failed and result.retries == 1
+  assert keys[0].failures == 1
+
+def test_exhausted_retries_only_stop_dependent_groups():
+  with MockNode() as node:
+    keys = setup(node, 2)
+    node.fail_injections(1)
+    _, result, _ = run(node, keys, retries=1)
+    received = order(node)
+  first = set(c.address for c in groups()[0].calls)
+  assert 0 in result.failed
+  assert all(first.isdisjoint(c.address for c in groups()[i].calls) for i in result.hashes)
+  assert {u for u, _ in received} == set(USERS) - first
+
+def test_failed_operations_stop_dependent_groups():
+  with MockNode() as node:
+    keys = setup(node, 2)
+    node.fail_operations(1)
+    _, result, _ = run(node, keys)
+    received = order(node)
+  first = set(c.address for c in groups()[0].calls)
+  assert 'failed' in result.failed[0]
+  assert all(first.isdisjoint(c.address for c in groups()[i].calls) for i in result.hashes)
+  # The dependent verifyProof calls are never sent
+  assert [e for u, e in received if u in first] == ['registerProofAdmin'] * len(first)
+
+def test_dropped_operations_are_resent_from_the_same_key():
+  with MockNode() as node:
+    keys = setup(node, 2)
+    node.drop_operations(1)
+    _, result, _ = run(node, keys, timeout=3)
+    received = order(node)
+  assert not result.failed and result.retries == 1
+  assert keys[0].failures == 1 and keys[1].failures == 0
+  first = [op for op in node.injected if op['contents'][0]['source'] == keys[0].address][:2]
+  # Same counters, so the dropped operation and its retry cannot both apply
+  assert [(c['counter'], c['parameters']) for c in first[0]['contents']] == [(c['counter'], c['parameters']) for c in first[1]['contents']]
+  for user in USERS:
+    assert [e for u, e in received if u == user][-2:] == ['registerProofAdmin', 'verifyProof']
+
+def test_counter_is_kept_after_other_errors():
+  with MockNode() as node:
+    keys = setup(node, 1)
+    node.fail_injections(2)
+    _, result, _ = run(node, keys, users=USERS[:2])
+    reads = [path for _, path, _ in node.requests if path.endswith('/counter')]
+  assert result.hashes.keys() == {0} and result.retries == 2
+  assert len(reads) == 1
+
+def test_stuck_operations_are_replaced_with_higher_fees():
+  with MockNode() as node:
+    keys = setup(node, 2)
+    node.hold_operations(1)
+    _, result, _ = run(node, keys, timeout=3)
+    received = order(node)
+    applied = {op['hash'] for block in node.blocks.values() if block['operations'] for op in block['operations'][3]}
+  assert not result.failed and result.retries == 1
+  stuck, replacement = [op for op in node.injected if op['contents'][0]['source'] == keys[0].address][:2]
+  assert [c['counter'] for c in stuck['contents']] == [c['counter'] for c in replacement['contents']]
+  assert all(int(new['fee']) >= 1.05 * int(old['fee']) for old, new in zip(stuck['contents'], replacement['contents']))
+  assert set(result.hashes.values()) <= applied
+  for user in USERS:
+    assert [e for u, e in received if u == user][-2:] == ['registerProofAdmin', 'verifyProof']
+
+def test_same_counter_without_higher_fees_is_rejected(monkeypatch):
+  monkeypatch.setattr(dispatch, 'REPLACEMENT_FEE', 1.0)
+  with MockNode() as node:
+    keys = setup(node, 1)
+    node.hold_operations(1)
+    _, result, _ = run(node, keys, users=USERS[:2], timeout=2, retries=3)
+  assert 'operation_conflict' in result.failed[0]
+  assert keys[0].failures == 3
+
+def test_requeue_keeps_queue_order():
+  key = Key(make_address('admin'), None)
+  entry = lambda index: Entry(index, None, 1, 0.0, {USERS[0]}, key, 0)
+  pending = [entry(0), entry(3)]
+  Dispatcher(None, [key], ADDRESSES).requeue(pending, entry(2))
+  assert [e.index for e in pending] == [0, 2, 3]
@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from tools.encoding import address_bytes, make_address
+from tools.indexer import db, decode
+from tools.indexer.sources import FixtureSource, RpcSource
+from tools.mocknode import MockNode
+
+STORE = make_address('store', 'KT1')
+ALICE = make_address('alice')
+BOB = make_address('bob')
+PROOFS = 12
+
+def key(address, prooftype):
+  return {'prim': 'Pair', 'args': [{'bytes': address_bytes(address).hex()}, {'string': prooftype}]}
+
+def value(register_date, verified, meta=None):
+  # Right comb folded the way the node prints it
+  return {'prim': 'Pair', 'args': [
+    [{'prim': 'Elt', 'args': [{'string': k}, {'string': v}]} for k, v in sorted((meta or {}).items())],
+    {'int': str(register_date)},
+    {'prim': 'True' if verified else 'False'},
+  ]}
+
+def block(level, *updates, big_map=PROOFS, status='applied'):
+  diff = {'kind': 'big_map', 'id': str(big_map), 'diff': {'action': 'update', 'updates': [
+    dict({'key_hash': 'expr', 'key': k}, **({} if v is None else {'value': v})) for k, v in updates
+  ]}}
+  content = {'kind': 'transaction', 'destination': make_address('controller', 'KT1'), 'metadata': {
+    'operation_result': {'status': 'applied'},
+    'internal_operation_results': [{'kind': 'transaction', 'destination': STORE, 'result': {
+      'status': status, 'lazy_storage_diff': [diff]
+    }}],
+  }}
+  return {'hash': 'B%d' % level, 'header': {'level': level}, 'operations': [[], [], [], [{'contents': [content]}]]}
+
+def storage():
+  # (admins, identities), (metadata, proofs)
+  return {'prim': 'Pair', 'args': [
+    {'prim': 'Pair', 'args': [[{'string': ALICE}], {'int': '11'}]},
+    {'prim': 'Pair', 'args': [{'int': '10'}, {'int': str(PROOFS)}]},
+  ]}
+
+BLOCKS = [
+  block(3, (key(ALICE, 'email'), value(1000, False)), (key(ALICE, 'phone'), value(1000, True))),
+  block(4, (key(ALICE, 'email'), value(1000, True, {'handle': '@alice'})), (key(BOB, 'email'), value(2000, True))),
+  block(5, (key(BOB, 'phone'), value(3000, True)), (key(BOB, 'gov'), value(3000, True))),
+  block(6, (key(BOB, 'gov'), None)),
+  block(7, (key(ALICE, 'gov'), value(5000, True)), status='backtracked'),
+  block(8, (key(ALICE, 'gov'), value(5000, True)), big_map=99),
+]
+
+@pytest.fixture
+def fixture(tmp_path):
+  path = tmp_path / 'blocks.json'
+  path.write_text(json.dumps({'blocks': BLOCKS, 'storage': {STORE: storage()}}))
+  return str(path)
+
+def test_decode_block():
+  updates = list(decode.proof_updates(BLOCKS[1], PROOFS))
+  assert updates == [
+    decode.Update(ALICE, 'email', decode.Proof(1000, True, {'handle': '@alice'})),
+    decode.Update(BOB, 'email', decode.Proof(2000, True, {})),
+  ]
+  assert list(decode.proof_updates(BLOCKS[3], PROOFS)) == [decode.Update(BOB, 'gov', None)]
+  assert list(decode.proof_updates(BLOCKS[4], PROOFS)) == []
+  assert decode.store_big_maps(storage()) == {'identities': 11, 'metadata': 10, 'proofs': PROOFS}
+  assert decode.timestamp({'string': '1970-01-01T00:16:40Z'}) == 1000
+
+def test_sync_and_query(fixture):
+  conn = db.connect(':memory:')
+  assert db.sync(conn, FixtureSource(fixture), STORE, from_level=1, confirmations=0, batch=2) == 8
+  assert db.cursor(conn, STORE) == (PROOFS, 8, 'B8')
+  assert db.proofs_for(conn, ALICE) == {
+    'email': decode.Proof(1000, True, {'handle': '@alice'}),
+    'phone': decode.Proof(1000, True, {}),
+  }
+  assert db.addresses_with(conn, ['email', 'phone']) == sorted([ALICE, BOB])
+  assert db.addresses_with(conn, ['email', 'phone'], registered_after=1500) == [BOB]
+  assert db.addresses_with(conn, ['gov']) == []
+  with pytest.raises(ValueError):
+    db.addresses_with(conn, [])
+  assert db.count_by_prooftype(conn) == {'email': 2, 'phone': 2}
+
+def test_sync_resumes_from_cursor(fixture, tmp_path):
+  path = str(tmp_path / 'mirror.sqlite')
+  source = FixtureSource(fixture)
+  assert db.sync(db.connect(path), source, STORE, from_level=1, to_level=4) == 4
+  conn = db.connect(path)
+  assert db.addresses_with(conn, ['email']) == sorted([ALICE, BOB])
+  assert db.sync(conn, source, STORE, from_level=1, confirmations=2) == 2
+  assert db.cursor(conn, STORE)[1] == 6
+  assert BOB not in db.addresses_with(conn, ['gov'])
+  with pytest.raises(db.IndexerError):
+    db.sync(conn, source, make_address('other', 'KT1'), from_level=1)
+
+def test_sync_over_rpc():
+  with MockNode() as node:
+    for b in BLOCKS:
+      node.add_block(b)
+    node.set_storage(STORE, storage())
+    conn = db.connect(':memory:')
+    assert db.sync(conn, RpcSource(node.url), STORE, from_level=3, confirmations=0) == 6
+  assert db.addresses_with(conn, ['phone', 'gov'], verified=True) == []
+  assert db.addresses_with(conn, ['phone'], verified=True) == sorted([ALICE, BOB])
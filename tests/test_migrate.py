@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from tools import micheline, migrate, snapshot
+from tools.encoding import address_bytes, make_address
+from tools.mocknode import MockNode
+from tools.population import population
+
+STORE = make_address('store', 'KT1')
+SOURCE = make_address('migrator')
+SMALL = migrate.Limits(bytes=4000, gas=1040000, storage=60000)
+
+@pytest.fixture
+def export(tmp_path):
+  path = str(tmp_path / 'store.jsonl')
+  snapshot.write(path, population(300, seed=5))
+  return path
+
+def test_value_is_sorted_set_proofs():
+  identities = list(population(5))
+  value = migrate.set_proofs_value(identities)
+  addresses = [elt['args'][0]['string'] for elt in value]
+  assert addresses == sorted(addresses, key=address_bytes)
+  proof = value[0]['args'][1][0]['args'][1]
+  assert proof['prim'] == 'Pair' and proof['args'][1]['args'][1]['prim'] in ('True', 'False')
+  micheline.encode(value)
+
+def test_chunks_stay_under_limits(export):
+  planned = migrate.plan(export, SMALL, margin=0.9)
+  assert len(planned) > 1
+  assert sum(c.identities for c in planned) == 300
+  assert all(c.bytes <= 3600 for c in planned)
+  assert [c.index for c in planned] == list(range(len(planned)))
+  with pytest.raises(migrate.MigrationError):
+    migrate.plan(export, migrate.Limits(bytes=100, gas=1040000, storage=60000))
+
+def test_simulated_plan(export):
+  with MockNode() as node:
+    node.add_block({'hash': 'BHead', 'header': {'level': 10}, 'operations': []})
+    node.set_counter(SOURCE, 41)
+    node.simulate(lambda content: {'status': 'applied', 'consumed_milligas': '1234567',
+      'paid_storage_size_diff': str(len(content['parameters']['value']) * 100)})
+    planned = migrate.plan(export, SMALL, simulate=migrate.Simulator(node.url, SOURCE, STORE))
+    posted = [body for method, _, body in node.requests if method == 'POST']
+  assert all(c.gas == 1235 and c.storage == c.identities * 100 for c in planned)
+  assert len(posted) == len(planned)
+  content = posted[0]['operation']['contents'][0]
+  assert content['counter'] == '42' and content['destination'] == STORE
+  assert posted[0]['chain_id'] == 'NetXdQprcVkpaWU'
+  assert migrate.summary(planned).endswith('(%.6f tez burned)' % (300 * 100 * 250 / 1e6))
+
+def test_failed_simulation(export):
+  with MockNode() as node:
+    node.add_block({'hash': 'BHead', 'header': {'level': 10}, 'operations': []})
+    node.set_counter(SOURCE, 1)
+    node.simulate(lambda content: {'status': 'failed', 'errors': [{'id': 'gas_exhausted'}]})
+    with pytest.raises(migrate.MigrationError, match='gas_exhausted'):
+      migrate.plan(export, SMALL, simulate=migrate.Simulator(node.url, SOURCE, STORE))
+
+def test_run_resumes_from_manifest(export, tmp_path):
+  manifest = str(tmp_path / 'migration.json')
+  submitted = []
+
+  def submit(identities):
+    if len(submitted) == 2:
+      raise migrate.MigrationError('node went away')
+    submitted.append([i.address for i in identities])
+    return 'op%d' % len(submitted)
+
+  with pytest.raises(migrate.MigrationError):
+    migrate.run(export, STORE, manifest, submit, SMALL, log=lambda line: None)
+  with open(manifest) as f:
+    done = [c['operation'] for c in json.load(f)['chunks']]
+  assert done[:3] == ['op1', 'op2', None]
+
+  resumed = []
+  count = migrate.run(export, STORE, manifest, lambda ids: resumed.append(ids) or 'next', SMALL, log=lambda line: None)
+  assert count == len(done) - 2
+  addresses = [a for chunk in submitted for a in chunk] + [i.address for chunk in resumed for i in chunk]
+  assert addresses == [i.address for i in snapshot.read(export)]
+  assert migrate.run(export, STORE, manifest, None, SMALL) == 0
+  with pytest.raises(migrate.MigrationError, match='store'):
+    migrate.run(export, make_address('other', 'KT1'), manifest, None, SMALL)
+
+def test_estimate_matches_the_encoded_parameter():
+  identities = list(population(20))
+  size, gas, _ = migrate.estimate(identities)
+  assert size == micheline.size(migrate.set_proofs_value(identities))
+  assert gas == migrate.COST.gas_base + sum(migrate.cost_of(i)[1] for i in identities)
@@ -0,0 +1,90 @@
+import copy
+
+import pytest
+
+from tools.model import (ADMIN, DEFAULT_COST, PROOFTYPES, USERS, ModelError, Op, Proof, System,
+  random_ops, scenario)
+
+SEEDS = range(20)
+
+def state(system):
+  store, ctrl = system.store, system.ctrl
+  return copy.deepcopy((store.admins, store.identities, store.proofs, ctrl.admins, ctrl.cost, ctrl.kycPlatforms))
+
+def run(seed, count=300):
+  """Yield (op, error, before, system) for a random sequence."""
+  system = System()
+  for op in random_ops(seed, count):
+    before = state(system)
+    error = system.apply(op)
+    yield op, error, before, system
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_identities_index_the_proofs(seed):
+  for _, _, _, system in run(seed):
+    indexed = {(address, prooftype) for address, types in system.store.identities.items() for prooftype in types}
+    assert indexed == set(system.store.proofs)
+    assert all(system.store.identities.values())
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_failed_calls_change_nothing(seed):
+  for _, error, before, system in run(seed):
+    if error is not None:
+      assert state(system) == before
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_admin_entrypoints_reject_other_senders(seed):
+  user_calls = {'registerProof', 'enableKYC', 'enableKYCPlatform'}
+  for op, error, _, system in run(seed):
+    admins = system.store.admins if op.contract == 'store' else system.ctrl.admins
+    if op.entrypoint not in user_calls and op.sender not in admins:
+      assert error == 'Only admin can call this entrypoint'
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_verify_only_flips_verified(seed):
+  for op, error, before, system in run(seed):
+    if op.entrypoint != 'verifyProof' or error is not None:
+      continue
+    key = (op.args['address'], op.args['prooftype'])
+    old, new = before[2][key], system.store.proofs[key]
+    assert new == old._replace(verified=True)
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_check_proofs_requires_every_verified_proof(seed):
+  for op, _, _, system in run(seed, 100):
+    store = system.store
+    for user in USERS:
+      expected = all(store.proofs.get((user, t), Proof(0, False, {})).verified for t in PROOFTYPES[:2])
+      assert store.checkProofs(user, PROOFTYPES[:2], None, op.now) == expected
+      if expected:
+        oldest = min(store.proofs[user, t].register_date for t in PROOFTYPES[:2])
+        assert not store.checkProofs(user, PROOFTYPES[:2], op.now - oldest - 1, op.now)
+
+def test_register_proof():
+  system = System()
+  assert system.apply(Op('ctrl', 'registerProof', 'user0', {'proofType': 'email'}, DEFAULT_COST - 1, 10)) == 'Amount too low'
+  assert system.apply(Op('ctrl', 'registerProof', 'user0', {'proofType': 'email'}, DEFAULT_COST, 10)) is None
+  assert system.store.getProof('user0', 'email') == Proof(10, False, {})
+  assert system.apply(Op('ctrl', 'enableKYC', 'user0', {}, 0, 20)) == 'Missing required proof for this entrypoint'
+  system.ctrl.delAdmin(ADMIN, ADMIN)
+  with pytest.raises(ModelError):
+    system.ctrl.verifyProof(ADMIN, 'user0', 'email')
+
+def test_del_proof():
+  system = System()
+  for prooftype in ('email', 'phone'):
+    system.apply(Op('ctrl', 'registerProof', 'user0', {'proofType': prooftype}, DEFAULT_COST, 10))
+  assert system.apply(Op('store', 'delProof', ADMIN, {'address': 'user0', 'prooftype': 'gov'}, 0, 20)) == 'Missing required proof for this entrypoint'
+  assert system.apply(Op('store', 'delProof', ADMIN, {'address': 'user0', 'prooftype': 'email'}, 0, 20)) is None
+  assert system.store.identities['user0'] == {'phone'}
+  assert system.apply(Op('store', 'delProof', ADMIN, {'address': 'user0', 'prooftype': 'phone'}, 0, 20)) is None
+  assert 'user0' not in system.store.identities
+
+def test_scenario_expects_the_model_failures():
+  ops = list(random_ops(7, 150))
+  system = System()
+  failures = sum(system.apply(op) is not None for op in ops)
+  source = scenario(ops)
+  compile(source, 'differential.py', 'exec')
+  assert source.count('valid = False') == failures
+  assert source.count('scenario += ') == len(ops)
@@ -0,0 +1,33 @@
+import itertools
+
+from tools import snapshot
+from tools.population import identity, population, smartpy_lines
+
+def test_population_is_deterministic_and_sliceable():
+  first = list(population(50, seed=3))
+  assert first == list(population(50, seed=3))
+  assert first[20:30] == list(population(10, seed=3, start=20))
+  assert first != list(population(50, seed=4))
+  assert len({i.address for i in first}) == 50
+
+def test_distributions():
+  identities = list(population(2000, prooftypes={'email': 1.0, 'gov': 0.25}, meta_sizes={0: 1, 3: 1}))
+  gov = sum('gov' in i.proofs for i in identities) / 2000.0
+  assert all('email' in i.proofs for i in identities)
+  assert 0.2 < gov < 0.3
+  sizes = {len(p.meta) for i in identities for p in i.proofs.values()}
+  assert sizes == {0, 3}
+  assert identity(0, prooftypes={'email': 0.0, 'phone': 0.0}).proofs.keys() == {'email'}
+
+def test_snapshot_round_trip(tmp_path):
+  path = str(tmp_path / 'population.jsonl')
+  assert snapshot.write(path, population(100)) == 100
+  assert list(snapshot.read(path)) == list(population(100))
+
+def test_smartpy_literal_is_python():
+  lines = list(smartpy_lines(population(3)))
+  assert lines[0] == 'sp.map({' and lines[-1].startswith('}, tkey = sp.TAddress')
+  compile('\n'.join(lines), 'population', 'eval')
+  # Streams: the first lines come without generating the rest
+  head = list(itertools.islice(smartpy_lines(population(10 ** 9)), 3))
+  assert head[1].startswith('  sp.address("tz1')
@@ -0,0 +1,108 @@
+import json
+import random
+
+import pytest
+
+from tools import batcher, reconcile, snapshot
+from tools.encoding import make_address
+from tools.model import ADMIN, Proof, Store
+from tools.population import population
+from tools.reconcile import Call
+
+STORE = make_address('store', 'KT1')
+
+def mutate(identities, seed):
+  """Desired state: some identities dropped, emptied, edited or added."""
+  rng = random.Random(seed)
+  desired = []
+  for identity in identities:
+    roll = rng.random()
+    if roll < 0.1:
+      continue
+    proofs = dict(identity.proofs)
+    if roll < 0.15:
+      proofs = {}
+    elif roll < 0.4:
+      prooftype = rng.choice(sorted(proofs))
+      if rng.random() < 0.5:
+        del proofs[prooftype]
+      else:
+        proofs[prooftype] = proofs[prooftype]._replace(verified=not proofs[prooftype].verified)
+    desired.append(snapshot.Identity(identity.address, proofs))
+  desired.extend(population(20, seed=seed + 1000))
+  rng.shuffle(desired)
+  return desired
+
+def load(identities):
+  store = Store([ADMIN])
+  for identity in identities:
+    for prooftype, proof in identity.proofs.items():
+      store.setProof(ADMIN, identity.address, prooftype, proof)
+  return store
+
+def apply(store, calls):
+  for call in calls:
+    if call.entrypoint == 'setProof':
+      store.setProof(ADMIN, call.address, call.prooftype, call.proof)
+    elif call.entrypoint == 'delProof':
+      store.delProof(ADMIN, call.address, call.prooftype)
+    else:
+      store.removeIdentity(ADMIN, call.address)
+
+@pytest.fixture
+def snapshots(tmp_path):
+  current = list(population(200, seed=9))
+  desired = mutate(current, 9)
+  paths = str(tmp_path / 'current.jsonl'), str(tmp_path / 'desired.jsonl')
+  snapshot.write(paths[0], current)
+  snapshot.write(paths[1], desired)
+  return paths, current, desired
+
+def test_identity_changes():
+  email, phone = Proof(1, True, {}), Proof(2, False, {'n': '1'})
+  assert list(reconcile.identity_changes('a', {'email': email}, None)) == [Call('removeIdentity', 'a', None, None)]
+  assert list(reconcile.identity_changes('a', {'email': email}, {})) == [Call('removeIdentity', 'a', None, None)]
+  assert list(reconcile.identity_changes('a', None, {})) == []
+  assert list(reconcile.identity_changes('a', {'email': email, 'phone': phone}, {'email': email, 'phone': email})) == [
+    Call('setProof', 'a', 'phone', email)]
+  assert list(reconcile.identity_changes('a', {'email': email, 'phone': phone}, {'phone': phone})) == [
+    Call('delProof', 'a', 'email', None)]
+
+def test_changes_reach_the_desired_state(snapshots):
+  (current_path, desired_path), current, desired = snapshots
+  calls = list(reconcile.changes(reconcile.sorted_identities(current_path), reconcile.sorted_identities(desired_path)))
+  store = load(current)
+  apply(store, calls)
+  assert store.proofs == load(desired).proofs
+  # Unchanged identities cost nothing
+  unchanged = {i.address for i in current} & {i.address for i in desired if i in current}
+  assert not unchanged & {c.address for c in calls}
+
+def test_external_sort_matches_in_memory(snapshots):
+  (current_path, _), current, _ = snapshots
+  expected = sorted(current, key=reconcile.order)
+  assert list(reconcile.sorted_identities(current_path, run=7)) == expected
+  assert list(reconcile.sorted_identities(current_path)) == expected
+
+def test_duplicate_addresses(tmp_path):
+  path = str(tmp_path / 'twice.jsonl')
+  snapshot.write(path, list(population(5)) + list(population(1)))
+  with pytest.raises(reconcile.ReconcileError):
+    list(reconcile.sorted_identities(path, run=2))
+
+def test_groups(snapshots, tmp_path):
+  (current_path, desired_path), _, _ = snapshots
+  output = str(tmp_path / 'groups.jsonl')
+  limits = batcher.Limits(gas=30000, bytes=2000, storage=60000)
+  counts, written = reconcile.reconcile(current_path, desired_path, STORE, output, run=16, limits=limits)
+  with open(output) as f:
+    groups = [json.loads(line) for line in f]
+  assert len(groups) == written
+  assert sum(map(len, groups)) == sum(counts.values())
+  # Groups are the ones tools.batcher packs, under the same cost model
+  calls = [[batcher.Call('Store', t['entrypoint'], t['arg'], None, 0) for t in g] for g in groups]
+  for group in calls:
+    assert sum(batcher.estimate(c)[0] for c in group) <= limits.gas
+    assert batcher.GROUP_BYTES + sum(batcher.estimate(c)[1] for c in group) <= limits.bytes
+  assert {t['entrypoint'] for g in groups for t in g} == {'setProof', 'delProof', 'removeIdentity'}
+  assert groups[0][0]['destination'] == STORE
@@ -0,0 +1,23 @@
+from tools.scenarios import Result, Scenario, discover, report, run, slug
+
+def test_discover_finds_every_scenario():
+  scenarios = discover()
+  assert Scenario('tests/tezid.py', 'Register proof') in scenarios
+  assert Scenario('tests/integrations.py', 'Call getProof from other contract') in scenarios
+  assert Scenario('tests/farm.py', 'Compact positions') in scenarios
+  assert len(scenarios) == len(set(scenarios))
+  assert not [s for s in scenarios if s.module.startswith('tests/test_')]
+
+def test_run_keeps_order_and_reports_failures():
+  scenarios = [Scenario('tests/a.py', 'One'), Scenario('tests/a.py', 'Two')]
+  def runner(scenario, outdir, root):
+    return Result(scenario.module, scenario.name, scenario.name == 'One', 1.0, 'boom\n')
+  results = run(scenarios, 'out', jobs=2, runner=runner)
+  assert [r.name for r in results] == ['One', 'Two']
+  text = report(results, 1.5)
+  assert 'FAIL     1.0s  tests/a.py :: Two' in text
+  assert '---- tests/a.py :: Two\nboom' in text
+  assert text.endswith('1 passed, 1 failed in 1.5s (2.0s of scenario time)')
+
+def test_slug():
+  assert slug('Call getProof from other contract') == 'call_getproof_from_other_contract'
@@ -0,0 +1,93 @@
+import pytest
+
+from tools import micheline
+from tools.build import BuildError
+from tools.size import breakdown, lambda_names, load_budget, main, over_budget, update_budget
+
+def prim(name, *args, annots=None):
+  node = {'prim': name}
+  if args:
+    node['args'] = list(args)
+  if annots:
+    node['annots'] = annots
+  return node
+
+def fail(message):
+  return [prim('PUSH', prim('string'), {'string': message}), prim('FAILWITH')]
+
+def test_pack_vectors():
+  assert micheline.pack(prim('Unit')).hex() == '05030b'
+  assert micheline.pack(prim('Pair', {'int': '1'}, {'int': '2'})).hex() == '05070700010002'
+  assert micheline.pack({'string': 'a'}).hex() == '05010000000161'
+  assert micheline.pack({'int': '-1'}).hex() == '050041'
+  assert micheline.pack({'int': '64'}).hex() == '05008001'
+  assert micheline.pack([]).hex() == '050200000000'
+  assert micheline.encode(prim('nat', annots=['%amount'])).hex() == '046200000007' + b'%amount'.hex()
+  assert micheline.encode(prim('PAIR', {'int': '3'})).hex() == '05420003'
+
+def test_breakdown_splits_dispatch():
+  check = prim('LAMBDA', prim('unit'), prim('unit'), fail('Only admin can call this entrypoint'))
+  script = [
+    prim('parameter', prim('or', prim('unit', annots=['%a']), prim('or', prim('nat', annots=['%b']), prim('string', annots=['%c'])))),
+    prim('storage', prim('unit')),
+    prim('code', [
+      check, prim('SWAP'), prim('UNPAIR'),
+      prim('IF_LEFT', [prim('DROP')], [prim('IF_LEFT', [prim('DROP'), prim('DROP')], fail('x'))]),
+      prim('NIL', prim('operation')), prim('PAIR'),
+    ]),
+    prim('view', {'string': 'getProof'}, prim('unit'), prim('unit'), [prim('CDR')]),
+  ]
+  names = lambda_names("""
+  @sp.private_lambda(with_storage='read-only', wrap_call=True)
+  def checkAdmin(self):
+    sp.verify(self.data.admins.contains(sp.sender), 'Only admin can call this entrypoint')
+
+  @sp.entry_point
+  def a(self):
+    pass
+""")
+  assert names == {'Only admin can call this entrypoint': 'checkAdmin'}
+  rows = dict(breakdown(script, names))
+  assert rows == {
+    'lambda checkAdmin': micheline.size(check),
+    'a': micheline.size([prim('DROP')]),
+    'b': micheline.size([prim('DROP'), prim('DROP')]),
+    'c': micheline.size(fail('x')),
+    'view getProof': micheline.size(script[3]),
+  }
+
+def test_over_budget():
+  result = {'script': 1200, 'storage': 100, 'rows': [('registerProof', 300)]}
+  budget = {'controller': {'script': 1000, 'storage': 100, 'registerProof': 200}}
+  assert over_budget('controller', result, budget) == [
+    'controller registerProof: 300 > 200 bytes',
+    'controller script: 1200 > 1000 bytes',
+  ]
+  assert over_budget('store', result, budget) == []
+
+def test_missing_budget_fails(tmp_path, capsys):
+  path = str(tmp_path / 'budget.json')
+  with pytest.raises(BuildError):
+    load_budget(path)
+  assert load_budget(path, missing_ok=True) == {}
+  # Fails before building anything
+  assert main(['--budget', path]) == 1
+  assert '--update' in capsys.readouterr().err
+
+def test_update_budget_keeps_row_limits():
+  budget = {'controller': {'script': 1000, 'registerProof': 200}}
+  update_budget(budget, 'controller', {'script': 1200, 'storage': 100, 'rows': []})
+  update_budget(budget, 'store', {'script': 900, 'storage': 50, 'rows': []})
+  assert budget == {
+    'controller': {'script': 1200, 'storage': 100, 'registerProof': 200},
+    'store': {'script': 900, 'storage': 50},
+  }
+
+def test_update_budget_with_headroom():
+  budget = {}
+  rows = [('registerProof', 300), ('lambda checkAdmin', 101), ('lambda #3', 50), ('view getProof', 40)]
+  update_budget(budget, 'controller', {'script': 1000, 'storage': 100, 'rows': rows}, headroom=0.05)
+  assert budget == {'controller': {
+    'script': 1050, 'storage': 105, 'registerProof': 315, 'lambda checkAdmin': 107, 'view getProof': 42}}
+  result = {'script': 1040, 'storage': 100, 'rows': [('registerProof', 316)]}
+  assert over_budget('controller', result, budget) == ['controller registerProof: 316 > 315 bytes']
@@ -5,6 +5,7 @@ cwd = os.getcwd()
 Types = sp.io.import_script_from_url("file://%s/contracts/types.py" % cwd)
 Store = sp.io.import_script_from_url("file://%s/contracts/store.py" % cwd)
 Controller = sp.io.import_script_from_url("file://%s/contracts/controller.py" % cwd)
+Targets = sp.io.import_script_from_url("file://%s/tests/targets.py" % cwd)
 
 ## Tests
 #
@@ -15,6 +16,7 @@ def init(admin, scenario):
   store = Store.TezIDStore(
     sp.set([admin.address]), 
     sp.big_map(), 
+    sp.big_map(), 
     sp.big_map(
       {
         "": sp.utils.bytes_of_string("tezos-storage:content"),
@@ -37,7 +39,10 @@ def init(admin, scenario):
   scenario += store.addAdmin(ctrl.address).run(sender = admin)
   return store, ctrl
 
-@sp.add_target(name = "Register proof", kind=allKind)
+def proofKey(address, prooftype):
+  return sp.record(address = address, prooftype = prooftype)
+
+@Targets.addTarget(name = "Register proof", kind=allKind)
 def test():
   admin = sp.test_account("admin")
   user = sp.test_account("User")
@@ -49,7 +54,7 @@ def test():
   #
   scenario += ctrl.registerProof('phone').run(sender=user, amount=sp.tez(5))
   scenario.verify(store.data.identities.contains(user.address))
-  scenario.verify(store.data.identities[user.address]['phone'].verified == False)
+  scenario.verify(store.data.proofs[proofKey(user.address, 'phone')].verified == False)
 
   ## Too low fee results in failure
   #
@@ -59,9 +64,9 @@ def test():
   #
   scenario += ctrl.registerProofAdmin(sp.record(address=user.address, proofType='yolo')).run(sender=admin)
   scenario.verify(store.data.identities.contains(user.address))
-  scenario.verify(store.data.identities[user.address]['yolo'].verified == False)
+  scenario.verify(store.data.proofs[proofKey(user.address, 'yolo')].verified == False)
   
-@sp.add_target(name = "Verify proof", kind=allKind)
+@Targets.addTarget(name = "Verify proof", kind=allKind)
 def test():
   admin = sp.test_account("admin")
   user = sp.test_account("User")
@@ -75,18 +80,137 @@ def test():
   ## Admin can verify a proof
   #
   scenario += ctrl.verifyProof(sp.record(address=user.address,prooftype='email')).run(sender = admin)
-  scenario.verify(store.data.identities[user.address]['email'].verified == True)
+  scenario.verify(store.data.proofs[proofKey(user.address, 'email')].verified == True)
 
   ## User cannot verify a proof
   #
   scenario += ctrl.verifyProof(sp.record(address=user.address, prooftype='phone')).run(sender = user, valid = False)
-  scenario.verify(store.data.identities[user.address]['phone'].verified == False)
+  scenario.verify(store.data.proofs[proofKey(user.address, 'phone')].verified == False)
   
   ## Admin cannot verif a proof that is not added by a user first
   #
   scenario += ctrl.verifyProof(sp.record(address=user.address,prooftype='twitter')).run(sender = admin, valid = False)
     
-@sp.add_target(name = "Remove proof", kind=allKind)
+@Targets.addTarget(name = "Verify proofs in batch", kind=allKind)
+def test():
+  admin = sp.test_account("admin")
+  user1 = sp.test_account("User1")
+  user2 = sp.test_account("User2")
+
+  scenario = sp.test_scenario()
+  store, ctrl = init(admin, scenario)
+  scenario += ctrl.registerProof('email').run(sender = user1, amount = sp.tez(5))
+  scenario += ctrl.registerProof('phone').run(sender = user1, amount = sp.tez(5))
+  scenario += ctrl.registerProof('email').run(sender = user2, amount = sp.tez(5))
+  scenario += ctrl.setProofMeta(sp.record(address=user2.address, prooftype="email", key="domain", value="tezid.net")).run(sender = admin)
+
+  ## Admin can verify several proofs in one call
+  #
+  batch = [proofKey(user1.address, 'email'), proofKey(user1.address, 'phone'), proofKey(user2.address, 'email')]
+  scenario += ctrl.verifyProofs(batch).run(sender = admin)
+  scenario.verify(store.data.proofs[proofKey(user1.address, 'email')].verified)
+  scenario.verify(store.data.proofs[proofKey(user1.address, 'phone')].verified)
+  scenario.verify(store.data.proofs[proofKey(user2.address, 'email')].verified)
+  scenario.verify_equal(store.data.proofs[proofKey(user2.address, 'email')].meta['domain'], "tezid.net")
+
+  ## A key listed twice is verified once, in order with the rest
+  #
+  scenario += ctrl.registerProof('phone').run(sender = user2, amount = sp.tez(5))
+  batch = [proofKey(user2.address, 'phone'), proofKey(user1.address, 'email'), proofKey(user2.address, 'phone')]
+  scenario += ctrl.verifyProofs(batch).run(sender = admin)
+  scenario.verify(store.data.proofs[proofKey(user2.address, 'phone')].verified)
+  scenario.verify_equal(sp.len(store.data.identities[user2.address]), 2)
+
+  ## User cannot verify proofs
+  #
+  scenario += ctrl.verifyProofs([proofKey(user2.address, 'email')]).run(sender = user2, valid = False)
+
+  ## A batch with a missing proof is rejected as a whole
+  #
+  scenario += ctrl.registerProof('phone').run(sender = user2, amount = sp.tez(5))
+  batch = [proofKey(user2.address, 'phone'), proofKey(user2.address, 'twitter')]
+  scenario += ctrl.verifyProofs(batch).run(sender = admin, valid = False, exception = 'Missing required proof for this entrypoint')
+  scenario.verify(store.data.proofs[proofKey(user2.address, 'phone')].verified == False)
+
+@Targets.addTarget(name = "Set proof batch", kind=allKind)
+def test():
+  admin = sp.test_account("admin")
+  user1 = sp.test_account("User1")
+  user2 = sp.test_account("User2")
+
+  scenario = sp.test_scenario()
+  store, ctrl = init(admin, scenario)
+  scenario += ctrl.registerProof('email').run(sender = user1, amount = sp.tez(5))
+  scenario += ctrl.setProofMeta(sp.record(address=user1.address, prooftype="email", key="domain", value="tezid.net")).run(sender = admin)
+
+  ## Admin can upsert several proofs without clobbering others
+  #
+  batch = [
+    sp.record(address = user1.address, prooftype = 'phone', proof = sp.record(register_date = sp.timestamp(0), verified = True, meta = {})),
+    sp.record(address = user2.address, prooftype = 'gov', proof = sp.record(register_date = sp.timestamp(0), verified = True, meta = { 'kyc': 'true' })),
+    sp.record(address = user2.address, prooftype = 'email', proof = sp.record(register_date = sp.timestamp(0), verified = False, meta = {}))
+  ]
+  scenario += store.setProofBatch(batch).run(sender = admin)
+  scenario.verify(store.data.proofs[proofKey(user1.address, 'phone')].verified)
+  scenario.verify_equal(store.data.proofs[proofKey(user1.address, 'email')].meta['domain'], "tezid.net")
+  scenario.verify(store.data.identities[user1.address].contains('email'))
+  scenario.verify(store.data.identities[user1.address].contains('phone'))
+  scenario.verify_equal(sp.len(store.data.identities[user2.address]), 2)
+
+  ## Existing proofs are replaced
+  #
+  update = [
+    sp.record(address = user2.address, prooftype = 'email', proof = sp.record(register_date = sp.timestamp(10), verified = True, meta = {}))
+  ]
+  scenario += store.setProofBatch(update).run(sender = admin)
+  scenario.verify(store.data.proofs[proofKey(user2.address, 'email')].verified)
+  scenario.verify(store.data.proofs[proofKey(user2.address, 'gov')].verified)
+
+  ## User cannot set proofs
+  #
+  scenario += store.setProofBatch(update).run(sender = user2, valid = False)
+
+@Targets.addTarget(name = "Patch proofs", kind=allKind)
+def test():
+  admin = sp.test_account("admin")
+  user = sp.test_account("User")
+
+  def patch(prooftype, create = False, register_date = sp.none, verified = sp.none, meta = {}):
+    return sp.record(address = user.address, prooftype = prooftype, create = create, register_date = register_date, verified = verified, meta = meta)
+
+  scenario = sp.test_scenario()
+  store, ctrl = init(admin, scenario)
+
+  ## Admin can create a proof with a patch
+  #
+  scenario += store.patchProofs([patch('email', create = True, meta = { 'domain': sp.some('tezid.net'), 'handle': sp.some('@tezid') })]).run(sender = admin, now = sp.timestamp(10))
+  scenario.verify(store.data.identities[user.address].contains('email'))
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'email')].register_date, sp.timestamp(10))
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'email')].verified, False)
+
+  ## Patches only touch the given fields
+  #
+  scenario += store.patchProofs([patch('email', verified = sp.some(True), meta = { 'handle': sp.none })]).run(sender = admin, now = sp.timestamp(20))
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'email')].register_date, sp.timestamp(10))
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'email')].verified, True)
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'email')].meta['domain'], 'tezid.net')
+  scenario.verify(store.data.proofs[proofKey(user.address, 'email')].meta.contains('handle') == False)
+  scenario += store.patchProofs([patch('email', register_date = sp.some(sp.timestamp(30)))]).run(sender = admin)
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'email')].register_date, sp.timestamp(30))
+
+  ## Patching a missing proof without create fails
+  #
+  scenario += store.patchProofs([patch('phone', verified = sp.some(True))]).run(sender = admin, valid = False, exception = 'Missing required proof for this entrypoint')
+
+  ## User cannot patch proofs
+  #
+  scenario += store.patchProofs([patch('email', verified = sp.some(True))]).run(sender = user, valid = False)
+
+  ## User cannot enable KYC without a gov proof
+  #
+  scenario += ctrl.enableKYC().run(sender = user, valid = False, exception = 'Missing required proof for this entrypoint')
+
+@Targets.addTarget(name = "Remove proof", kind=allKind)
 def test():
   admin = sp.test_account("admin")
   user = sp.test_account("User")
@@ -113,7 +237,18 @@ def test():
   scenario.verify(store.data.identities[user.address].contains('email') == False)
   scenario.verify(store.data.identities[user.address].contains('phone') == True)
 
-@sp.add_target(name = "Remove identity", kind=allKind)
+  ## A proof that does not exist cannot be removed
+  #
+  scenario += ctrl.removeProof(to_remove).run(sender = admin, valid = False, exception = 'Missing required proof for this entrypoint')
+  scenario += store.delProof(sp.record(address = user.address, prooftype = 'twitter')).run(sender = admin, valid = False, exception = 'Missing required proof for this entrypoint')
+
+  ## Removing the last proof removes the identity
+  #
+  scenario += ctrl.removeProof(sp.record(prooftype='phone', address=user.address)).run(sender = admin)
+  scenario.verify(store.data.identities.contains(user.address) == False)
+  scenario.verify(store.data.proofs.contains(proofKey(user.address, 'phone')) == False)
+
+@Targets.addTarget(name = "Remove identity", kind=allKind)
 def test():
   admin = sp.test_account("admin")
   user = sp.test_account("User")
@@ -133,8 +268,83 @@ def test():
   #
   scenario += ctrl.removeIdentity(user.address).run(sender = admin, amount = sp.tez(5))
   scenario.verify(store.data.identities.contains(user.address) == False)
+  scenario.verify(store.data.proofs.contains(proofKey(user.address, 'email')) == False)
 
-@sp.add_target(name = "Set cost", kind=allKind)
+@Targets.addTarget(name = "Attest proof", kind=allKind)
+def test():
+  admin = sp.test_account("admin")
+  user = sp.test_account("User")
+  verifier = sp.test_account("Verifier")
+  chain = sp.chain_id_cst("0x9caecab9")
+
+  scenario = sp.test_scenario()
+  store, ctrl = init(admin, scenario)
+
+  def attestation(prooftype, nonce, verified = True, meta = {}, expiry = 100):
+    return sp.record(address = user.address, prooftype = prooftype, verified = verified, meta = sp.map(meta, tkey = sp.TString, tvalue = sp.TString), expiry = sp.timestamp(expiry), nonce = nonce)
+
+  def signed(attestation, signer = verifier, chain_id = chain, controller = None):
+    payload = sp.record(attestation = attestation, chain_id = chain_id, controller = controller if controller is not None else ctrl.address)
+    signature = sp.make_signature(signer.secret_key, scenario.compute(sp.pack(payload)), message_format = 'Raw')
+    return sp.record(attestation = attestation, signature = signature)
+
+  ## Attestations need a verifier key
+  #
+  scenario += ctrl.attestProof(signed(attestation('email', 0))).run(sender = user, amount = sp.tez(5), now = sp.timestamp(10), chain_id = chain, valid = False, exception = 'No verifier')
+  scenario += ctrl.setVerifier(sp.some(verifier.public_key)).run(sender = user, valid = False)
+  scenario += ctrl.setVerifier(sp.some(verifier.public_key)).run(sender = admin)
+
+  ## A user can submit an attestation signed by the verifier
+  #
+  first = signed(attestation('email', 0, meta = { 'handle': '@tezid' }))
+  scenario += ctrl.attestProof(first).run(sender = user, amount = sp.tez(5), now = sp.timestamp(10), chain_id = chain)
+  scenario.verify(store.data.identities[user.address].contains('email'))
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'email')].verified, True)
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'email')].register_date, sp.timestamp(10))
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'email')].meta['handle'], '@tezid')
+  scenario.verify_equal(ctrl.data.nonces[user.address], 1)
+
+  ## Attestations pay the cost of their prooftype, like registerProof
+  #
+  scenario += ctrl.attestProof(signed(attestation('phone', 1))).run(sender = user, amount = sp.tez(4), now = sp.timestamp(10), chain_id = chain, valid = False, exception = 'Amount too low')
+  scenario += ctrl.setCost(sp.record(proofType = 'phone', cost = sp.tez(1))).run(sender = admin)
+  scenario += ctrl.attestProof(signed(attestation('phone', 1))).run(sender = user, amount = sp.tez(0), now = sp.timestamp(10), chain_id = chain, valid = False, exception = 'Amount too low')
+
+  ## An attestation cannot be replayed
+  #
+  scenario += ctrl.attestProof(first).run(sender = user, amount = sp.tez(5), now = sp.timestamp(20), chain_id = chain, valid = False, exception = 'Invalid nonce')
+  scenario += ctrl.attestProof(signed(attestation('phone', 2))).run(sender = user, amount = sp.tez(5), now = sp.timestamp(20), chain_id = chain, valid = False, exception = 'Invalid nonce')
+
+  ## An attestation signed for another chain or controller is rejected
+  #
+  scenario += ctrl.attestProof(signed(attestation('phone', 1), chain_id = sp.chain_id_cst("0x00000000"))).run(sender = user, amount = sp.tez(5), now = sp.timestamp(20), chain_id = chain, valid = False, exception = 'Invalid signature')
+  scenario += ctrl.attestProof(signed(attestation('phone', 1), controller = store.address)).run(sender = user, amount = sp.tez(5), now = sp.timestamp(20), chain_id = chain, valid = False, exception = 'Invalid signature')
+
+  ## Only the verifier can sign and the signed fields cannot be changed
+  #
+  scenario += ctrl.attestProof(signed(attestation('phone', 1), signer = user)).run(sender = user, amount = sp.tez(5), now = sp.timestamp(20), chain_id = chain, valid = False, exception = 'Invalid signature')
+  forged = signed(attestation('phone', 1, verified = False))
+  scenario += ctrl.attestProof(sp.record(attestation = attestation('phone', 1), signature = forged.signature)).run(sender = user, amount = sp.tez(5), now = sp.timestamp(20), chain_id = chain, valid = False, exception = 'Invalid signature')
+
+  ## Expired attestations are rejected
+  #
+  scenario += ctrl.attestProof(signed(attestation('phone', 1))).run(sender = user, amount = sp.tez(5), now = sp.timestamp(101), chain_id = chain, valid = False, exception = 'Attestation expired')
+
+  ## Anyone can relay an attestation, nonces follow each other
+  #
+  scenario += ctrl.attestProof(signed(attestation('phone', 1))).run(sender = admin, amount = sp.tez(5), now = sp.timestamp(30), chain_id = chain)
+  scenario += ctrl.attestProof(signed(attestation('email', 2, verified = False))).run(sender = user, amount = sp.tez(5), now = sp.timestamp(40), chain_id = chain)
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'phone')].verified, True)
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'email')].verified, False)
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'email')].meta['handle'], '@tezid')
+  scenario.verify_equal(ctrl.data.nonces[user.address], 3)
+
+  ## Removing the verifier disables attestations
+  #
+  scenario += ctrl.setVerifier(sp.none).run(sender = admin)
+  scenario += ctrl.attestProof(signed(attestation('gov', 3))).run(sender = user, amount = sp.tez(5), now = sp.timestamp(50), chain_id = chain, valid = False, exception = 'No verifier')
+
+@Targets.addTarget(name = "Set cost", kind=allKind)
 def test():
   admin = sp.test_account("admin")
   user = sp.test_account("User")
@@ -159,7 +369,7 @@ def test():
   scenario += ctrl.registerProof('phone').run(sender = user, amount = sp.tez(8), valid = False)
   scenario += ctrl.registerProof('phone').run(sender = user, amount = sp.tez(9))
   
-@sp.add_target(name = "Send", kind=allKind)
+@Targets.addTarget(name = "Send", kind=allKind)
 def test():
   admin = sp.test_account("admin")
   user = sp.test_account("User")
@@ -178,7 +388,7 @@ def test():
   #
   scenario += ctrl.send(sp.record(receiverAddress=receiver.address, amount=sp.tez(2))).run(sender = user, valid = False)
     
-@sp.add_target(name = "Store send", kind=allKind)
+@Targets.addTarget(name = "Store send", kind=allKind)
 def test():
   admin = sp.test_account("admin")
   user = sp.test_account("User")
@@ -194,7 +404,7 @@ def test():
   scenario.verify_equal(store.balance, sp.tez(5))
   scenario.verify_equal(ctrl.balance, sp.tez(0))
 
-@sp.add_target(name = "Set admin", kind=allKind)
+@Targets.addTarget(name = "Set admin", kind=allKind)
 def test():
   admin = sp.test_account("admin")
   admin2 = sp.test_account("admin2")
@@ -223,14 +433,14 @@ def test():
   #
   scenario += store.addAdmin(user.address).run(sender = user, valid=False)
   
-@sp.add_target(name = "Set store", kind=allKind)
+@Targets.addTarget(name = "Set store", kind=allKind)
 def test():
   admin = sp.test_account("admin")
   user = sp.test_account("User")
 
   scenario = sp.test_scenario()
   store, ctrl = init(admin, scenario)
-  store2 = Store.TezIDStore(sp.set([admin.address]), sp.big_map(), sp.big_map())
+  store2 = Store.TezIDStore(sp.set([admin.address]), sp.big_map(), sp.big_map(), sp.big_map())
   scenario += store2
 
   ## Admin can update store
@@ -243,7 +453,7 @@ def test():
   #
   scenario += ctrl.setStore(store.address).run(sender = user, valid = False)
     
-@sp.add_target(name = "Set baker", kind=allKind)
+@Targets.addTarget(name = "Set baker", kind=allKind)
 def test():
   admin = sp.test_account("admin")
   user = sp.test_account("User")
@@ -273,7 +483,7 @@ def test():
   #
   scenario += store.setBaker(sp.some(baker)).run(sender = user, voting_powers = voting_powers, valid=False)
   
-@sp.add_target(name = "Set proof metadata", kind=allKind)
+@Targets.addTarget(name = "Set proof metadata", kind=allKind)
 def test():
   admin = sp.test_account("admin")
   user = sp.test_account("User")
@@ -285,15 +495,15 @@ def test():
   #
   scenario += ctrl.registerProof('twitter').run(sender = user, amount = sp.tez(5))
   scenario += ctrl.setProofMeta(sp.record(address=user.address, prooftype="twitter", key="handle", value="@asbjornenge")).run(sender = admin)
-  scenario.verify_equal(store.data.identities[user.address]['twitter'].meta['handle'], "@asbjornenge")
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'twitter')].meta['handle'], "@asbjornenge")
   
   ## Updating proof should keep metadata
   #
   scenario += ctrl.verifyProof(sp.record(address=user.address, prooftype="twitter")).run(sender = admin)
-  scenario.verify_equal(store.data.identities[user.address]['twitter'].verified, True)
-  scenario.verify_equal(store.data.identities[user.address]['twitter'].meta['handle'], "@asbjornenge")
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'twitter')].verified, True)
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'twitter')].meta['handle'], "@asbjornenge")
 
-@sp.add_target(name = "Enable KYC metadata", kind=allKind)
+@Targets.addTarget(name = "Enable KYC metadata", kind=allKind)
 def test():
   admin = sp.test_account("admin")
   user = sp.test_account("User")
@@ -305,19 +515,19 @@ def test():
   #
   scenario += ctrl.registerProof('gov').run(sender = user, amount = sp.tez(5))
   scenario += ctrl.enableKYC().run(sender = user)
-  scenario.verify_equal(store.data.identities[user.address]['gov'].meta['kyc'], "true")
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'gov')].meta['kyc'], "true")
   
   ## Verify proof should keep KYC metadata
   #
   scenario += ctrl.verifyProof(sp.record(address=user.address, prooftype="gov")).run(sender = admin)
-  scenario.verify_equal(store.data.identities[user.address]['gov'].verified, True)
-  scenario.verify_equal(store.data.identities[user.address]['gov'].meta['kyc'], "true")
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'gov')].verified, True)
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'gov')].meta['kyc'], "true")
 
   ## Renewing proof should keep KYC metadata
   #
   scenario += ctrl.registerProof('gov').run(sender = user, amount = sp.tez(5))
-  scenario.verify_equal(store.data.identities[user.address]['gov'].verified, False)
-  scenario.verify_equal(store.data.identities[user.address]['gov'].meta['kyc'], "true")
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'gov')].verified, False)
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'gov')].meta['kyc'], "true")
 
   ## Admin can set supported KYC platforms
   #
@@ -327,14 +537,14 @@ def test():
   ## User can enable supported KYC platforms
   #
   scenario += ctrl.enableKYCPlatform('kyc_crunchy').run(sender = user)
-  scenario.verify_equal(store.data.identities[user.address]['gov'].meta['kyc_crunchy'], "true")
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'gov')].meta['kyc_crunchy'], "true")
 
   ## User cannot enable unsupported KYC platforms
   #
   scenario += ctrl.enableKYCPlatform('kyc_yolo').run(sender = user, valid = False)
   scenario += ctrl.enableKYCPlatform('kyc').run(sender = user, valid = False)
 
-@sp.add_target(name = "Updateable lambdas", kind=allKind)
+@Targets.addTarget(name = "Updateable lambdas", kind=allKind)
 def test():
   admin = sp.test_account("admin")
   user = sp.test_account("User")
@@ -352,3 +562,62 @@ def test():
     sp.result(storage.value)
   scenario += store.triggerLambda(sp.record(logic=sp.build_lambda(logic), params=sp.pack(user.address))).run(sender=admin)
   scenario.verify(store.data.admins.contains(user.address))
+
+@Targets.addTarget(name = "Set proofs", kind=allKind)
+def test():
+  admin = sp.test_account("admin")
+  user = sp.test_account("User")
+
+  scenario = sp.test_scenario()
+  store, ctrl = init(admin, scenario)
+  scenario += ctrl.registerProof('email').run(sender = user, amount = sp.tez(5))
+  scenario += ctrl.registerProof('phone').run(sender = user, amount = sp.tez(5))
+
+  ## Admin can overwrite all proofs for an address
+  #
+  proofs = {
+    user.address: {
+      'gov': sp.record(register_date = sp.timestamp(0), verified = True, meta = { 'kyc': 'true' })
+    }
+  }
+  scenario += store.setProofs(proofs).run(sender = admin)
+  scenario.verify(store.data.identities[user.address].contains('gov'))
+  scenario.verify(store.data.identities[user.address].contains('email') == False)
+  scenario.verify(store.data.proofs.contains(proofKey(user.address, 'phone')) == False)
+  scenario.verify_equal(store.data.proofs[proofKey(user.address, 'gov')].meta['kyc'], 'true')
+
+  ## Views read from the per-proof layout
+  #
+  scenario.verify(store.getProof(proofKey(user.address, 'gov')).open_some().verified)
+  scenario.verify(store.getProof(proofKey(user.address, 'email')).is_some() == False)
+  scenario.verify(store.getProofsForAddress(user.address).contains('gov'))
+
+  ## User cannot overwrite proofs
+  #
+  scenario += store.setProofs(proofs).run(sender = user, valid = False)
+
+@Targets.addTarget(name = "Import identities", kind=allKind)
+def test():
+  admin = sp.test_account("admin")
+  user1 = sp.test_account("User1")
+  user2 = sp.test_account("User2")
+
+  scenario = sp.test_scenario()
+  legacy, ctrl = init(admin, scenario)
+  scenario += ctrl.registerProof('email').run(sender = user1, amount = sp.tez(5))
+  scenario += ctrl.registerProof('phone').run(sender = user1, amount = sp.tez(5))
+  scenario += ctrl.verifyProof(sp.record(address=user1.address, prooftype='email')).run(sender = admin)
+  scenario += ctrl.registerProof('gov').run(sender = user2, amount = sp.tez(5))
+  store = Store.TezIDStore(sp.set([admin.address]), sp.big_map(), sp.big_map(), sp.big_map())
+  scenario += store
+
+  ## Admin can import identities from any store exposing getProofsForAddress
+  #
+  scenario += store.importIdentities(sp.record(source=legacy.address, addresses=[user1.address, user2.address])).run(sender = admin)
+  scenario.verify_equal(store.data.proofs[proofKey(user1.address, 'email')].verified, True)
+  scenario.verify_equal(store.data.proofs[proofKey(user1.address, 'phone')].verified, False)
+  scenario.verify(store.data.identities[user2.address].contains('gov'))
+
+  ## User cannot import identities
+  #
+  scenario += store.importIdentities(sp.record(source=legacy.address, addresses=[user1.address])).run(sender = user1, valid = False)
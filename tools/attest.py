@@ -0,0 +1,231 @@
+"""Sign proof attestations for TezIDController.attestProof.
+
+The verifier key registered with setVerifier signs, off-chain, the PACK of
+
+  (attestation = (address, prooftype, verified, meta, expiry, nonce),
+   chain_id, controller)
+
+and the user submits the attestation with its signature. Binding the chain
+and the controller keeps an attestation from being replayed elsewhere, and
+`nonce` must equal the next nonce the controller holds for `address`, so
+each attestation applies once and in order.
+
+  python -m tools.attest key                    # edpk and tz1 of the verifier key
+  python -m tools.attest sign tz1... email --controller KT1... --chain-id NetXdQprcVkpaWU \\
+    --nonce 0 --expiry 2024-01-01T00:00:00Z [--unverified] [--meta handle=@tezid]
+
+The secret key (edsk...) is read from TEZID_VERIFIER_SECRET. `sign` prints
+the attestProof argument for `octez-client transfer ... --arg`; the
+transfer amount is the cost of the prooftype, as for registerProof.
+
+Ed25519 is implemented here from RFC 8032 so the helper has no
+dependencies. It is slow, but fast enough to sign attestations one by one.
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+from collections import namedtuple
+
+from tools import micheline
+from tools import michelson as m
+from tools.encoding import PREFIXES, address_bytes, b58decode_check, b58encode_check
+from tools.snapshot import seconds
+
+# Prefix of the 64 byte (seed and public key) form of an edsk secret key
+EDSK_EXPANDED = bytes([43, 246, 78, 7])
+
+Attestation = namedtuple('Attestation', ['address', 'prooftype', 'verified', 'meta', 'expiry', 'nonce'])
+
+## Ed25519 (RFC 8032)
+#
+
+P = 2 ** 255 - 19
+L = 2 ** 252 + 27742317777372353535851937790883648493
+D = -121665 * pow(121666, P - 2, P) % P
+SQRT_M1 = pow(2, (P - 1) // 4, P)
+
+def recover_x(y, sign):
+  if y >= P:
+    return None
+  x2 = (y * y - 1) * pow(D * y * y + 1, P - 2, P)
+  if x2 == 0:
+    return None if sign else 0
+  x = pow(x2, (P + 3) // 8, P)
+  if (x * x - x2) % P != 0:
+    x = x * SQRT_M1 % P
+  if (x * x - x2) % P != 0:
+    return None
+  if (x & 1) != sign:
+    x = P - x
+  return x
+
+G_Y = 4 * pow(5, P - 2, P) % P
+G = (recover_x(G_Y, 0), G_Y, 1, recover_x(G_Y, 0) * G_Y % P)
+IDENTITY = (0, 1, 1, 0)
+
+def point_add(a, b):
+  # Extended coordinates (X, Y, Z, T) with x = X/Z, y = Y/Z, x*y = T/Z
+  A = (a[1] - a[0]) * (b[1] - b[0]) % P
+  B = (a[1] + a[0]) * (b[1] + b[0]) % P
+  C = 2 * a[3] * b[3] * D % P
+  Dz = 2 * a[2] * b[2] % P
+  E, F, G_, H = B - A, Dz - C, Dz + C, B + A
+  return (E * F % P, G_ * H % P, F * G_ % P, E * H % P)
+
+def point_mul(scalar, point):
+  result = IDENTITY
+  while scalar > 0:
+    if scalar & 1:
+      result = point_add(result, point)
+    point = point_add(point, point)
+    scalar >>= 1
+  return result
+
+def point_equal(a, b):
+  return (a[0] * b[2] - b[0] * a[2]) % P == 0 and (a[1] * b[2] - b[1] * a[2]) % P == 0
+
+def compress(point):
+  zinv = pow(point[2], P - 2, P)
+  x, y = point[0] * zinv % P, point[1] * zinv % P
+  return (y | ((x & 1) << 255)).to_bytes(32, 'little')
+
+def decompress(data):
+  y = int.from_bytes(data, 'little')
+  sign, y = y >> 255, y & ((1 << 255) - 1)
+  x = recover_x(y, sign)
+  if x is None:
+    return None
+  return (x, y, 1, x * y % P)
+
+def sha512_int(*parts):
+  return int.from_bytes(hashlib.sha512(b''.join(parts)).digest(), 'little')
+
+def expand(seed):
+  digest = hashlib.sha512(seed).digest()
+  scalar = int.from_bytes(digest[:32], 'little')
+  scalar &= (1 << 254) - 8
+  scalar |= 1 << 254
+  return scalar, digest[32:]
+
+def public_key(seed):
+  return compress(point_mul(expand(seed)[0], G))
+
+def sign_bytes(seed, message):
+  scalar, prefix = expand(seed)
+  public = compress(point_mul(scalar, G))
+  r = sha512_int(prefix, message) % L
+  R = compress(point_mul(r, G))
+  s = (r + sha512_int(R, public, message) % L * scalar) % L
+  return R + s.to_bytes(32, 'little')
+
+def verify_bytes(public, message, signature):
+  if len(signature) != 64:
+    return False
+  A, R = decompress(public), decompress(signature[:32])
+  s = int.from_bytes(signature[32:], 'little')
+  if A is None or R is None or s >= L:
+    return False
+  h = sha512_int(signature[:32], public, message) % L
+  return point_equal(point_mul(s, G), point_add(R, point_mul(h, A)))
+
+## Tezos keys
+#
+
+def seed(secret):
+  """The 32 byte seed of an edsk secret key, in its seed (54) or expanded (98) form."""
+  if len(secret) == 98:
+    return b58decode_check(secret, EDSK_EXPANDED)[:32]
+  return b58decode_check(secret, PREFIXES['edsk'])
+
+def edpk(secret):
+  return b58encode_check(public_key(seed(secret)), PREFIXES['edpk'])
+
+def tz1(public):
+  """Address of an edpk public key."""
+  raw = b58decode_check(public, PREFIXES['edpk'])
+  return b58encode_check(hashlib.blake2b(raw, digest_size=20).digest(), PREFIXES['tz1'])
+
+def digest(message):
+  # Tezos signs, and CHECK_SIGNATURE verifies, the Blake2b hash of the message
+  return hashlib.blake2b(message, digest_size=32).digest()
+
+## Attestations
+#
+
+def tree(values):
+  if len(values) == 1:
+    return values[0]
+  split = len(values) // 2
+  return {'prim': 'Pair', 'args': [tree(values[:split]), tree(values[split:])]}
+
+def payload(attestation, controller, chain_id):
+  """TAttestationPayload as PACK sees it: records laid out as SmartPy does, addresses in binary."""
+  a = attestation
+  meta = [{'prim': 'Elt', 'args': [{'string': k}, {'string': a.meta[k]}]} for k in sorted(a.meta)]
+  fields = {
+    'address': {'bytes': address_bytes(a.address).hex()},
+    'expiry': {'int': str(a.expiry)},
+    'meta': meta,
+    'nonce': {'int': str(a.nonce)},
+    'prooftype': {'string': a.prooftype},
+    'verified': {'prim': 'True' if a.verified else 'False'},
+  }
+  return tree([
+    tree([fields[name] for name in sorted(fields)]),
+    {'bytes': b58decode_check(chain_id, PREFIXES['Net']).hex()},
+    {'bytes': address_bytes(controller).hex()},
+  ])
+
+def sign(secret, attestation, controller, chain_id):
+  """edsig signature of `attestation` for `controller` on `chain_id`."""
+  message = digest(micheline.pack(payload(attestation, controller, chain_id)))
+  return b58encode_check(sign_bytes(seed(secret), message), PREFIXES['edsig'])
+
+def verify(public, signature, attestation, controller, chain_id):
+  """What CHECK_SIGNATURE in attestProof decides."""
+  message = digest(micheline.pack(payload(attestation, controller, chain_id)))
+  return verify_bytes(b58decode_check(public, PREFIXES['edpk']), message, b58decode_check(signature, PREFIXES['edsig']))
+
+def argument(attestation, signature):
+  """Michelson argument of attestProof."""
+  a = attestation
+  return m.record(
+    attestation = m.record(
+      address = m.address(a.address), prooftype = m.string(a.prooftype), verified = m.boolean(a.verified),
+      meta = m.mapping(a.meta, m.string, m.string), expiry = m.timestamp(a.expiry), nonce = m.nat(a.nonce)
+    ),
+    signature = m.string(signature)
+  )
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  sub = parser.add_subparsers(dest='mode', required=True)
+  sub.add_parser('key', help='print the verifier public key and address')
+  signing = sub.add_parser('sign', help='print an attestProof argument')
+  signing.add_argument('address')
+  signing.add_argument('prooftype')
+  signing.add_argument('--controller', required=True)
+  signing.add_argument('--chain-id', required=True)
+  signing.add_argument('--nonce', type=int, required=True, help='the next nonce of the address on the controller')
+  signing.add_argument('--expiry', required=True, help='e.g. 2024-01-01T00:00:00Z')
+  signing.add_argument('--unverified', action='store_true')
+  signing.add_argument('--meta', action='append', default=[], help='key=value, repeatable')
+  args = parser.parse_args(argv)
+
+  secret = os.environ.get('TEZID_VERIFIER_SECRET')
+  if not secret:
+    print('TEZID_VERIFIER_SECRET is not set', file=sys.stderr)
+    return 1
+  if args.mode == 'key':
+    public = edpk(secret)
+    print('%s %s' % (public, tz1(public)))
+    return 0
+  meta = dict(item.split('=', 1) for item in args.meta)
+  attestation = Attestation(args.address, args.prooftype, not args.unverified, meta, seconds(args.expiry), args.nonce)
+  print(argument(attestation, sign(secret, attestation, args.controller, args.chain_id)))
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,205 @@
+"""Pack queued admin calls into operation groups.
+
+Each call of the queue (JSON lines, see Call) is costed from a table of
+gas and storage per entrypoint, and its size from its encoded parameter.
+Calls are then packed first-fit into operation groups under the gas and
+size limits. First-fit runs in queue order rather than by decreasing
+size: a call never lands in an earlier group than a previous call on the
+same address, so registerProofAdmin still comes before verifyProof.
+
+  python -m tools.batcher queue.jsonl --controller KT1... --store KT1... [--baseline tools/bench_baseline.json]
+  python -m tools.batcher queue.jsonl ... --rpc URL --source tz1...
+
+The cost table is calibrated from a benchmark baseline (tools.bench
+--update) when one is given; --rpc simulates every group on a node and
+compares its gas with the estimate. Groups are written one per line in
+the format of `octez-client multiple transfers`.
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import namedtuple
+
+from tools import michelson as m
+from tools import micheline, rpc
+
+# A call to `entrypoint` of 'Controller' or 'Store'; `address` is the
+# identity it touches, used to keep calls on one identity in order.
+Call = namedtuple('Call', ['contract', 'entrypoint', 'arg', 'address', 'amount'])
+Cost = namedtuple('Cost', ['gas', 'storage'])
+Limits = namedtuple('Limits', ['gas', 'bytes', 'storage'])
+
+# One group per block and manager, with room left for other operations
+LIMITS = Limits(gas=1040000, bytes=32768, storage=60000)
+
+# Branch and signature of a group
+GROUP_BYTES = 96
+# Tag, source, fee, counter, limits, amount, destination and parameter headers
+TRANSACTION_BYTES = 70
+
+# Gas and paid storage per call, overridden by calibrate()
+COSTS = {
+  'Controller.registerProofAdmin': Cost(4200, 110),
+  'Controller.verifyProof': Cost(3900, 0),
+  'Controller.setProofMeta': Cost(4100, 40),
+  'Controller.removeProof': Cost(3300, 0),
+  'Controller.removeIdentity': Cost(3400, 0),
+  'Store.setProof': Cost(2600, 110),
+  'Store.delProof': Cost(2200, 0),
+  'Store.removeIdentity': Cost(2400, 0),
+}
+
+Group = namedtuple('Group', ['calls', 'gas', 'bytes', 'storage'])
+
+class BatchError(Exception):
+  pass
+
+## Calls
+#
+
+def register_proof_admin(address, prooftype):
+  return Call('Controller', 'registerProofAdmin', m.record(address = m.address(address), proofType = m.string(prooftype)), address, 0)
+
+def verify_proof(address, prooftype):
+  return Call('Controller', 'verifyProof', m.proof_key(address, prooftype), address, 0)
+
+def set_proof_meta(address, prooftype, key, value):
+  arg = m.record(address = m.address(address), prooftype = m.string(prooftype), key = m.string(key), value = m.string(value))
+  return Call('Controller', 'setProofMeta', arg, address, 0)
+
+def remove_proof(address, prooftype):
+  return Call('Controller', 'removeProof', m.record(prooftype = m.string(prooftype), address = m.address(address)), address, 0)
+
+def read_queue(path):
+  with open(path) as f:
+    for line in f:
+      if line.strip():
+        data = json.loads(line)
+        yield Call(data['contract'], data['entrypoint'], data['arg'], data['address'], data.get('amount', 0))
+
+## Costs
+#
+
+def calibrate(baseline, costs=COSTS, margin=1.1):
+  """Cost table with the gas and paid storage of the tezid bench case in `baseline`."""
+  calibrated = dict(costs)
+  for name in costs:
+    entry = baseline.get('tezid/%s' % name)
+    if entry is not None:
+      calibrated[name] = Cost(int(entry['gas'] * margin) + 1, entry['paid_storage'])
+  return calibrated
+
+def load_costs(path=None):
+  """Cost table calibrated from the baseline at `path`, or the default one without a path."""
+  if path is None:
+    return COSTS
+  if not os.path.exists(path):
+    raise BatchError('No baseline at %s, write one with python -m tools.bench --update' % path)
+  with open(path) as f:
+    baseline = json.load(f)
+  if not any('tezid/%s' % name in baseline for name in COSTS):
+    raise BatchError('%s has no tezid case, run python -m tools.bench --case tezid --update' % path)
+  return calibrate(baseline)
+
+def estimate(call, costs=COSTS):
+  """(gas, bytes, storage) of `call` in a group."""
+  name = '%s.%s' % (call.contract, call.entrypoint)
+  if name not in costs:
+    raise BatchError('No cost for %s' % name)
+  size = TRANSACTION_BYTES + len(call.entrypoint) + micheline.size(micheline.parse(call.arg))
+  return costs[name].gas, size, costs[name].storage
+
+## Packing
+#
+
+def pack(calls, limits=LIMITS, costs=COSTS):
+  """First-fit `calls` into groups, keeping the order of calls on one address."""
+  groups, last = [], {}
+  empty = Group([], 0, GROUP_BYTES, 0)
+  for call in calls:
+    cost = estimate(call, costs)
+    fits = lambda group: all(used + extra <= limit for used, extra, limit in zip(group[1:], cost, limits))
+    if not fits(empty):
+      raise BatchError('%s.%s alone exceeds the group limits' % (call.contract, call.entrypoint))
+    start = last.get(call.address, 0)
+    index = next((i for i in range(start, len(groups)) if fits(groups[i])), len(groups))
+    if index == len(groups):
+      groups.append(empty._replace(calls=[]))
+    group = groups[index]
+    group.calls.append(call)
+    groups[index] = Group(group.calls, *(used + extra for used, extra in zip(group[1:], cost)))
+    last[call.address] = index
+  return groups
+
+def report(groups, limits=LIMITS):
+  calls = sum(len(g.calls) for g in groups)
+  if not groups:
+    return 'Nothing to send'
+  fill = lambda field: sum(getattr(g, field) for g in groups) / float(len(groups) * getattr(limits, field))
+  return '\n'.join([
+    '%d calls in %d groups (%d operations saved)' % (calls, len(groups), calls - len(groups)),
+    'throughput: %.1f calls per group, i.e. per block and admin key' % (calls / float(len(groups))),
+    'packing: %.1f%% of the gas limit, %.1f%% of the size limit' % (100 * fill('gas'), 100 * fill('bytes')),
+  ])
+
+## Output
+#
+
+def transfers(group, addresses):
+  return [
+    {'destination': addresses[call.contract], 'entrypoint': call.entrypoint, 'arg': call.arg, 'amount': m.mutez(call.amount)}
+    for call in group.calls
+  ]
+
+def fee(gas_limit, size):
+  """Default minimal fee of a node: 100 mutez, 0.1 mutez per gas unit and 1 mutez per byte."""
+  return 100 + -(-gas_limit // 10) + size
+
+def contents(source, counter, group, addresses, costs=COSTS, margin=2):
+  """Transactions of `group` after `counter`, gas and storage limited to `margin` times the estimate."""
+  items = []
+  for i, call in enumerate(group.calls):
+    gas, size, storage = estimate(call, costs)
+    gas_limit = int(gas * margin)
+    items.append(rpc.transaction(source, addresses[call.contract], call.entrypoint, micheline.parse(call.arg),
+      counter + 1 + i, gas_limit, int(storage * margin) + 100, fee=fee(gas_limit, size), amount=call.amount))
+  return items
+
+def simulate(node, source, group, addresses, costs=COSTS):
+  """Consumed gas of `group` run on `node`."""
+  results = node.run_operation(contents(source, node.counter(source), group, addresses, costs))
+  rpc.check_applied(results)
+  return sum(rpc.consumed_gas(result) for result in results)
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('queue', help='calls, one JSON object per line')
+  parser.add_argument('--controller', required=True)
+  parser.add_argument('--store', required=True)
+  parser.add_argument('--baseline', help='benchmark baseline to calibrate the cost table with')
+  parser.add_argument('--output', default='groups.jsonl')
+  parser.add_argument('--rpc', help='node to simulate the groups on')
+  parser.add_argument('--source', help='admin address for --rpc')
+  args = parser.parse_args(argv)
+
+  addresses = {'Controller': args.controller, 'Store': args.store}
+  try:
+    costs = load_costs(args.baseline)
+    groups = pack(read_queue(args.queue), costs=costs)
+    with open(args.output, 'w') as f:
+      for group in groups:
+        f.write(json.dumps(transfers(group, addresses)) + '\n')
+    print(report(groups))
+    if args.rpc:
+      node = rpc.Node(args.rpc)
+      for i, group in enumerate(groups):
+        print('group %d: %d gas estimated, %d simulated' % (i, group.gas, simulate(node, args.source, group, addresses, costs)))
+  except (BatchError, rpc.RpcError) as e:
+    print(e, file=sys.stderr)
+    return 1
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,522 @@
+"""Gas and storage benchmarks for the TezID contracts.
+
+The contracts are compiled with SmartPy and originated in an octez-client
+mockup, where every call reports consumed gas and storage figures. Each
+measurement is compared with a JSON baseline and the run fails when gas,
+storage size diff or paid storage grow past the threshold.
+
+  python -m tools.bench [--case NAME] [--threshold 0.01] [--update]
+
+Needs `spy` and `octez-client` on PATH (or SMARTPY / OCTEZ_CLIENT).
+"""
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from collections import namedtuple
+
+from tools import attest
+from tools import michelson as m
+from tools.population import population
+from tools.encoding import make_address
+from tools.octez import BOOTSTRAP, Mockup
+
+SMARTPY = os.environ.get('SMARTPY', 'spy')
+TARGETS = 'tools/bench_targets.py'
+BASELINE = os.path.join(os.path.dirname(__file__), 'bench_baseline.json')
+METRICS = ('gas', 'storage_diff', 'paid_storage')
+ADMIN = 'bootstrap1'
+USER = 'bootstrap2'
+STORE_PLACEHOLDER = make_address('bench-store', 'KT1')
+# 2100-01-01: a fixed date keeps the inputs the same on every run, and being
+# after the mockup's now, proofs registered then are fresh and attestations
+# expiring then valid
+TIMESTAMP = 4102444800
+
+# Secret key of bootstrap1, the same in every mockup
+VERIFIER_SECRET = 'edsk3gUfUPyBSfrS9CCgmCiQsTCHGkviBDusMxDJstFtojtc1zcpsh'
+
+Measurement = namedtuple('Measurement', ['case', 'label', 'items', 'gas', 'storage_diff', 'paid_storage'])
+
+class BenchmarkError(Exception):
+  pass
+
+CASES = {}
+
+def case(name):
+  def register(fn):
+    CASES[name] = fn
+    return fn
+  return register
+
+## Build
+#
+
+def compile_targets(outdir, script=TARGETS, env=None):
+  """Compile the SmartPy targets of `script` and return {target: (code, storage)}."""
+  subprocess.run([SMARTPY, 'compile', script, outdir], check=True, env=env)
+  artifacts = {}
+  for target in sorted(os.listdir(outdir)):
+    code = glob.glob(os.path.join(outdir, target, '*_contract.tz'))
+    storage = glob.glob(os.path.join(outdir, target, '*_storage.tz'))
+    if code and storage:
+      with open(storage[0]) as f:
+        artifacts[target] = (code[0], f.read().strip())
+  return artifacts
+
+## Environment
+#
+
+class Bench:
+  def __init__(self, mockup, artifacts):
+    self.mockup = mockup
+    self.artifacts = artifacts
+    self.measurements = []
+    self.sizes = {}
+
+  def track(self, receipt):
+    """Record storage sizes from `receipt` and return the total size diff."""
+    diff = 0
+    for op in receipt.operations:
+      if op.destination is None or op.storage_size is None:
+        continue
+      diff += op.storage_size - self.sizes.get(op.destination, op.storage_size)
+      self.sizes[op.destination] = op.storage_size
+    return diff
+
+  def originate(self, target, store=None):
+    code, storage = self.artifacts[target]
+    if store is not None:
+      storage = storage.replace(STORE_PLACEHOLDER, store)
+    address, receipt = self.mockup.originate(target, code, storage, sender=ADMIN)
+    self.track(receipt)
+    return address
+
+  def call(self, contract, entrypoint, arg, sender=ADMIN, amount=0):
+    receipt = self.mockup.transfer(sender, contract, entrypoint, arg, amount)
+    self.track(receipt)
+    return receipt
+
+  def measure(self, case, label, items, contract, entrypoint, arg, sender=ADMIN, amount=0):
+    receipt = self.mockup.transfer(sender, contract, entrypoint, arg, amount)
+    measurement = Measurement(
+      case, label, items,
+      receipt.consumed_gas,
+      self.track(receipt),
+      receipt.paid_storage_size_diff
+    )
+    self.measurements.append(measurement)
+    return measurement
+
+  def tezid(self, lazy=False):
+    suffix = '_lazy' if lazy else ''
+    store = self.originate('store' + suffix)
+    ctrl = self.originate('controller' + suffix)
+    self.call(ctrl, 'setStore', m.address(store))
+    self.call(store, 'addAdmin', m.address(ctrl))
+    return store, ctrl
+
+def populate(bench, store, addresses, prooftypes, verified=False, meta=None, chunk=100):
+  """Write a proof for every (address, prooftype) through setProofBatch."""
+  items = [
+    m.set_proof_payload(address, prooftype, m.proof(0, verified, meta))
+    for address in addresses for prooftype in prooftypes
+  ]
+  for i in range(0, len(items), chunk):
+    bench.call(store, 'setProofBatch', m.seq(items[i:i + chunk]))
+
+def batched(bench, contract, entrypoint, args, sender=ADMIN, chunk=50):
+  """Call `entrypoint` once per arg, `chunk` calls per operation group."""
+  for i in range(0, len(args), chunk):
+    bench.track(bench.mockup.multiple_transfers(sender, [(contract, entrypoint, arg, 0) for arg in args[i:i + chunk]]))
+
+def check_flat(first, last, what, tolerance=0.02):
+  if last.gas > first.gas * (1 + tolerance):
+    raise BenchmarkError('%s: gas grew from %.0f (%s) to %.0f (%s)' % (what, first.gas, first.label, last.gas, last.label))
+
+def check_falling(measurements, what):
+  per_item = [x.gas / x.items for x in measurements]
+  if any(b >= a for a, b in zip(per_item, per_item[1:])):
+    raise BenchmarkError('%s: gas per item does not fall with batch size: %s' % (
+      what, ', '.join('%d -> %.1f' % (x.items, g) for x, g in zip(measurements, per_item))))
+
+## Cases
+#
+
+@case('verifyProofs')
+def verify_proofs(bench):
+  store, ctrl = bench.tezid()
+  single = make_address('verify-single')
+  populate(bench, store, [single], ['email'])
+  bench.measure('verifyProofs', 'verifyProof', 1, ctrl, 'verifyProof', m.proof_key(single, 'email'))
+
+  batches = []
+  for size in (1, 10, 100):
+    addresses = [make_address('verify-%d-%d' % (size, i)) for i in range(size)]
+    populate(bench, store, addresses, ['email'])
+    arg = m.seq(m.proof_key(address, 'email') for address in addresses)
+    batches.append(bench.measure('verifyProofs', 'verifyProofs x%d' % size, size, ctrl, 'verifyProofs', arg))
+  check_falling(batches, 'verifyProofs')
+
+@case('setProofBatch')
+def set_proof_batch(bench):
+  store, _ = bench.tezid()
+  single = make_address('batch-single')
+  bench.measure('setProofBatch', 'setProof', 1, store, 'setProof',
+    m.set_proof_payload(single, 'email', m.proof(0, False)))
+
+  batches = []
+  for size in (1, 10, 100):
+    addresses = [make_address('batch-%d-%d' % (size, i)) for i in range(size)]
+    populate(bench, store, addresses, ['phone'])
+    arg = m.seq(m.set_proof_payload(address, 'email', m.proof(0, True)) for address in addresses)
+    batches.append(bench.measure('setProofBatch', 'setProofBatch x%d' % size, size, store, 'setProofBatch', arg))
+  check_falling(batches, 'setProofBatch')
+
+  # Overwriting existing proofs skips the identities index
+  bench.measure('setProofBatch', 'setProofBatch x100 (update)', 100, store, 'setProofBatch', arg)
+
+@case('checkProofs')
+def check_proofs(bench):
+  store, _ = bench.tezid()
+  airdrop = bench.originate('airdrop', store=store)
+  meta = {'kyc': 'true', 'handle': '@tezid', 'domain': 'tezid.net'}
+  extra = ['proof%02d' % i for i in range(18)]
+  for sender, size in (('bootstrap2', 2), ('bootstrap3', 5), ('bootstrap4', 20)):
+    prooftypes = ['email', 'phone'] + extra[:size - 2]
+    items = [m.set_proof_payload(BOOTSTRAP[sender], prooftype, m.proof(TIMESTAMP, True, meta)) for prooftype in prooftypes]
+    bench.call(store, 'setProofBatch', m.seq(items))
+    direct = bench.measure('checkProofs', 'signup_direct (%d types)' % size, 1, airdrop, 'signup_direct', m.unit(), sender=sender)
+    check = bench.measure('checkProofs', 'signup_check (%d types)' % size, 1, airdrop, 'signup_check', m.unit(), sender=sender)
+    if check.gas >= direct.gas:
+      raise BenchmarkError('checkProofs: signup_check (%.0f) is not cheaper than signup_direct (%.0f) with %d types' % (check.gas, direct.gas, size))
+
+@case('getProof')
+def get_proof(bench):
+  store, _ = bench.tezid()
+  probe = bench.originate('probe', store=store)
+  meta = {'kyc': 'true', 'kyc_crunchy': 'true', 'handle': '@tezid'}
+  for size in (1, 5, 20):
+    address = make_address('lookup-%d' % size)
+    prooftypes = ['gov'] + ['proof%02d' % i for i in range(size - 1)]
+    populate(bench, store, [address], prooftypes, verified=True, meta=meta)
+    arg = m.record(address = m.address(address), prooftype = m.string('gov'))
+    single = bench.measure('getProof', 'getProof (%d types)' % size, 1, probe, 'proof', arg)
+    full = bench.measure('getProof', 'getProofsForAddress (%d types)' % size, 1, probe, 'proofs', arg)
+    if single.gas >= full.gas:
+      raise BenchmarkError('getProof: single lookup (%.0f) is not cheaper than the full map (%.0f) with %d types' % (single.gas, full.gas, size))
+
+def set_proofs_arg(identities):
+  return m.mapping({
+    identity.address: m.mapping({
+      prooftype: m.proof(proof.register_date, proof.verified, proof.meta)
+      for prooftype, proof in identity.proofs.items()
+    }, m.string, str)
+    for identity in identities
+  }, m.address, str)
+
+@case('scale')
+def scale(bench, count=10000, chunk=50):
+  """Gas of views and updates with a production sized store, by identity size."""
+  store, ctrl = bench.tezid()
+  probe = bench.originate('probe', store=store)
+  identities = list(population(count, seed='scale'))
+  args = [set_proofs_arg(identities[i:i + chunk]) for i in range(0, count, chunk)]
+  batched(bench, store, 'setProofs', args, chunk=5)
+
+  meta = {'kyc': 'true', 'handle': '@tezid', 'country': 'NO'}
+  lookups, updates, verifies = [], [], []
+  for size in (1, 4, 16, 32):
+    address = make_address('scale-%d' % size)
+    prooftypes = ['gov'] + ['proof%02d' % i for i in range(size - 1)]
+    populate(bench, store, [address], prooftypes, meta=meta)
+    key = m.proof_key(address, 'gov')
+    lookups.append(bench.measure('scale', 'getProof (%d types)' % size, 1, probe, 'proof', key))
+    bench.measure('scale', 'getProofsForAddress (%d types)' % size, 1, probe, 'proofs', key)
+    updates.append(bench.measure('scale', 'setProof (%d types)' % size, 1, store, 'setProof',
+      m.set_proof_payload(address, 'gov', m.proof(0, False, meta))))
+    verifies.append(bench.measure('scale', 'verifyProof (%d types)' % size, 1, ctrl, 'verifyProof', key))
+  # Single proof reads and writes must not depend on the size of the identity
+  check_flat(lookups[0], lookups[-1], 'getProof', tolerance=0.05)
+  check_flat(updates[0], updates[-1], 'setProof', tolerance=0.05)
+  check_flat(verifies[0], verifies[-1], 'verifyProof', tolerance=0.05)
+
+@case('controller')
+def controller(bench):
+  store, ctrl = bench.tezid()
+  user = BOOTSTRAP[USER]
+  bench.call(ctrl, 'setKycPlatforms', m.set_(['kyc_crunchy'], m.string))
+  populate(bench, store, [user], ['proof%02d' % i for i in range(10)], meta={'kyc': 'true', 'handle': '@tezid'})
+  key = m.proof_key(user, 'gov')
+  bench.measure('controller', 'registerProof', 1, ctrl, 'registerProof', m.string('gov'), sender=USER, amount=5000000)
+  bench.measure('controller', 'registerProof (renew)', 1, ctrl, 'registerProof', m.string('gov'), sender=USER, amount=5000000)
+  bench.measure('controller', 'enableKYC', 1, ctrl, 'enableKYC', m.unit(), sender=USER)
+  bench.measure('controller', 'enableKYCPlatform', 1, ctrl, 'enableKYCPlatform', m.string('kyc_crunchy'), sender=USER)
+  bench.measure('controller', 'verifyProof', 1, ctrl, 'verifyProof', key)
+  bench.measure('controller', 'setProofMeta', 1, ctrl, 'setProofMeta',
+    m.record(address = m.address(user), prooftype = m.string('gov'), key = m.string('country'), value = m.string('NO')))
+  bench.measure('controller', 'registerProofAdmin', 1, ctrl, 'registerProofAdmin',
+    m.record(address = m.address(user), proofType = m.string('twitter')))
+  bench.measure('controller', 'removeProof', 1, ctrl, 'removeProof', m.record(prooftype = m.string('twitter'), address = m.address(user)))
+
+@case('lazy')
+def lazy(bench):
+  """Per-call gas of the hot entrypoints, eager vs lazy entrypoint builds."""
+  user = BOOTSTRAP[USER]
+  for build in ('eager', 'lazy'):
+    store, ctrl = bench.tezid(lazy=build == 'lazy')
+    populate(bench, store, [user], ['proof%02d' % i for i in range(10)])
+    bench.measure('lazy', '%s.registerProof' % build, 1, ctrl, 'registerProof', m.string('gov'), sender=USER, amount=5000000)
+    bench.measure('lazy', '%s.verifyProof' % build, 1, ctrl, 'verifyProof', m.proof_key(user, 'gov'))
+    bench.measure('lazy', '%s.setProof' % build, 1, store, 'setProof', m.set_proof_payload(user, 'email', m.proof(0, True)))
+
+def fund_farm(bench, token, farm, accounts, amount):
+  for account in accounts:
+    for token_id in (0, 1):
+      bench.call(token, 'mint', m.record(address = m.address(BOOTSTRAP[account]), token_id = m.nat(token_id), amount = m.nat(amount)))
+    operators = m.seq(
+      'Left %s' % m.record(owner = m.address(BOOTSTRAP[account]), operator = m.address(farm), token_id = m.nat(token_id))
+      for token_id in (0, 1)
+    )
+    bench.call(token, 'update_operators', operators, sender=account)
+
+@case('farm')
+def farm(bench):
+  token = bench.originate('token')
+  farm = bench.originate('farm')
+  bench.call(farm, 'setStakeToken', m.record(address = m.address(token), token_id = m.nat(0)))
+  bench.call(farm, 'setRewardToken', m.record(address = m.address(token), token_id = m.nat(1)))
+  fund_farm(bench, token, farm, [ADMIN, USER, 'bootstrap3'], 10 ** 9)
+
+  bench.measure('farm', 'stake', 1, farm, 'stake', m.nat(10 ** 6), sender=USER)
+  claim = m.seq([m.nat(0)])
+  bench.measure('farm', 'addRewards', 1, farm, 'addRewards', m.nat(1000))
+  first = bench.measure('farm', 'claim after 1 reward', 1, farm, 'claim', claim, sender=USER)
+
+  first_stake = bench.measure('farm', 'stake after 1 reward', 1, farm, 'stake', m.nat(10 ** 6))
+  first_reward = bench.measure('farm', 'addRewards after 1 reward', 1, farm, 'addRewards', m.nat(1000))
+
+  batched(bench, farm, 'addRewards', [m.nat(1000)] * 998)
+  last_reward = bench.measure('farm', 'addRewards after 1000 rewards', 1, farm, 'addRewards', m.nat(1000))
+  last = bench.measure('farm', 'claim after 1000 rewards', 1, farm, 'claim', claim, sender=USER)
+  last_stake = bench.measure('farm', 'stake after 1000 rewards', 1, farm, 'stake', m.nat(10 ** 6), sender='bootstrap3')
+  check_flat(first, last, 'farm claim')
+  check_flat(first_reward, last_reward, 'farm addRewards')
+  check_flat(first_stake, last_stake, 'farm stake')
+
+  # Positions 3 to 102 belong to USER
+  batched(bench, farm, 'stake', [m.nat(10 ** 3)] * 100, sender=USER)
+  many_stake = bench.measure('farm', 'stake after 100 positions', 1, farm, 'stake', m.nat(10 ** 6), sender=USER)
+  check_flat(first_stake, many_stake, 'farm stake')
+  bench.measure('farm', 'compact x101', 101, farm, 'compact', m.seq(m.nat(i) for i in [0] + list(range(3, 103))), sender=USER)
+  bench.measure('farm', 'unstake after compact', 1, farm, 'unstake', claim, sender=USER)
+
+@case('tezid')
+def tezid(bench):
+  """Every store and controller entrypoint, following tests/tezid.py."""
+  store, ctrl = bench.tezid()
+  user = BOOTSTRAP[USER]
+  other = BOOTSTRAP['bootstrap3']
+
+  def measure(contract, name, entrypoint, arg, label=None, **kwargs):
+    return bench.measure('tezid', '%s.%s' % (name, label or entrypoint), 1, contract, entrypoint, arg, **kwargs)
+
+  ## Register proof
+  measure(ctrl, 'Controller', 'registerProof', m.string('email'), sender=USER, amount=5000000)
+  measure(ctrl, 'Controller', 'registerProof', m.string('phone'), label='registerProof (second)', sender=USER, amount=5000000)
+  measure(ctrl, 'Controller', 'registerProof', m.string('email'), label='registerProof (renew)', sender=USER, amount=5000000)
+  measure(ctrl, 'Controller', 'registerProofAdmin', m.record(address = m.address(user), proofType = m.string('yolo')))
+
+  ## Verify proof
+  measure(ctrl, 'Controller', 'verifyProof', m.proof_key(user, 'email'))
+  measure(ctrl, 'Controller', 'verifyProofs', m.seq([m.proof_key(user, 'phone'), m.proof_key(user, 'yolo')]))
+
+  ## Set proof metadata
+  measure(ctrl, 'Controller', 'setProofMeta',
+    m.record(address = m.address(user), prooftype = m.string('email'), key = m.string('handle'), value = m.string('@tezid')))
+
+  ## Attest proof, signed with the mockup's bootstrap1 key
+  measure(ctrl, 'Controller', 'setVerifier', m.some(m.string(attest.edpk(VERIFIER_SECRET))))
+  chain_id = json.loads(bench.mockup.run('rpc', 'get', '/chains/main/chain_id'))
+  attestation = attest.Attestation(user, 'twitter', True, {'handle': '@tezid'}, TIMESTAMP, 0)
+  signature = attest.sign(VERIFIER_SECRET, attestation, ctrl, chain_id)
+  measure(ctrl, 'Controller', 'attestProof', attest.argument(attestation, signature), sender=USER, amount=5000000)
+
+  ## Enable KYC metadata
+  measure(ctrl, 'Controller', 'registerProof', m.string('gov'), label='registerProof (gov)', sender=USER, amount=5000000)
+  measure(ctrl, 'Controller', 'enableKYC', m.unit(), sender=USER)
+  measure(ctrl, 'Controller', 'setKycPlatforms', m.set_(['kyc_crunchy', 'kyc_yaynay'], m.string))
+  measure(ctrl, 'Controller', 'enableKYCPlatform', m.string('kyc_crunchy'), sender=USER)
+
+  ## Set cost
+  measure(ctrl, 'Controller', 'setCost', m.record(proofType = m.string('phone'), cost = m.mutez(9000000)))
+  measure(ctrl, 'Controller', 'delCost', m.string('phone'))
+
+  ## Send, set admin, set store, set baker
+  measure(ctrl, 'Controller', 'send', m.record(receiverAddress = m.address(store), amount = m.mutez(5000000)))
+  measure(ctrl, 'Controller', 'addAdmin', m.address(other))
+  measure(ctrl, 'Controller', 'delAdmin', m.address(other))
+  measure(ctrl, 'Controller', 'setStore', m.address(store))
+  measure(ctrl, 'Controller', 'setBaker', m.some(m.string(BOOTSTRAP[ADMIN])))
+  measure(store, 'Store', 'send', m.record(receiverAddress = m.address(other), amount = m.mutez(1000000)))
+  measure(store, 'Store', 'addAdmin', m.address(other))
+  measure(store, 'Store', 'delAdmin', m.address(other))
+  measure(store, 'Store', 'setBaker', m.some(m.string(BOOTSTRAP[ADMIN])))
+
+  ## Store proof entrypoints
+  proof = m.proof(0, True, {'kyc': 'true'})
+  measure(store, 'Store', 'setProof', m.set_proof_payload(other, 'email', proof))
+  measure(store, 'Store', 'setProofBatch', m.seq([m.set_proof_payload(other, 'phone', proof), m.set_proof_payload(other, 'gov', proof)]))
+  measure(store, 'Store', 'patchProofs', m.seq([m.record(
+    address = m.address(other), prooftype = m.string('gov'), create = m.boolean(False),
+    register_date = m.none(), verified = m.some(m.boolean(False)), meta = m.mapping({'kyc': m.none()}, m.string, str)
+  )]))
+  measure(store, 'Store', 'delProof', m.proof_key(other, 'phone'))
+  measure(store, 'Store', 'setProofs', m.mapping({other: m.mapping({'twitter': proof}, m.string, str)}, m.address, str))
+  measure(store, 'Store', 'removeIdentity', m.address(other))
+  target = bench.originate('store')
+  measure(target, 'Store', 'importIdentities', m.record(source = m.address(store), addresses = m.seq([m.address(user)])))
+  measure(store, 'Store', 'triggerLambda', m.record(logic = '{ CDR }', params = '0x'))
+
+  ## Remove proof, remove identity
+  measure(ctrl, 'Controller', 'removeProof', m.record(prooftype = m.string('yolo'), address = m.address(user)))
+  measure(ctrl, 'Controller', 'removeIdentity', m.address(user))
+
+@case('integrations')
+def integrations(bench):
+  """Consumer contracts from tests/integrations.py."""
+  store, ctrl = bench.tezid()
+  airdrop = bench.originate('airdrop', store=store)
+  gate = bench.originate('gate', store=store)
+  user = BOOTSTRAP[USER]
+  for prooftype in ('email', 'phone', 'gov'):
+    bench.call(ctrl, 'registerProof', m.string(prooftype), sender=USER, amount=5000000)
+    bench.call(ctrl, 'verifyProof', m.proof_key(user, prooftype))
+  bench.call(ctrl, 'enableKYC', m.unit(), sender=USER)
+  bench.call(ctrl, 'verifyProof', m.proof_key(user, 'gov'))
+
+  bench.measure('integrations', 'AirDrop.signup_callback', 1, airdrop, 'signup_callback', m.unit(), sender=USER)
+  bench.measure('integrations', 'AirDrop.signup_direct', 1, airdrop, 'signup_direct', m.unit(), sender=USER)
+  bench.measure('integrations', 'AirDrop.signup_check', 1, airdrop, 'signup_check', m.unit(), sender=USER)
+  bench.measure('integrations', 'KYCGate.join', 1, gate, 'join', m.unit(), sender=USER)
+
+## Baseline
+#
+
+def key(measurement):
+  return '%s/%s' % (measurement.case, measurement.label)
+
+def load_baseline(path, missing_ok=False):
+  """Entries of the baseline at `path`; a missing file is an error unless `missing_ok`."""
+  if not os.path.exists(path):
+    if missing_ok:
+      return {}
+    raise BenchmarkError('No baseline at %s, write one with --update' % path)
+  with open(path) as f:
+    return json.load(f)
+
+def save_baseline(path, measurements, baseline=None):
+  """Write `measurements` into the baseline at `path`, keeping other entries."""
+  entries = dict(baseline or {})
+  for x in measurements:
+    entries[key(x)] = {metric: getattr(x, metric) for metric in METRICS}
+  with open(path, 'w') as f:
+    json.dump(entries, f, indent=2, sort_keys=True)
+    f.write('\n')
+
+def regressed(old, new, threshold):
+  return new - old > abs(old) * threshold
+
+def compare(measurements, baseline, threshold):
+  """Return [(measurement, base entry or None, [regressed metrics])]."""
+  rows = []
+  for x in measurements:
+    base = baseline.get(key(x))
+    metrics = []
+    if base is not None:
+      metrics = [metric for metric in METRICS if regressed(base[metric], getattr(x, metric), threshold)]
+    rows.append((x, base, metrics))
+  return rows
+
+## Report
+#
+
+def change(old, new):
+  if old is None:
+    return 'new'
+  if new == old:
+    return '='
+  if old == 0:
+    return '%+g' % (new - old)
+  return '%+.1f%%' % ((new - old) * 100.0 / abs(old))
+
+def table(rows):
+  """Per-entrypoint comparison table for the rows returned by `compare`."""
+  lines = [('call', 'items', 'gas', 'gas/item', 'Δgas', 'storage', 'Δstorage', 'paid', 'Δpaid', '')]
+  for x, base, metrics in rows:
+    base = base or {}
+    lines.append((
+      key(x), str(x.items),
+      '%.0f' % x.gas, '%.1f' % (x.gas / x.items), change(base.get('gas'), x.gas),
+      '%+d' % x.storage_diff, change(base.get('storage_diff'), x.storage_diff),
+      str(x.paid_storage), change(base.get('paid_storage'), x.paid_storage),
+      'REGRESSION (%s)' % ', '.join(metrics) if metrics else ''
+    ))
+  widths = [max(len(line[i]) for line in lines) for i in range(len(lines[0]))]
+  return '\n'.join('  '.join(col.ljust(w) for col, w in zip(line, widths)).rstrip() for line in lines)
+
+def run(cases, protocol=None):
+  """Run `cases` in fresh mockups and return (measurements, errors)."""
+  measurements, errors = [], []
+  with tempfile.TemporaryDirectory(prefix='tezid-bench-') as outdir:
+    env = dict(os.environ, BENCH_ADMIN=BOOTSTRAP[ADMIN], BENCH_STORE=STORE_PLACEHOLDER)
+    artifacts = compile_targets(outdir, env=env)
+    for name in cases:
+      with Mockup(protocol) as mockup:
+        bench = Bench(mockup, artifacts)
+        try:
+          CASES[name](bench)
+        except BenchmarkError as e:
+          errors.append(str(e))
+        measurements.extend(bench.measurements)
+  return measurements, errors
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--case', action='append', choices=sorted(CASES), help='case to run (default: all)')
+  parser.add_argument('--protocol', help='mockup protocol hash')
+  parser.add_argument('--baseline', default=BASELINE, help='baseline file (default: %(default)s)')
+  parser.add_argument('--threshold', type=float, default=0.01, help='allowed relative growth per metric (default: %(default)s)')
+  parser.add_argument('--update', action='store_true', help='write the measurements to the baseline instead of failing')
+  parser.add_argument('--json', help='also write the raw measurements to this file')
+  args = parser.parse_args(argv)
+
+  try:
+    # Without a baseline every row would be new and nothing could regress
+    baseline = load_baseline(args.baseline, missing_ok=args.update)
+  except BenchmarkError as e:
+    print(e, file=sys.stderr)
+    return 1
+  measurements, errors = run(args.case or sorted(CASES), args.protocol)
+  rows = compare(measurements, baseline, args.threshold)
+  print(table(rows))
+  if args.json:
+    with open(args.json, 'w') as f:
+      json.dump([x._asdict() for x in measurements], f, indent=2)
+  for error in errors:
+    print(error, file=sys.stderr)
+  if args.update:
+    save_baseline(args.baseline, measurements, baseline)
+    print('Baseline written to %s' % args.baseline)
+    return 1 if errors else 0
+  regressions = [key(x) for x, _, metrics in rows if metrics]
+  if regressions:
+    print('%d regression(s) past %.1f%%: %s' % (len(regressions), args.threshold * 100, ', '.join(regressions)), file=sys.stderr)
+  return 1 if errors or regressions else 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,94 @@
+import os
+import smartpy as sp
+
+## Compilation targets for tools/bench.py
+#
+# Compiled with `spy compile tools/bench_targets.py <output>` from the repo
+# root. The admin is the mockup's bootstrap1 account; the controller is
+# pointed at the store with setStore once both are originated, and consumer
+# contracts get BENCH_STORE replaced by the store address at origination.
+
+cwd = os.getcwd()
+Store = sp.io.import_script_from_url("file://%s/contracts/store.py" % cwd)
+Controller = sp.io.import_script_from_url("file://%s/contracts/controller.py" % cwd)
+Integrations = sp.io.import_script_from_url("file://%s/tests/integrations.py" % cwd)
+Types = sp.io.import_script_from_url("file://%s/contracts/types.py" % cwd)
+Farm = sp.io.import_script_from_url("file://%s/contracts/farm.py" % cwd)
+FA2 = sp.io.import_script_from_url("file://%s/tests/fa2.py" % cwd)
+
+admin = sp.address(os.environ.get('BENCH_ADMIN', 'tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx'))
+store = sp.address(os.environ['BENCH_STORE'])
+
+## Calls the store views the way a consumer contract would
+#
+
+class ViewProbe(sp.Contract):
+  def __init__(self, store):
+    self.init(store = store, verified = False)
+
+  @sp.entry_point
+  def proof(self, address, prooftype):
+    sp.set_type(address, sp.TAddress)
+    sp.set_type(prooftype, sp.TString)
+    proof = sp.view('getProof', self.data.store, sp.record(address = address, prooftype = prooftype), t = sp.TOption(Types.TProof)).open_some('Invalid view')
+    self.data.verified = proof.open_some('Missing proof').verified
+
+  @sp.entry_point
+  def proofs(self, address, prooftype):
+    sp.set_type(address, sp.TAddress)
+    sp.set_type(prooftype, sp.TString)
+    proofs = sp.view('getProofsForAddress', self.data.store, address, t = Types.TProofs).open_some('Invalid view')
+    self.data.verified = proofs[prooftype].verified
+
+sp.add_compilation_target("store", Store.TezIDStore(
+    sp.set([admin]),
+    sp.big_map(),
+    sp.big_map(),
+    sp.big_map()
+  )
+)
+
+sp.add_compilation_target("controller", Controller.TezIDController(
+    admin,
+    admin,
+    sp.big_map()
+  )
+)
+
+## Same contracts with lazy entrypoints, as built by compile.py with TEZID_LAZY=1
+#
+
+lazyStore = Store.TezIDStore(
+  sp.set([admin]),
+  sp.big_map(),
+  sp.big_map(),
+  sp.big_map()
+)
+lazyStore.add_flag("lazy-entry-points")
+sp.add_compilation_target("store_lazy", lazyStore)
+
+lazyController = Controller.TezIDController(
+  admin,
+  admin,
+  sp.big_map()
+)
+lazyController.add_flag("lazy-entry-points")
+sp.add_compilation_target("controller_lazy", lazyController)
+
+sp.add_compilation_target("airdrop", Integrations.AirDrop(
+    store,
+    ["email", "phone"]
+  )
+)
+
+sp.add_compilation_target("probe", ViewProbe(store))
+
+sp.add_compilation_target("token", FA2.TestToken(admin))
+
+sp.add_compilation_target("farm", Farm.TezIDForeverFarm(
+    sp.set([admin]),
+    sp.big_map()
+  )
+)
+
+sp.add_compilation_target("gate", Integrations.KYCGate(store))
@@ -0,0 +1,234 @@
+"""Incremental build of the deployable contracts in compile.py.
+
+Every target is keyed by a hash of its contract sources, types.py,
+compile.py, its constructor arguments (TEZID_ADMIN, TEZID_STORE), its
+metadata JSON and the SmartPy installation. Artifacts are kept under
+.build-cache/<target>-<key>, and only targets without a cache entry are
+passed to `spy compile` (through TEZID_TARGETS).
+
+  TEZID_ADMIN=tz1... TEZID_STORE=KT1... python -m tools.build [output]
+  python -m tools.build --all [--jobs N] [--lazy] [output]
+
+With --all (or --env FILE) every `setenv` profile such as mainnet.env is
+built into output/<network>/<target>, compiling in a process pool.
+
+Set SMARTPY_VERSION to pin the SmartPy part of the key explicitly;
+otherwise the resolved `spy` executable is fingerprinted.
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+SMARTPY = os.environ.get('SMARTPY', 'spy')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = 'compile.py'
+CACHE = '.build-cache'
+STAMP = '.build-key'
+COMMON = (SCRIPT, 'contracts/types.py')
+# Build options read by compile.py, part of every key
+OPTIONS = ('TEZID_LAZY',)
+
+Target = namedtuple('Target', ['sources', 'args', 'metadata'])
+
+TARGETS = {
+  'store': Target(('contracts/store.py',), ('TEZID_ADMIN',), 'metadata/store.json'),
+  'controller': Target(('contracts/controller.py',), ('TEZID_ADMIN', 'TEZID_STORE'), 'metadata/controller.json'),
+}
+
+class BuildError(Exception):
+  pass
+
+## Keys
+#
+
+def smartpy_version(env):
+  """SMARTPY_VERSION if set, else a fingerprint of the `spy` executable."""
+  if env.get('SMARTPY_VERSION'):
+    return env['SMARTPY_VERSION']
+  path = shutil.which(SMARTPY, path=env.get('PATH'))
+  if path is None:
+    raise BuildError('%s not found, set SMARTPY or SMARTPY_VERSION' % SMARTPY)
+  path = os.path.realpath(path)
+  stat = os.stat(path)
+  return '%s:%d:%d' % (path, stat.st_size, stat.st_mtime_ns)
+
+def target_key(name, env, version, root=ROOT):
+  target = TARGETS[name]
+  digest = hashlib.sha256()
+  def add(label, value):
+    digest.update(b'%s\0%d\0' % (label.encode(), len(value)))
+    digest.update(value)
+  for path in COMMON + target.sources + (target.metadata,):
+    with open(os.path.join(root, path), 'rb') as f:
+      add(path, f.read())
+  for arg in target.args:
+    if arg not in env:
+      raise BuildError('%s is not set' % arg)
+    add(arg, env[arg].strip().encode())
+  for option in OPTIONS:
+    add(option, env.get(option, '').strip().encode())
+  add('smartpy', version.encode())
+  return digest.hexdigest()
+
+## Build
+#
+
+def spy_compile(targets, outdir, env, root=ROOT):
+  env = dict(env, TEZID_TARGETS=','.join(targets))
+  subprocess.run([SMARTPY, 'compile', SCRIPT, outdir], check=True, env=env, cwd=root)
+
+def read_stamp(path):
+  try:
+    with open(os.path.join(path, STAMP)) as f:
+      return f.read().strip()
+  except FileNotFoundError:
+    return None
+
+def install(src, dest, key):
+  """Replace `dest` with a copy of `src`, stamped with `key`."""
+  if os.path.exists(dest):
+    shutil.rmtree(dest)
+  shutil.copytree(src, dest)
+  with open(os.path.join(dest, STAMP), 'w') as f:
+    f.write(key + '\n')
+
+def compile_entries(names, keys, env, root, cache, compile):
+  """Compile `names` in one run and move each into its cache entry."""
+  os.makedirs(cache, exist_ok=True)
+  with tempfile.TemporaryDirectory(dir=cache) as tmp:
+    compile(names, tmp, env, root)
+    for name in names:
+      if not os.path.isdir(os.path.join(tmp, name)):
+        raise BuildError('%s produced no %s target' % (SCRIPT, name))
+      entry = os.path.join(cache, '%s-%s' % (name, keys[name]))
+      # Rename into place so an interrupted build never leaves a partial entry
+      staged = os.path.join(tmp, name + '.entry')
+      install(os.path.join(tmp, name), staged, keys[name])
+      if not os.path.isdir(entry):
+        os.replace(staged, entry)
+
+Job = namedtuple('Job', ['name', 'key', 'env', 'output', 'entry', 'status'])
+
+def plan(outdir, targets, env, version, root, cache):
+  jobs = []
+  for name in sorted(targets or TARGETS):
+    key = target_key(name, env, version, root)
+    output = os.path.join(outdir, name)
+    entry = os.path.join(cache, '%s-%s' % (name, key))
+    if read_stamp(output) == key:
+      status = 'fresh'
+    elif os.path.isdir(entry):
+      status = 'cached'
+    else:
+      status = 'compiled'
+    jobs.append(Job(name, key, env, output, entry, status))
+  return jobs
+
+def finish(jobs):
+  for job in jobs:
+    if job.status != 'fresh':
+      install(job.entry, job.output, job.key)
+
+def build(outdir, targets=None, env=None, root=ROOT, cache=None, compile=spy_compile):
+  """Bring `outdir`/<target> up to date and return {target: status}.
+
+  Status is 'fresh' when the output already matched, 'cached' when it was
+  restored from the cache and 'compiled' when `compile` had to run.
+  """
+  env = os.environ if env is None else env
+  cache = os.path.join(root, CACHE) if cache is None else cache
+  jobs = plan(outdir, targets, env, smartpy_version(env), root, cache)
+  missing = [job for job in jobs if job.status == 'compiled']
+  if missing:
+    keys = {job.name: job.key for job in missing}
+    compile_entries(sorted(keys), keys, env, root, cache, compile)
+  finish(jobs)
+  return {job.name: job.status for job in jobs}
+
+## Networks
+#
+
+def read_profile(path):
+  """Variables of a `setenv KEY VALUE` profile such as mainnet.env."""
+  values = {}
+  with open(path) as f:
+    for number, line in enumerate(f, 1):
+      words = line.split()
+      if not words or words[0].startswith('#'):
+        continue
+      if len(words) != 3 or words[0] != 'setenv':
+        raise BuildError('%s:%d: expected "setenv KEY VALUE"' % (path, number))
+      values[words[1]] = words[2]
+  return values
+
+def profiles(root=ROOT, paths=None):
+  """{network: variables} for `paths`, or every *.env file in `root`."""
+  if paths is None:
+    paths = sorted(glob.glob(os.path.join(root, '*.env')))
+  return {os.path.basename(path)[:-len('.env')]: read_profile(path) for path in paths}
+
+def build_networks(outdir, networks, targets=None, env=None, root=ROOT, cache=None, compile=spy_compile, jobs=None):
+  """Build every (network, target) pair into `outdir`/<network>/<target>.
+
+  Compilations run in a process pool, one per distinct cache key, so
+  networks that share constructor arguments compile a target once.
+  Returns {(network, target): status}.
+  """
+  env = os.environ if env is None else env
+  cache = os.path.join(root, CACHE) if cache is None else cache
+  version = smartpy_version(env)
+  planned = []
+  for network in sorted(networks):
+    planned += [(network, job) for job in plan(
+      os.path.join(outdir, network), targets, dict(env, **networks[network]), version, root, cache
+    )]
+
+  missing = {}
+  for _, job in planned:
+    if job.status == 'compiled':
+      missing.setdefault(job.entry, job)
+  if missing:
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+      futures = [
+        pool.submit(compile_entries, [job.name], {job.name: job.key}, dict(job.env), root, cache, compile)
+        for job in missing.values()
+      ]
+      for future in futures:
+        future.result()
+
+  finish(job for _, job in planned)
+  return {(network, job.name): job.status for network, job in planned}
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('outdir', nargs='?', default='output')
+  parser.add_argument('--target', action='append', choices=sorted(TARGETS), help='target to build (default: all)')
+  parser.add_argument('--env', action='append', metavar='FILE', help='network profile to build into outdir/<name> (repeatable)')
+  parser.add_argument('--all', action='store_true', help='build every *.env profile')
+  parser.add_argument('--jobs', type=int, help='parallel compilations (default: CPU count)')
+  parser.add_argument('--lazy', action='store_true', help='compile with lazy entrypoints (TEZID_LAZY=1)')
+  args = parser.parse_args(argv)
+  env = dict(os.environ, TEZID_LAZY='1') if args.lazy else os.environ
+  try:
+    if args.all or args.env:
+      status = build_networks(args.outdir, profiles(paths=None if args.all else args.env), args.target, env, jobs=args.jobs)
+      status = {'%s/%s' % key: value for key, value in status.items()}
+    else:
+      status = build(args.outdir, args.target, env)
+  except (BuildError, subprocess.CalledProcessError) as e:
+    print(e, file=sys.stderr)
+    return 1
+  for name in sorted(status):
+    print('%s: %s' % (name, status[name]))
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main())
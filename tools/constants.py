@@ -0,0 +1,152 @@
+"""Extract repeated Michelson fragments into global constants.
+
+Scans the compiled contracts of an output directory for subtrees that occur
+more than once across their code and views: shared types such as
+TProof/TProofs/TSetProofPayload, identical private lambdas and helper
+sequences. Each fragment that pays for its reference is replaced by a
+`constant "expr..."` node, and the rewritten contracts are written to a
+new directory together with constants.json, the payloads to register.
+
+  python -m tools.constants output output-constants [--min-saving 32]
+
+Register every constant before originating the rewritten contracts:
+
+  octez-client register global constant "<value>" from <account> --burn-cap 1
+
+Parameter and storage types are left as they are, so entrypoints and
+annotations stay readable to indexers and wallets.
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+from collections import namedtuple
+
+from tools import micheline
+
+Constant = namedtuple('Constant', ['hash', 'value', 'size', 'uses'])
+
+# Size of the `constant "expr..."` node replacing a fragment
+REFERENCE_SIZE = micheline.size({'prim': 'constant', 'args': [{'string': 'expr' + 50 * 'x'}]})
+
+## Fragments
+#
+
+def roots(script):
+  """Nodes of `script` where constants may be used: code and views."""
+  for section in script:
+    if section.get('prim') == 'code':
+      yield section['args'], 0
+    elif section.get('prim') == 'view':
+      for i in (1, 2, 3):
+        yield section['args'], i
+
+def candidate(node):
+  return isinstance(node, list) or ('prim' in node and not node.get('annots') and node['prim'] != 'constant')
+
+def count(node, counts):
+  """Count every candidate subtree of `node` by its binary encoding."""
+  if isinstance(node, list):
+    for child in node:
+      count(child, counts)
+  elif 'prim' in node:
+    for child in node.get('args', []):
+      count(child, counts)
+  else:
+    return
+  if candidate(node):
+    key = micheline.encode(node)
+    entry = counts.setdefault(key, [node, 0])
+    entry[1] += 1
+
+def replace(parent, index, key, reference):
+  """Replace every subtree encoded as `key` below parent[index]."""
+  node = parent[index]
+  if candidate(node) and micheline.encode(node) == key:
+    parent[index] = reference
+    return 1
+  children = node if isinstance(node, list) else node.get('args', []) if 'prim' in node else []
+  return sum(replace(children, i, key, reference) for i in range(len(children)))
+
+def extract(scripts, min_saving=32, limit=64):
+  """Rewrite `scripts` in place and return the constants, best first."""
+  constants = []
+  while len(constants) < limit:
+    counts = {}
+    for script in scripts.values():
+      for parent, index in roots(script):
+        count(parent[index], counts)
+    best = None
+    for key, (node, uses) in counts.items():
+      saving = uses * (len(key) - REFERENCE_SIZE)
+      if uses > 1 and saving >= min_saving and (best is None or saving > best[0]):
+        best = (saving, key, node, uses)
+    if best is None:
+      break
+    _, key, node, uses = best
+    value = json.loads(json.dumps(node))
+    constant = Constant(micheline.expr_hash(value), value, len(key), uses)
+    reference = {'prim': 'constant', 'args': [{'string': constant.hash}]}
+    for script in scripts.values():
+      for parent, index in roots(script):
+        replace(parent, index, key, reference)
+    constants.append(constant)
+  return constants
+
+## Output
+#
+
+def load(outdir):
+  """{target: (path, script)} for every *_contract.json in `outdir`."""
+  scripts = {}
+  for path in sorted(glob.glob(os.path.join(outdir, '*', '*_contract.json'))):
+    with open(path) as f:
+      scripts[os.path.basename(os.path.dirname(path))] = (path, json.load(f))
+  return scripts
+
+def write(outdir, newdir, scripts, constants):
+  if os.path.exists(newdir):
+    shutil.rmtree(newdir)
+  shutil.copytree(outdir, newdir)
+  for target, (path, script) in scripts.items():
+    dest = os.path.join(newdir, os.path.relpath(path, outdir))
+    with open(dest, 'w') as f:
+      json.dump(script, f)
+    with open(dest[:-len('.json')] + '.tz', 'w') as f:
+      f.write(micheline.to_text(script) + '\n')
+  with open(os.path.join(newdir, 'constants.json'), 'w') as f:
+    json.dump([dict(c._asdict(), text=micheline.to_text(c.value)) for c in constants], f, indent=2)
+
+def report(before, after, constants):
+  lines = []
+  for target in sorted(before):
+    lines.append('%-20s %7d -> %7d bytes (%+d)' % (target, before[target], after[target], after[target] - before[target]))
+  saved = sum(before.values()) - sum(after.values())
+  registered = sum(c.size for c in constants)
+  lines.append('%d constants, %d bytes to register once, %d origination bytes saved' % (len(constants), registered, saved))
+  return '\n'.join(lines)
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('outdir', help='compiled targets, e.g. from tools.build')
+  parser.add_argument('newdir', help='where to write the rewritten targets and constants.json')
+  parser.add_argument('--min-saving', type=int, default=32, help='bytes a constant must save (default: %(default)s)')
+  args = parser.parse_args(argv)
+
+  loaded = load(args.outdir)
+  if not loaded:
+    print('No compiled contracts in %s' % args.outdir, file=sys.stderr)
+    return 1
+  scripts = {target: script for target, (_, script) in loaded.items()}
+  before = {target: micheline.size(script) for target, script in scripts.items()}
+  constants = extract(scripts, args.min_saving)
+  after = {target: micheline.size(script) for target, script in scripts.items()}
+  write(args.outdir, args.newdir, loaded, constants)
+  print(report(before, after, constants))
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,284 @@
+"""Dispatch queued admin calls across several admin keys.
+
+Both contracts accept any key of their `admins` set. A manager can only
+have one operation per block, so sending everything from one key
+serializes the queue on its counter. The dispatcher packs the queue into
+operation groups (see batcher.py) and hands them round-robin to the keys
+without an operation waiting for inclusion, tracking each key's counter
+locally.
+
+A group counts as sent once its operation is in a block with every
+transaction applied; until then its key sends nothing else and the groups
+touching its addresses wait, so groups on one address apply in queue
+order whichever key sends them. A group that fails on-chain (a FAILWITH,
+say) is given up with the later groups on its addresses; unrelated groups
+keep flowing.
+
+A failed forge or injection is retried with exponential backoff on the
+next free key. The key keeps its local counter unless the node rejected
+the counter, in which case it is read again from the head context. A
+group not included within `timeout` blocks is retried the same way, but
+on the same key with the counter read again: the new operation reuses
+the counter of the one that may still be in a mempool, so at most one of
+them is included. A node only lets an operation replace another with the
+same counter when it pays more, so each replacement raises the fees by
+REPLACEMENT_FEE.
+
+  python -m tools.dispatch queue.jsonl --controller KT1... --store KT1... --rpc URL --key admin1 --key admin2
+"""
+
+import argparse
+import bisect
+import math
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import namedtuple
+
+from tools import batcher, rpc
+from tools.encoding import signature_bytes
+
+CLIENT = os.environ.get('OCTEZ_CLIENT', 'octez-client')
+
+# Generic operation watermark
+WATERMARK = b'\x03'
+
+# Fee factor of a replacement; Octez wants at least 5% more than the operation replaced
+REPLACEMENT_FEE = 1.1
+
+Entry = namedtuple('Entry', ['index', 'group', 'attempts', 'not_before', 'addresses', 'key', 'replacements'])
+Flight = namedtuple('Flight', ['entry', 'key', 'level'])
+Result = namedtuple('Result', ['hashes', 'failed', 'retries', 'elapsed'])
+
+## Keys
+#
+
+class OctezSigner:
+  """Signs with a key known to octez-client."""
+
+  def __init__(self, alias):
+    self.alias = alias
+
+  def run(self, *args):
+    proc = subprocess.run([CLIENT] + list(args), capture_output=True, text=True)
+    if proc.returncode != 0:
+      raise rpc.RpcError('octez-client %s: %s' % (args[0], proc.stderr or proc.stdout))
+    return proc.stdout
+
+  def address(self):
+    return re.search(r'Hash: (tz\w+)', self.run('show', 'address', self.alias)).group(1)
+
+  def __call__(self, data):
+    output = self.run('sign', 'bytes', '0x' + data.hex(), 'for', self.alias)
+    return signature_bytes(re.search(r'Signature: (\w+)', output).group(1))
+
+class Key:
+  """An admin key: its address, its signer, its counter, its unconfirmed operation and its metrics."""
+
+  def __init__(self, address, sign):
+    self.address = address
+    self.sign = sign
+    self.counter = None
+    self.operation = None
+    self.groups = 0
+    self.calls = 0
+    self.failures = 0
+
+  def metrics(self, elapsed):
+    return {
+      'groups': self.groups, 'calls': self.calls, 'failures': self.failures,
+      'calls_per_second': self.calls / elapsed if elapsed else 0.0,
+    }
+
+## Dispatcher
+#
+
+class Dispatcher:
+  def __init__(self, node, keys, addresses, costs=batcher.COSTS, margin=1.2, retries=5, backoff=1.0, poll=2.0, timeout=5,
+               sleep=time.sleep, clock=time.monotonic, log=print):
+    self.node = node
+    self.keys = keys
+    self.addresses = addresses
+    self.costs = costs
+    self.margin = margin
+    self.retries = retries
+    self.backoff = backoff
+    self.poll = poll
+    self.timeout = timeout
+    self.sleep = sleep
+    self.clock = clock
+    self.log = log
+    self.turn = 0
+
+  def free_key(self):
+    """Next key, round-robin, without an unconfirmed operation."""
+    for i in range(len(self.keys)):
+      key = self.keys[(self.turn + i) % len(self.keys)]
+      if key.operation is None:
+        self.turn = (self.turn + i + 1) % len(self.keys)
+        return key
+    return None
+
+  def send(self, key, group, branch, replacements=0):
+    if key.counter is None:
+      key.counter = self.node.counter(key.address)
+    contents = batcher.contents(key.address, key.counter, group, self.addresses, self.costs, self.margin)
+    for content in contents:
+      content['fee'] = str(int(math.ceil(int(content['fee']) * REPLACEMENT_FEE ** replacements)))
+    forged = self.node.forge(branch, contents)
+    signature = key.sign(WATERMARK + bytes.fromhex(forged))
+    operation = self.node.inject(forged + signature.hex())
+    key.counter += len(contents)
+    return operation
+
+  def included(self, levels):
+    """Manager operations of the blocks at `levels`, by hash."""
+    operations = {}
+    for level in levels:
+      passes = self.node.block(level)['operations']
+      for operation in passes[3] if len(passes) > 3 else []:
+        operations[operation['hash']] = operation
+    return operations
+
+  def retry(self, entry, error, now, key=None):
+    """Entry to send again after a backoff, or None once `entry` is out of retries."""
+    if entry.attempts + 1 >= self.retries:
+      self.log('group %d failed: %s' % (entry.index, error))
+      return None
+    return entry._replace(attempts=entry.attempts + 1, not_before=now + self.backoff * 2 ** entry.attempts, key=key)
+
+  def requeue(self, pending, entry):
+    """Put `entry` back in `pending`, which stays in queue order."""
+    pending.insert(bisect.bisect([e.index for e in pending], entry.index), entry)
+
+  def forget(self, flights, index):
+    """Stop watching the operations of group `index` and free their keys."""
+    for hash in [h for h, flight in flights.items() if flight.entry.index == index]:
+      flights.pop(hash).key.operation = None
+
+  def dispatch(self, groups):
+    """Send every group; return the hashes of the applied ones and the failures by group index."""
+    pending = [Entry(i, group, 0, 0.0, {call.address for call in group.calls}, None, 0) for i, group in enumerate(groups)]
+    hashes, failed, retries = {}, {}, 0
+    given_up, flights = set(), {}
+    start = self.clock()
+    seen = self.node.head()['level']
+    while pending or any(flight.level is not None for flight in flights.values()):
+      head, now = self.node.head(), self.clock()
+      for hash, operation in self.included(range(seen + 1, head['level'] + 1)).items():
+        flight = flights.get(hash)
+        if flight is None:
+          continue
+        entry, key = flight.entry, flight.key
+        # Its other operations, and a retry still waiting, can no longer apply
+        self.forget(flights, entry.index)
+        pending = [e for e in pending if e.index != entry.index]
+        try:
+          rpc.check_applied([content['metadata']['operation_result'] for content in operation['contents']])
+        except rpc.RpcError as e:
+          key.failures += 1
+          failed[entry.index] = str(e)
+          given_up |= entry.addresses
+          self.log('group %d failed in %s: %s' % (entry.index, hash, e))
+          continue
+        hashes[entry.index] = hash
+        key.groups += 1
+        key.calls += len(entry.group.calls)
+        self.log('group %d: %d calls from %s in %s' % (entry.index, len(entry.group.calls), key.address, hash))
+      seen = head['level']
+      for hash, flight in list(flights.items()):
+        if flight.level is None or head['level'] - flight.level < self.timeout:
+          continue
+        # The key stays reserved for the retry, which reuses the counter
+        flight.key.counter = None
+        flight.key.failures += 1
+        error = 'not included after %d blocks' % self.timeout
+        entry = self.retry(flight.entry, error, now, flight.key)
+        if entry is None:
+          self.forget(flights, flight.entry.index)
+          failed[flight.entry.index] = error
+          given_up |= flight.entry.addresses
+        else:
+          # Still watched, in case it is included after all
+          flights[hash] = flight._replace(level=None)
+          retries += 1
+          self.requeue(pending, entry._replace(replacements=entry.replacements + 1))
+      for entry in [e for e in pending if e.addresses & given_up]:
+        pending.remove(entry)
+        failed[entry.index] = 'an earlier group on the same address failed'
+      blocked = set()
+      for flight in flights.values():
+        if flight.level is not None:
+          blocked |= flight.entry.addresses
+      entry = key = None
+      for candidate in pending:
+        if candidate.not_before <= now and not candidate.addresses & blocked:
+          if candidate.key is None:
+            key = self.free_key()
+          elif candidate.key.operation is None or flights[candidate.key.operation].entry.index == candidate.index:
+            key = candidate.key
+          if key is not None:
+            entry = candidate
+            break
+        blocked |= candidate.addresses
+      if entry is None:
+        self.sleep(self.poll)
+        continue
+      pending.remove(entry)
+      try:
+        hash = self.send(key, entry.group, head['hash'], entry.replacements)
+      except rpc.RpcError as e:
+        key.failures += 1
+        if 'counter' in str(e):
+          key.counter = None
+        retry = self.retry(entry, e, now, entry.key)
+        if retry is None:
+          self.forget(flights, entry.index)
+          failed[entry.index] = str(e)
+          given_up |= entry.addresses
+        else:
+          retries += 1
+          self.requeue(pending, retry)
+        continue
+      key.operation = hash
+      flights[hash] = Flight(entry, key, head['level'])
+    return Result(hashes, failed, retries, self.clock() - start)
+
+  def report(self, result):
+    lines = ['%d groups applied, %d failed, %d retries in %.1fs' % (len(result.hashes), len(result.failed), result.retries, result.elapsed)]
+    for key in self.keys:
+      metrics = key.metrics(result.elapsed)
+      lines.append('%s  %4d groups  %6d calls  %3d failures  %.2f calls/s' % (
+        key.address, metrics['groups'], metrics['calls'], metrics['failures'], metrics['calls_per_second']))
+    return '\n'.join(lines)
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('queue', help='calls, one JSON object per line (see tools.batcher)')
+  parser.add_argument('--controller', required=True)
+  parser.add_argument('--store', required=True)
+  parser.add_argument('--rpc', required=True)
+  parser.add_argument('--key', action='append', required=True, help='octez-client alias of an admin key, repeatable')
+  parser.add_argument('--baseline', help='benchmark baseline to calibrate the cost table with')
+  parser.add_argument('--retries', type=int, default=5)
+  parser.add_argument('--backoff', type=float, default=1.0, help='first retry delay in seconds, doubled on each retry')
+  parser.add_argument('--timeout', type=int, default=5, help='blocks to wait for a group to be included before sending it again')
+  args = parser.parse_args(argv)
+
+  try:
+    costs = batcher.load_costs(args.baseline)
+    keys = [Key(signer.address(), signer) for signer in map(OctezSigner, args.key)]
+    groups = batcher.pack(batcher.read_queue(args.queue), costs=costs)
+  except (batcher.BatchError, rpc.RpcError) as e:
+    print(e, file=sys.stderr)
+    return 1
+  dispatcher = Dispatcher(rpc.Node(args.rpc), keys, {'Controller': args.controller, 'Store': args.store},
+    costs, retries=args.retries, backoff=args.backoff, timeout=args.timeout)
+  result = dispatcher.dispatch(groups)
+  print(dispatcher.report(result))
+  return 1 if result.failed else 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,83 @@
+"""Base58check and address encoding helpers."""
+
+import hashlib
+
+ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+PREFIXES = {
+  'tz1': bytes([6, 161, 159]),
+  'tz2': bytes([6, 161, 161]),
+  'tz3': bytes([6, 161, 164]),
+  'KT1': bytes([2, 90, 121]),
+  'expr': bytes([13, 44, 64, 27]),
+  'Net': bytes([87, 82, 0]),
+  'edpk': bytes([13, 15, 37, 217]),
+  'edsk': bytes([13, 15, 58, 7]),
+  'o': bytes([5, 116]),
+  'edsig': bytes([9, 245, 205, 134, 18]),
+  'spsig1': bytes([13, 115, 101, 19, 63]),
+  'p2sig': bytes([54, 240, 44, 52]),
+}
+
+def b58encode(data):
+  n = int.from_bytes(data, 'big')
+  out = ''
+  while n > 0:
+    n, r = divmod(n, 58)
+    out = ALPHABET[r] + out
+  pad = len(data) - len(data.lstrip(b'\0'))
+  return ALPHABET[0] * pad + out
+
+def b58decode(text):
+  n = 0
+  for c in text:
+    n = n * 58 + ALPHABET.index(c)
+  pad = len(text) - len(text.lstrip(ALPHABET[0]))
+  body = n.to_bytes((n.bit_length() + 7) // 8, 'big') if n else b''
+  return b'\0' * pad + body
+
+def checksum(data):
+  return hashlib.sha256(hashlib.sha256(data).digest()).digest()[:4]
+
+def b58encode_check(payload, prefix=b''):
+  data = prefix + payload
+  return b58encode(data + checksum(data))
+
+def b58decode_check(text, prefix=b''):
+  raw = b58decode(text)
+  data, check = raw[:-4], raw[-4:]
+  if checksum(data) != check:
+    raise ValueError('Invalid checksum: %s' % text)
+  if not data.startswith(prefix):
+    raise ValueError('Invalid prefix: %s' % text)
+  return data[len(prefix):]
+
+def address_bytes(address):
+  """Binary (optimized) form of an address, as used by PACK and for ordering."""
+  kind = address[:3]
+  if kind not in ('tz1', 'tz2', 'tz3', 'KT1'):
+    raise ValueError('Unsupported address: %s' % address)
+  payload = b58decode_check(address, PREFIXES[kind])
+  if kind == 'KT1':
+    return b'\x01' + payload + b'\x00'
+  return b'\x00' + bytes([['tz1', 'tz2', 'tz3'].index(kind)]) + payload
+
+def address_from_bytes(data):
+  """Inverse of address_bytes."""
+  if data[0] == 1:
+    return b58encode_check(data[1:21], PREFIXES['KT1'])
+  if data[0] == 0 and data[1] < 3:
+    return b58encode_check(data[2:22], PREFIXES[['tz1', 'tz2', 'tz3'][data[1]]])
+  raise ValueError('Unsupported address bytes: %s' % data.hex())
+
+def make_address(seed, kind='tz1'):
+  """Deterministic, syntactically valid address derived from `seed`."""
+  digest = hashlib.blake2b(str(seed).encode(), digest_size=20).digest()
+  return b58encode_check(digest, PREFIXES[kind])
+
+def signature_bytes(signature):
+  """Raw 64 bytes of a base58 edsig/spsig1/p2sig signature."""
+  for kind in ('edsig', 'spsig1', 'p2sig'):
+    if signature.startswith(kind):
+      return b58decode_check(signature, PREFIXES[kind])
+  raise ValueError('Unsupported signature: %s' % signature)
@@ -0,0 +1,9 @@
+"""SQLite mirror of a TezID store, fed by big_map diffs.
+
+  python -m tools.indexer --rpc http://localhost:8732 --store KT1... --from-level 1800000 tezid.sqlite
+
+Blocks come from a source (RPC node or JSON fixture, see sources.py), the
+proofs big_map updates are decoded (decode.py) and written in batches
+together with the block cursor (db.py), so an interrupted sync resumes
+where it stopped. db.py also has the query helpers.
+"""
@@ -0,0 +1,32 @@
+import argparse
+import sys
+
+from tools.indexer import db
+from tools.indexer.sources import FixtureSource, RpcSource, SourceError
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(prog='python -m tools.indexer', description='Mirror a TezID store into SQLite.')
+  parser.add_argument('database')
+  parser.add_argument('--store', required=True, help='store contract address')
+  source = parser.add_mutually_exclusive_group(required=True)
+  source.add_argument('--rpc', help='node RPC url')
+  source.add_argument('--fixture', help='JSON fixture of blocks')
+  parser.add_argument('--from-level', type=int, default=0, help='first level of a new mirror (store origination)')
+  parser.add_argument('--to-level', type=int, help='last level to index (default: head - confirmations)')
+  parser.add_argument('--confirmations', type=int, default=2)
+  parser.add_argument('--batch', type=int, default=100, help='blocks per transaction')
+  args = parser.parse_args(argv)
+
+  conn = db.connect(args.database)
+  try:
+    source = RpcSource(args.rpc) if args.rpc else FixtureSource(args.fixture)
+    count = db.sync(conn, source, args.store, args.from_level, args.to_level, args.confirmations, args.batch)
+  except (SourceError, db.IndexerError) as e:
+    print(e, file=sys.stderr)
+    return 1
+  state = db.cursor(conn, args.store)
+  print('Indexed %d blocks, at level %s' % (count, state[1] if state else '-'))
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,129 @@
+"""SQLite schema, batched writes and queries of the indexer.
+
+`proofs` mirrors the store's proofs big_map with the TProof fields of
+contracts/types.py; an identity is the set of rows sharing an address.
+"""
+
+import json
+import sqlite3
+
+from tools.indexer import decode
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS proofs (
+  address TEXT NOT NULL,
+  prooftype TEXT NOT NULL,
+  register_date INTEGER NOT NULL,
+  verified INTEGER NOT NULL,
+  meta TEXT NOT NULL,
+  level INTEGER NOT NULL,
+  PRIMARY KEY (address, prooftype)
+);
+CREATE INDEX IF NOT EXISTS proofs_by_type ON proofs (prooftype, verified, register_date);
+CREATE TABLE IF NOT EXISTS cursor (
+  store TEXT PRIMARY KEY,
+  big_map INTEGER NOT NULL,
+  level INTEGER NOT NULL,
+  hash TEXT
+);
+"""
+
+class IndexerError(Exception):
+  pass
+
+def connect(path):
+  conn = sqlite3.connect(path)
+  conn.executescript(SCHEMA)
+  return conn
+
+## Cursor
+#
+
+def cursor(conn, store):
+  """(big_map, level, hash) of the last indexed block of `store`, or None."""
+  return conn.execute('SELECT big_map, level, hash FROM cursor WHERE store = ?', (store,)).fetchone()
+
+def check_store(conn, store):
+  stores = [row[0] for row in conn.execute('SELECT store FROM cursor')]
+  if stores and stores != [store]:
+    raise IndexerError('Database already mirrors %s' % ', '.join(stores))
+
+## Writes
+#
+
+def write_batch(conn, store, big_map, updates, level, hash):
+  """Apply `updates` and move the cursor to `level` in one transaction."""
+  latest = {}
+  for update_level, update in updates:
+    latest[update.address, update.prooftype] = (update_level, update.proof)
+  rows = [
+    (address, prooftype, proof.register_date, int(proof.verified), json.dumps(proof.meta, sort_keys=True), update_level)
+    for (address, prooftype), (update_level, proof) in latest.items() if proof is not None
+  ]
+  removed = [key for key, (_, proof) in latest.items() if proof is None]
+  with conn:
+    conn.executemany('INSERT OR REPLACE INTO proofs VALUES (?, ?, ?, ?, ?, ?)', rows)
+    conn.executemany('DELETE FROM proofs WHERE address = ? AND prooftype = ?', removed)
+    conn.execute('INSERT OR REPLACE INTO cursor VALUES (?, ?, ?, ?)', (store, big_map, level, hash))
+
+## Sync
+#
+
+def sync(conn, source, store, from_level, to_level=None, confirmations=2, batch=100):
+  """Index blocks of `source` up to `to_level` (default: head - confirmations).
+
+  Returns the number of blocks indexed. Resumes after the stored cursor.
+  """
+  check_store(conn, store)
+  state = cursor(conn, store)
+  if state is None:
+    big_map = decode.store_big_maps(source.storage(store))['proofs']
+    start = from_level
+  else:
+    big_map, level, _ = state
+    start = level + 1
+  end = source.head() - confirmations if to_level is None else to_level
+
+  updates = []
+  level = start
+  for level in range(start, end + 1):
+    block = source.block(level)
+    updates += [(level, update) for update in decode.proof_updates(block, big_map)]
+    if (level - start + 1) % batch == 0 or level == end:
+      write_batch(conn, store, big_map, updates, level, block.get('hash'))
+      updates = []
+  return max(0, end - start + 1)
+
+## Queries
+#
+
+def proofs_for(conn, address):
+  """{prooftype: Proof} of `address`."""
+  rows = conn.execute('SELECT prooftype, register_date, verified, meta FROM proofs WHERE address = ?', (address,))
+  return {row[0]: decode.Proof(row[1], bool(row[2]), json.loads(row[3])) for row in rows}
+
+def addresses_with(conn, prooftypes, verified=True, registered_after=None):
+  """Addresses holding every type in `prooftypes`, e.g. verified email and
+  phone registered after a timestamp."""
+  prooftypes = sorted(set(prooftypes))
+  if not prooftypes:
+    raise ValueError('No prooftypes to match')
+  query = 'SELECT address FROM proofs WHERE prooftype IN (%s)' % ', '.join('?' * len(prooftypes))
+  args = list(prooftypes)
+  if verified is not None:
+    query += ' AND verified = ?'
+    args.append(int(verified))
+  if registered_after is not None:
+    query += ' AND register_date > ?'
+    args.append(registered_after)
+  query += ' GROUP BY address HAVING COUNT(*) = ? ORDER BY address'
+  args.append(len(prooftypes))
+  return [row[0] for row in conn.execute(query, args)]
+
+def count_by_prooftype(conn, verified=None):
+  query = 'SELECT prooftype, COUNT(*) FROM proofs'
+  args = []
+  if verified is not None:
+    query += ' WHERE verified = ?'
+    args.append(int(verified))
+  return dict(conn.execute(query + ' GROUP BY prooftype', args).fetchall())
@@ -0,0 +1,98 @@
+"""Decoding of RPC blocks into proof updates of a TezID store."""
+
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from tools.encoding import address_from_bytes
+
+Proof = namedtuple('Proof', ['register_date', 'verified', 'meta'])
+# `proof` is None when the key was removed
+Update = namedtuple('Update', ['address', 'prooftype', 'proof'])
+
+## Micheline values
+#
+
+def pair_args(node):
+  """Arguments of a Pair, with right combs `Pair a b c` folded to two."""
+  if isinstance(node, list):
+    args = node
+  elif node.get('prim') == 'Pair':
+    args = node['args']
+  else:
+    raise ValueError('Expected a pair: %s' % node)
+  if len(args) > 2:
+    return [args[0], {'prim': 'Pair', 'args': args[1:]}]
+  return args
+
+def record(node, names):
+  """{name: node} of a record in SmartPy's layout (see tools.michelson)."""
+  names = sorted(names)
+  if len(names) == 1:
+    return {names[0]: node}
+  split = len(names) // 2
+  left, right = pair_args(node)
+  fields = record(left, names[:split])
+  fields.update(record(right, names[split:]))
+  return fields
+
+def address(node):
+  if 'bytes' in node:
+    return address_from_bytes(bytes.fromhex(node['bytes']))
+  return node['string']
+
+def timestamp(node):
+  if 'int' in node:
+    return int(node['int'])
+  return int(datetime.strptime(node['string'][:19], '%Y-%m-%dT%H:%M:%S').replace(tzinfo=timezone.utc).timestamp())
+
+def boolean(node):
+  return node['prim'] == 'True'
+
+def string_map(node):
+  return {elt['args'][0]['string']: elt['args'][1]['string'] for elt in node}
+
+def proof_key(node):
+  fields = record(node, ['address', 'prooftype'])
+  return address(fields['address']), fields['prooftype']['string']
+
+def proof(node):
+  fields = record(node, ['meta', 'register_date', 'verified'])
+  return Proof(timestamp(fields['register_date']), boolean(fields['verified']), string_map(fields['meta']))
+
+## Store
+#
+
+def store_big_maps(storage):
+  """{field: big_map id} of a TStoreStorage value."""
+  fields = record(storage, ['admins', 'identities', 'metadata', 'proofs'])
+  return {name: int(fields[name]['int']) for name in ('identities', 'metadata', 'proofs')}
+
+## Blocks
+#
+
+def results(content):
+  metadata = content.get('metadata', {})
+  if 'operation_result' in metadata:
+    yield metadata['operation_result']
+  for internal in metadata.get('internal_operation_results', []):
+    yield internal['result']
+
+def big_map_updates(block, big_map):
+  """Raw (key, value) updates of big_map `big_map` applied in `block`, in order."""
+  for group in block.get('operations', []):
+    for operation in group:
+      for content in operation.get('contents', []):
+        for result in results(content):
+          if result.get('status') != 'applied':
+            continue
+          for diff in result.get('lazy_storage_diff', []):
+            if diff.get('kind') != 'big_map' or int(diff['id']) != big_map:
+              continue
+            if diff['diff']['action'] in ('update', 'alloc'):
+              for update in diff['diff'].get('updates', []):
+                yield update['key'], update.get('value')
+
+def proof_updates(block, big_map):
+  for key, value in big_map_updates(block, big_map):
+    address, prooftype = proof_key(key)
+    yield Update(address, prooftype, None if value is None else proof(value))
@@ -0,0 +1,59 @@
+"""Block sources for the indexer.
+
+A source has `head()`, the level of the last block it can serve,
+`block(level)`, the block in RPC JSON form, and `storage(address, level)`.
+"""
+
+import json
+import urllib.request
+
+class SourceError(Exception):
+  pass
+
+class RpcSource:
+  """A Tezos node RPC endpoint."""
+
+  def __init__(self, url, timeout=30):
+    self.url = url.rstrip('/')
+    self.timeout = timeout
+
+  def get(self, path):
+    try:
+      with urllib.request.urlopen(self.url + path, timeout=self.timeout) as response:
+        return json.load(response)
+    except OSError as e:
+      raise SourceError('GET %s: %s' % (path, e))
+
+  def head(self):
+    return self.get('/chains/main/blocks/head/header')['level']
+
+  def block(self, level):
+    return self.get('/chains/main/blocks/%d' % level)
+
+  def storage(self, address, level='head'):
+    return self.get('/chains/main/blocks/%s/context/contracts/%s/storage' % (level, address))
+
+class FixtureSource:
+  """Blocks from a JSON file: {"blocks": [...], "storage": {address: value}}.
+
+  Levels missing from the fixture are served as empty blocks.
+  """
+
+  def __init__(self, path):
+    with open(path) as f:
+      fixture = json.load(f)
+    self.blocks = {block['header']['level']: block for block in fixture['blocks']}
+    self.storages = fixture.get('storage', {})
+
+  def head(self):
+    return max(self.blocks)
+
+  def block(self, level):
+    if level > self.head():
+      raise SourceError('No block %d in fixture' % level)
+    return self.blocks.get(level, {'hash': None, 'header': {'level': level}, 'operations': []})
+
+  def storage(self, address, level='head'):
+    if address not in self.storages:
+      raise SourceError('No storage for %s in fixture' % address)
+    return self.storages[address]
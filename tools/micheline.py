@@ -0,0 +1,181 @@
+"""Binary encoding of Micheline expressions in their JSON form.
+
+This is the encoding used on chain for scripts and storage, and by PACK
+(prefixed with 0x05). Nodes are the JSON produced by `spy compile`
+(*_contract.json, *_storage.json) or by `octez-client convert`:
+
+  {"int": "1"}, {"string": "a"}, {"bytes": "00"}, [...],
+  {"prim": "Pair", "args": [...], "annots": [...]}
+"""
+
+import hashlib
+import re
+import struct
+
+from tools.encoding import PREFIXES, b58encode_check
+
+PRIMITIVES = [
+  'parameter', 'storage', 'code', 'False', 'Elt', 'Left', 'None', 'Pair',
+  'Right', 'Some', 'True', 'Unit', 'PACK', 'UNPACK', 'BLAKE2B', 'SHA256',
+  'SHA512', 'ABS', 'ADD', 'AMOUNT', 'AND', 'BALANCE', 'CAR', 'CDR',
+  'CHECK_SIGNATURE', 'COMPARE', 'CONCAT', 'CONS', 'CREATE_ACCOUNT',
+  'CREATE_CONTRACT', 'IMPLICIT_ACCOUNT', 'DIP', 'DROP', 'DUP', 'EDIV',
+  'EMPTY_MAP', 'EMPTY_SET', 'EQ', 'EXEC', 'FAILWITH', 'GE', 'GET', 'GT',
+  'HASH_KEY', 'IF', 'IF_CONS', 'IF_LEFT', 'IF_NONE', 'INT', 'LAMBDA', 'LE',
+  'LEFT', 'LOOP', 'LSL', 'LSR', 'LT', 'MAP', 'MEM', 'MUL', 'NEG', 'NEQ',
+  'NIL', 'NONE', 'NOT', 'NOW', 'OR', 'PAIR', 'PUSH', 'RIGHT', 'SIZE', 'SOME',
+  'SOURCE', 'SENDER', 'SELF', 'STEPS_TO_QUOTA', 'SUB', 'SWAP',
+  'TRANSFER_TOKENS', 'SET_DELEGATE', 'UNIT', 'UPDATE', 'XOR', 'ITER',
+  'LOOP_LEFT', 'ADDRESS', 'CONTRACT', 'ISNAT', 'CAST', 'RENAME', 'bool',
+  'contract', 'int', 'key', 'key_hash', 'lambda', 'list', 'map', 'big_map',
+  'nat', 'option', 'or', 'pair', 'set', 'signature', 'string', 'bytes',
+  'mutez', 'timestamp', 'unit', 'operation', 'address', 'SLICE', 'DIG',
+  'DUG', 'EMPTY_BIG_MAP', 'APPLY', 'chain_id', 'CHAIN_ID', 'LEVEL',
+  'SELF_ADDRESS', 'never', 'NEVER', 'UNPAIR', 'VOTING_POWER',
+  'TOTAL_VOTING_POWER', 'KECCAK', 'SHA3', 'PAIRING_CHECK', 'bls12_381_g1',
+  'bls12_381_g2', 'bls12_381_fr', 'sapling_state',
+  'sapling_transaction_deprecated', 'SAPLING_EMPTY_STATE',
+  'SAPLING_VERIFY_UPDATE', 'ticket', 'TICKET_DEPRECATED', 'READ_TICKET',
+  'SPLIT_TICKET', 'JOIN_TICKETS', 'GET_AND_UPDATE', 'chest', 'chest_key',
+  'OPEN_CHEST', 'VIEW', 'view', 'constant', 'SUB_MUTEZ',
+  'tx_rollup_l2_address', 'MIN_BLOCK_TIME', 'sapling_transaction', 'EMIT',
+  'Lambda_rec', 'LAMBDA_REC', 'TICKET', 'BYTES', 'NAT',
+]
+CODES = {prim: code for code, prim in enumerate(PRIMITIVES)}
+
+def zarith(value):
+  """Signed variable length integer: sign in bit 6 of the first byte."""
+  sign = 0x40 if value < 0 else 0
+  value = abs(value)
+  out = bytearray([sign | (value & 0x3f)])
+  value >>= 6
+  while value:
+    out[-1] |= 0x80
+    out.append(value & 0x7f)
+    value >>= 7
+  return bytes(out)
+
+def sized(data):
+  return struct.pack('>I', len(data)) + data
+
+def encode(node):
+  if isinstance(node, list):
+    return b'\x02' + sized(b''.join(encode(n) for n in node))
+  if 'int' in node:
+    return b'\x00' + zarith(int(node['int']))
+  if 'string' in node:
+    return b'\x01' + sized(node['string'].encode())
+  if 'bytes' in node:
+    return b'\x0a' + sized(bytes.fromhex(node['bytes']))
+  if node['prim'] not in CODES:
+    raise ValueError('Unknown primitive %s' % node['prim'])
+  prim = bytes([CODES[node['prim']]])
+  args = node.get('args', [])
+  annots = node.get('annots', [])
+  if len(args) < 3:
+    tag = 3 + 2 * len(args) + (1 if annots else 0)
+    out = bytes([tag]) + prim + b''.join(encode(arg) for arg in args)
+    return out + (sized(' '.join(annots).encode()) if annots else b'')
+  return b'\x09' + prim + sized(b''.join(encode(arg) for arg in args)) + sized(' '.join(annots).encode())
+
+def size(node):
+  return len(encode(node))
+
+def pack(node):
+  """PACK of an already typed value (addresses, keys etc. in bytes form)."""
+  return b'\x05' + encode(node)
+
+def expr_hash(node):
+  """Address of `node` registered as a global constant: the hash of its encoding, without the PACK prefix."""
+  return b58encode_check(hashlib.blake2b(encode(node), digest_size=32).digest(), PREFIXES['expr'])
+
+def to_text(node, nested=False):
+  """Michelson source of `node`, as accepted by octez-client."""
+  if isinstance(node, list):
+    return '{ %s }' % ' ; '.join(to_text(n) for n in node) if node else '{}'
+  if 'int' in node:
+    return node['int']
+  if 'string' in node:
+    return '"%s"' % node['string'].replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+  if 'bytes' in node:
+    return '0x' + node['bytes']
+  args = node.get('args', [])
+  annots = node.get('annots', [])
+  text = ' '.join([node['prim']] + annots + [to_text(arg, True) for arg in args])
+  return '(%s)' % text if nested and (args or annots) else text
+
+TOKEN = re.compile(r'''\s*(?:
+  (?P<bytes>0x[0-9a-fA-F]*) | (?P<int>-?\d+) | (?P<string>"(?:[^"\\]|\\.)*") |
+  (?P<annot>[%@:][\w.%@]*) | (?P<prim>[A-Za-z_]\w*) | (?P<punct>[(){};])
+)''', re.VERBOSE)
+ESCAPES = {'n': '\n', 'r': '\r', 't': '\t', '"': '"', '\\': '\\'}
+
+def tokens(text):
+  position, text = 0, text.strip()
+  while position < len(text):
+    match = TOKEN.match(text, position)
+    if match is None:
+      raise ValueError('Invalid Michelson at %d: %r' % (position, text[position:position + 20]))
+    position = match.end()
+    yield match.lastgroup, match.group(match.lastgroup)
+
+def parse(text):
+  """Inverse of to_text: the JSON form of Michelson `text`."""
+  stream = list(tokens(text)) + [('end', None)]
+  position = 0
+
+  def peek():
+    return stream[position]
+
+  def take(expected=None):
+    nonlocal position
+    kind, value = stream[position]
+    if expected is not None and value != expected:
+      raise ValueError('Expected %r, got %r' % (expected, value))
+    position += 1
+    return kind, value
+
+  def atom():
+    kind, value = take()
+    if kind == 'int':
+      return {'int': value}
+    if kind == 'bytes':
+      return {'bytes': value[2:].lower()}
+    if kind == 'string':
+      return {'string': re.sub(r'\\(.)', lambda m: ESCAPES[m.group(1)], value[1:-1])}
+    if kind == 'prim':
+      return {'prim': value}
+    if value == '(':
+      node = application()
+      take(')')
+      return node
+    if value == '{':
+      items = []
+      while peek()[1] != '}':
+        items.append(application())
+        if peek()[1] == ';':
+          take()
+      take('}')
+      return items
+    raise ValueError('Unexpected %r' % value)
+
+  def application():
+    kind, value = peek()
+    if kind != 'prim':
+      return atom()
+    take()
+    node, annots, args = {'prim': value}, [], []
+    while peek()[0] == 'annot':
+      annots.append(take()[1])
+    while peek()[0] != 'end' and peek()[1] not in (')', '}', ';'):
+      args.append(atom())
+    if args:
+      node['args'] = args
+    if annots:
+      node['annots'] = annots
+    return node
+
+  node = application()
+  if peek()[0] != 'end':
+    raise ValueError('Trailing Michelson: %r' % text)
+  return node
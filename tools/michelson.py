@@ -0,0 +1,92 @@
+"""Michelson literals for calling the SmartPy compiled TezID contracts.
+
+Records follow SmartPy's default layout: fields sorted by name and laid out
+as a balanced binary tree of pairs.
+"""
+
+from tools.encoding import address_bytes
+
+def string(value):
+  escaped = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+  return '"%s"' % escaped
+
+def address(value):
+  return string(value)
+
+def nat(value):
+  if value < 0:
+    raise ValueError('Negative nat: %s' % value)
+  return str(int(value))
+
+def int_(value):
+  return str(int(value))
+
+def mutez(value):
+  return nat(value)
+
+def timestamp(value):
+  return int_(value)
+
+def boolean(value):
+  return 'True' if value else 'False'
+
+def unit():
+  return 'Unit'
+
+def pair(left, right):
+  return '(Pair %s %s)' % (left, right)
+
+def some(value):
+  return '(Some %s)' % value
+
+def none():
+  return 'None'
+
+def seq(values):
+  values = list(values)
+  if not values:
+    return '{}'
+  return '{ %s }' % ' ; '.join(values)
+
+def tree(values):
+  values = list(values)
+  if len(values) == 1:
+    return values[0]
+  split = len(values) // 2
+  return pair(tree(values[:split]), tree(values[split:]))
+
+def record(**fields):
+  return tree(fields[name] for name in sorted(fields))
+
+def sort_key(key):
+  # Addresses are ordered by their binary form, everything else used as a key
+  # here (strings, nats) orders like its python value.
+  if isinstance(key, str) and key[:3] in ('tz1', 'tz2', 'tz3', 'KT1') and len(key) == 36:
+    return (0, address_bytes(key))
+  return (1, key)
+
+def set_(keys, encode):
+  return seq(encode(k) for k in sorted(keys, key=sort_key))
+
+def mapping(items, encode_key, encode_value):
+  items = dict(items)
+  return seq(
+    'Elt %s %s' % (encode_key(k), encode_value(items[k]))
+    for k in sorted(items, key=sort_key)
+  )
+
+## TezID types
+#
+
+def proof(register_date, verified, meta=None):
+  return record(
+    register_date = timestamp(register_date),
+    verified = boolean(verified),
+    meta = mapping(meta or {}, string, string)
+  )
+
+def proof_key(addr, prooftype):
+  return record(address = address(addr), prooftype = string(prooftype))
+
+def set_proof_payload(addr, prooftype, encoded_proof):
+  return record(address = address(addr), prooftype = string(prooftype), proof = encoded_proof)
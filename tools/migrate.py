@@ -0,0 +1,262 @@
+"""Chunked, resumable migration of a store snapshot through setProofs.
+
+The snapshot (JSON lines, see snapshot.py) is packed into setProofs
+parameters that stay under the operation size, gas and storage limits.
+Progress is kept in a manifest, so an interrupted run resumes after the
+last submitted chunk.
+
+  python -m tools.migrate plan snapshot.jsonl --store KT1... [--rpc URL --source tz1...]
+  python -m tools.migrate run snapshot.jsonl --store KT1... --source alias --manifest migration.json
+
+`plan` prints the chunks with the expected total gas and storage burn and
+submits nothing. Estimates come from the cost model below, or from
+simulating every chunk with the node's run_operation RPC when --rpc is
+given. `run` submits the pending chunks with octez-client.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import namedtuple
+
+from tools import micheline, rpc, snapshot
+from tools.encoding import address_bytes
+
+CLIENT = os.environ.get('OCTEZ_CLIENT', 'octez-client')
+MUTEZ_PER_BYTE = 250
+
+# Protocol limits per operation
+Limits = namedtuple('Limits', ['bytes', 'gas', 'storage'])
+LIMITS = Limits(bytes=32768, gas=1040000, storage=60000)
+
+# Rough per-item costs of setProofs, used when no node is available
+Cost = namedtuple('Cost', ['gas_base', 'gas_identity', 'gas_proof', 'gas_byte', 'storage_key'])
+COST = Cost(gas_base=4000, gas_identity=2500, gas_proof=1800, gas_byte=3, storage_key=65)
+
+# Sequence tag and length of the map around the identities
+SEQUENCE = micheline.size([])
+
+Chunk = namedtuple('Chunk', ['index', 'first', 'last', 'identities', 'proofs', 'bytes', 'gas', 'storage'])
+
+class MigrationError(Exception):
+  pass
+
+## Parameters
+#
+
+def proof_value(proof):
+  return {'prim': 'Pair', 'args': [
+    [{'prim': 'Elt', 'args': [{'string': k}, {'string': proof.meta[k]}]} for k in sorted(proof.meta)],
+    {'prim': 'Pair', 'args': [{'int': str(proof.register_date)}, {'prim': 'True' if proof.verified else 'False'}]},
+  ]}
+
+def identity_value(identity):
+  return {'prim': 'Elt', 'args': [
+    {'string': identity.address},
+    [{'prim': 'Elt', 'args': [{'string': t}, proof_value(identity.proofs[t])]} for t in sorted(identity.proofs)],
+  ]}
+
+def set_proofs_value(identities):
+  """TSetProofs Micheline value for `identities`, keys in Michelson order."""
+  return [identity_value(i) for i in sorted(identities, key=lambda identity: address_bytes(identity.address))]
+
+def cost_of(identity, cost=COST):
+  """(bytes, gas, storage) `identity` adds to a setProofs call on an empty store."""
+  size = micheline.size(identity_value(identity))
+  keys = 1 + len(identity.proofs)
+  gas = cost.gas_identity + cost.gas_proof * len(identity.proofs) + cost.gas_byte * size
+  # Every proof and identity is a new big_map key; their values are about the size of the parameter
+  return size, gas, size + cost.storage_key * keys
+
+def estimate(identities, cost=COST):
+  """(bytes, gas, storage) of a setProofs call writing `identities` to an empty store."""
+  figures = [cost_of(identity, cost) for identity in identities]
+  return add((SEQUENCE, cost.gas_base, 0), *figures)
+
+def add(*figures):
+  return tuple(map(sum, zip(*figures)))
+
+## Planning
+#
+
+def chunks(identities, limits=LIMITS, margin=0.8, cost=COST):
+  """Yield (Chunk, identities) packing `identities` in order under `limits` * margin."""
+  cap = Limits(*(int(limit * margin) for limit in limits))
+  fits = lambda figures: all(value <= limit for value, limit in zip(figures, cap))
+  empty = (SEQUENCE, cost.gas_base, 0)
+  current, total, index = [], empty, 0
+  for identity in identities:
+    figures = cost_of(identity, cost)
+    if not fits(add(empty, figures)):
+      raise MigrationError('%s alone exceeds the operation limits' % identity.address)
+    if current and not fits(add(total, figures)):
+      yield make_chunk(index, current, total), current
+      current, total, index = [], empty, index + 1
+    current.append(identity)
+    total = add(total, figures)
+  if current:
+    yield make_chunk(index, current, total), current
+
+def make_chunk(index, identities, figures):
+  proofs = sum(len(identity.proofs) for identity in identities)
+  return Chunk(index, identities[0].address, identities[-1].address, len(identities), proofs, *figures)
+
+def file_hash(path):
+  digest = hashlib.sha256()
+  with open(path, 'rb') as f:
+    for block in iter(lambda: f.read(1 << 20), b''):
+      digest.update(block)
+  return digest.hexdigest()
+
+## Simulation
+#
+
+class Simulator:
+  """Runs setProofs calls through a node's run_operation RPC."""
+
+  def __init__(self, url, source, store):
+    self.node = rpc.Node(url)
+    self.source = source
+    self.store = store
+
+  def __call__(self, identities, limits=LIMITS):
+    """(gas, storage) consumed by a setProofs call writing `identities`."""
+    try:
+      content = rpc.transaction(self.source, self.store, 'setProofs', set_proofs_value(identities),
+        self.node.counter(self.source) + 1, limits.gas, limits.storage)
+      results = self.node.run_operation([content])
+      rpc.check_applied(results)
+    except rpc.RpcError as e:
+      raise MigrationError('Simulation failed: %s' % e)
+    return rpc.consumed_gas(results[0]), int(results[0].get('paid_storage_size_diff', 0))
+
+def plan(path, limits=LIMITS, margin=0.8, cost=COST, simulate=None):
+  """Chunks of the snapshot at `path`; with `simulate`, gas and storage are simulated."""
+  planned = []
+  for chunk, identities in chunks(snapshot.read(path), limits, margin, cost):
+    if simulate is not None:
+      gas, storage = simulate(identities)
+      if gas > limits.gas or storage > limits.storage:
+        raise MigrationError('Chunk %d needs %d gas and %d bytes, lower the margin' % (chunk.index, gas, storage))
+      chunk = chunk._replace(gas=gas, storage=storage)
+    planned.append(chunk)
+  return planned
+
+def summary(planned):
+  storage = sum(c.storage for c in planned)
+  return '%d chunks, %d identities, %d proofs: %d gas, %d bytes of storage (%.6f tez burned)' % (
+    len(planned), sum(c.identities for c in planned), sum(c.proofs for c in planned),
+    sum(c.gas for c in planned), storage, storage * MUTEZ_PER_BYTE / 1e6)
+
+## Manifest
+#
+
+def new_manifest(path, store, limits, margin, planned):
+  return {
+    'snapshot': os.path.abspath(path), 'sha256': file_hash(path), 'store': store,
+    'limits': limits._asdict(), 'margin': margin,
+    'chunks': [dict(chunk._asdict(), operation=None) for chunk in planned],
+  }
+
+def load_manifest(path):
+  if not os.path.exists(path):
+    return None
+  with open(path) as f:
+    return json.load(f)
+
+def save_manifest(path, manifest):
+  tmp = path + '.tmp'
+  with open(tmp, 'w') as f:
+    json.dump(manifest, f, indent=2)
+  os.replace(tmp, path)
+
+def check_manifest(manifest, path, store, limits, margin, planned):
+  expected = new_manifest(path, store, limits, margin, planned)
+  for field in ('sha256', 'store', 'limits', 'margin'):
+    if manifest[field] != expected[field]:
+      raise MigrationError('Manifest %s differs from this run, it belongs to another migration' % field)
+  if [c['first'] for c in manifest['chunks']] != [c['first'] for c in expected['chunks']]:
+    raise MigrationError('Manifest chunks differ from this run')
+
+## Submission
+#
+
+class OctezSubmitter:
+  """Submits a setProofs call with octez-client and returns the operation hash."""
+
+  def __init__(self, source, store, endpoint=None, burn_cap=10):
+    self.source = source
+    self.store = store
+    self.endpoint = endpoint
+    self.burn_cap = burn_cap
+
+  def __call__(self, identities):
+    cmd = [CLIENT] + (['--endpoint', self.endpoint] if self.endpoint else []) + [
+      'transfer', '0', 'from', self.source, 'to', self.store, '--entrypoint', 'setProofs',
+      '--arg', micheline.to_text(set_proofs_value(identities)), '--burn-cap', str(self.burn_cap),
+    ]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    match = re.search(r"Operation hash is '(o\w+)'", proc.stdout)
+    if proc.returncode != 0 or not match:
+      raise MigrationError('octez-client failed:\n%s' % (proc.stderr or proc.stdout))
+    return match.group(1)
+
+def run(path, store, manifest_path, submit, limits=LIMITS, margin=0.8, cost=COST, log=print):
+  """Submit every chunk not yet in the manifest; return the number submitted."""
+  planned = plan(path, limits, margin, cost)
+  manifest = load_manifest(manifest_path)
+  if manifest is None:
+    manifest = new_manifest(path, store, limits, margin, planned)
+    save_manifest(manifest_path, manifest)
+  else:
+    check_manifest(manifest, path, store, limits, margin, planned)
+  submitted = 0
+  for chunk, identities in chunks(snapshot.read(path), limits, margin, cost):
+    entry = manifest['chunks'][chunk.index]
+    if entry['operation'] is not None:
+      continue
+    entry['operation'] = submit(identities)
+    save_manifest(manifest_path, manifest)
+    submitted += 1
+    log('chunk %d/%d: %d identities in %s' % (chunk.index + 1, len(planned), chunk.identities, entry['operation']))
+  return submitted
+
+## CLI
+#
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('mode', choices=['plan', 'run'])
+  parser.add_argument('snapshot')
+  parser.add_argument('--store', required=True)
+  parser.add_argument('--source', help='account submitting (alias for run, tz1 address for --rpc)')
+  parser.add_argument('--rpc', help='node to simulate chunks on (plan) or submit to (run)')
+  parser.add_argument('--manifest', default='migration.json')
+  parser.add_argument('--margin', type=float, default=0.8, help='fraction of the protocol limits to fill (default: %(default)s)')
+  args = parser.parse_args(argv)
+
+  try:
+    if args.mode == 'plan':
+      simulate = Simulator(args.rpc, args.source, args.store) if args.rpc else None
+      planned = plan(args.snapshot, margin=args.margin, simulate=simulate)
+      for chunk in planned:
+        print('%4d  %5d identities  %6d proofs  %6d bytes  %8d gas  %6d storage' % (
+          chunk.index, chunk.identities, chunk.proofs, chunk.bytes, chunk.gas, chunk.storage))
+      print(summary(planned))
+    else:
+      if not args.source:
+        parser.error('run needs --source')
+      submit = OctezSubmitter(args.source, args.store, args.rpc)
+      count = run(args.snapshot, args.store, args.manifest, submit, margin=args.margin)
+      print('Submitted %d chunks' % count)
+  except MigrationError as e:
+    print(e, file=sys.stderr)
+    return 1
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,202 @@
+"""A stand-in for a Tezos node RPC, serving canned JSON over HTTP.
+
+Used by the tests of the tools that talk to a node. Routes are exact
+paths mapped to a JSON value or to a function of the request body:
+
+  with MockNode() as node:
+    node.add_block({'hash': 'B...', 'header': {'level': 1}, 'operations': []})
+    RpcSource(node.url).head()
+
+accept_operations() adds forging and injection. Injected operations must
+carry the next counter of their source in the head context, and a source
+may only have one operation in the mempool, as on a real node: another
+one with the same counter replaces it only when it pays 5% more fees.
+bake() includes the mempool in the next block, with receipts, and only
+then moves the counters; fail_operations(), drop_operations() and
+hold_operations() make it include operations as failed, leave them out,
+or keep them in the mempool.
+"""
+
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tools.encoding import PREFIXES, b58encode_check
+
+class Reject(Exception):
+  """Raised by a route to answer with an RPC error."""
+
+class MockNode:
+  def __init__(self):
+    self.routes = {}
+    self.requests = []
+    self.blocks = {}
+    self.counters = {}
+    self.forged = {}
+    self.injected = []
+    self.mempool = {}
+    self.failures = 0
+    self.failing = 0
+    self.dropping = 0
+    self.holding = 0
+    self.held = set()
+    self.server = None
+    self.route('GET', '/chains/main/chain_id', 'NetXdQprcVkpaWU')
+
+  ## Canned data
+  #
+
+  def route(self, method, path, response):
+    """Serve `response` (JSON value, or fn(body) -> JSON value) at `path`."""
+    self.routes[method, path] = response
+
+  def add_block(self, block):
+    level = block['header']['level']
+    self.blocks[level] = block
+    self.route('GET', '/chains/main/blocks/%d' % level, block)
+    head = self.blocks[max(self.blocks)]
+    self.route('GET', '/chains/main/blocks/head/header', dict(head['header'], hash=head.get('hash')))
+
+  def set_storage(self, address, storage):
+    self.route('GET', '/chains/main/blocks/head/context/contracts/%s/storage' % address, storage)
+
+  def set_counter(self, address, counter):
+    self.counters[address] = counter
+    self.route('GET', '/chains/main/blocks/head/context/contracts/%s/counter' % address, lambda _: str(self.counters[address]))
+
+  def simulate(self, result):
+    """Answer run_operation with result(content) as each content's operation_result."""
+    def run_operation(body):
+      contents = body['operation']['contents']
+      return {'contents': [dict(c, metadata={'operation_result': result(c)}) for c in contents]}
+    self.route('POST', '/chains/main/blocks/head/helpers/scripts/run_operation', run_operation)
+
+  def bake(self):
+    """Include the mempool in a new block and apply it to the counters."""
+    level = max(self.blocks) + 1 if self.blocks else 1
+    included, kept = [], {}
+    for source, (hash, operation) in sorted(self.mempool.items()):
+      if hash in self.held:
+        kept[source] = (hash, operation)
+        continue
+      if self.dropping:
+        self.dropping -= 1
+        continue
+      status = 'applied'
+      if self.failing:
+        self.failing -= 1
+        status = 'failed'
+      result = {'status': status}
+      if status != 'applied':
+        result['errors'] = [{'kind': 'temporary', 'id': 'proto.script_rejected'}]
+      contents = [dict(content, metadata={'operation_result': result}) for content in operation['contents']]
+      included.append({'hash': hash, 'branch': operation['branch'], 'contents': contents})
+      self.counters[source] = int(operation['contents'][-1]['counter'])
+    self.add_block({'hash': 'B%d' % level, 'header': {'level': level}, 'operations': [[], [], [], included]})
+    self.mempool = kept
+
+  def fail_injections(self, count):
+    """Reject the next `count` injections."""
+    self.failures = count
+
+  def fail_operations(self, count):
+    """Include the next `count` baked operations as failed, e.g. on a FAILWITH."""
+    self.failing = count
+
+  def drop_operations(self, count):
+    """Leave the next `count` operations of the mempool out of their block."""
+    self.dropping = count
+
+  def hold_operations(self, count):
+    """Keep the next `count` injected operations in the mempool until replaced."""
+    self.holding = count
+
+  ## Operations
+  #
+
+  def accept_operations(self):
+    self.route('POST', '/chains/main/blocks/head/helpers/forge/operations', self.forge)
+    self.route('POST', '/injection/operation', self.inject)
+
+  def forge(self, operation):
+    forged = hashlib.sha256(json.dumps(operation, sort_keys=True).encode()).hexdigest()
+    self.forged[forged] = operation
+    return forged
+
+  def inject(self, signed):
+    # 64 bytes of signature follow the forged operation
+    operation = self.forged.get(signed[:-128])
+    if operation is None:
+      raise Reject('invalid_operation')
+    if self.failures:
+      self.failures -= 1
+      raise Reject('temporary_failure')
+    source = operation['contents'][0]['source']
+    counters = [int(content['counter']) for content in operation['contents']]
+    expected = self.counters.get(source, 0) + 1
+    if counters != list(range(expected, expected + len(counters))):
+      raise Reject('counter_in_the_past' if counters[0] < expected else 'counter_in_the_future')
+    if source in self.mempool:
+      fee = lambda op: sum(int(content['fee']) for content in op['contents'])
+      if fee(operation) * 100 < fee(self.mempool[source][1]) * 105:
+        raise Reject('operation_conflict')
+      self.held.discard(self.mempool[source][0])
+    hash = b58encode_check(hashlib.blake2b(bytes.fromhex(signed), digest_size=32).digest(), PREFIXES['o'])
+    if self.holding:
+      self.holding -= 1
+      self.held.add(hash)
+    self.mempool[source] = (hash, operation)
+    self.injected.append(operation)
+    return hash
+
+  ## Server
+  #
+
+  def handle(self, method, path, body):
+    self.requests.append((method, path, body))
+    if (method, path) not in self.routes:
+      return 404, {'error': 'no route for %s %s' % (method, path)}
+    response = self.routes[method, path]
+    if callable(response):
+      try:
+        response = response(body)
+      except Reject as e:
+        return 500, [{'kind': 'temporary', 'id': str(e)}]
+    return 200, response
+
+  def __enter__(self):
+    node = self
+
+    class Handler(BaseHTTPRequestHandler):
+      def reply(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        status, response = node.handle(method, self.path, body)
+        data = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+      def do_GET(self):
+        self.reply('GET')
+
+      def do_POST(self):
+        self.reply('POST')
+
+      def log_message(self, *args):
+        pass
+
+    self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    return self
+
+  def __exit__(self, *exc):
+    self.server.shutdown()
+    self.server.server_close()
+
+  @property
+  def url(self):
+    return 'http://127.0.0.1:%d' % self.server.server_address[1]
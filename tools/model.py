@@ -0,0 +1,439 @@
+"""Executable reference model of TezIDStore and TezIDController.
+
+Plain Python with the semantics of contracts/store.py and
+contracts/controller.py: admins, the cost table, KYC platforms and proof
+create/verify/meta/remove. Tez transfers, baker and store changes are
+not modelled. A failing call raises ModelError and leaves the state
+unchanged, like a failed operation.
+
+  python -m tools.model bench [--ops 1000000]
+  python -m tools.model diff [--seed 1] [--ops 200] [--keep scenario.py]
+
+`diff` replays a random operation sequence through a generated SmartPy
+scenario. Every call must succeed or fail as in the model, and the final
+storage of both contracts must equal the model's.
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+SMARTPY = os.environ.get('SMARTPY', 'spy')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_COST = 5000000
+
+Proof = namedtuple('Proof', ['register_date', 'verified', 'meta'])
+Patch = namedtuple('Patch', ['address', 'prooftype', 'create', 'register_date', 'verified', 'meta'])
+
+class ModelError(Exception):
+  pass
+
+def verify(condition, message):
+  if not condition:
+    raise ModelError(message)
+
+## Store
+#
+
+class Store:
+  def __init__(self, admins):
+    self.admins = set(admins)
+    self.identities = {}
+    self.proofs = {}
+
+  def checkAdmin(self, sender):
+    verify(sender in self.admins, 'Only admin can call this entrypoint')
+
+  def writeProof(self, address, prooftype, proof):
+    if (address, prooftype) not in self.proofs:
+      self.identities.setdefault(address, set()).add(prooftype)
+    self.proofs[address, prooftype] = proof
+
+  def clearIdentity(self, address):
+    for prooftype in self.identities.pop(address, ()):
+      del self.proofs[address, prooftype]
+
+  def addAdmin(self, sender, admin):
+    self.checkAdmin(sender)
+    self.admins.add(admin)
+
+  def delAdmin(self, sender, admin):
+    self.checkAdmin(sender)
+    self.admins.discard(admin)
+
+  def setProof(self, sender, address, prooftype, proof):
+    self.checkAdmin(sender)
+    self.writeProof(address, prooftype, proof)
+
+  def setProofBatch(self, sender, proofs):
+    self.checkAdmin(sender)
+    for address, prooftype, proof in proofs:
+      self.writeProof(address, prooftype, proof)
+
+  def patchProofs(self, sender, patches):
+    self.checkAdmin(sender)
+    created = set()
+    for patch in patches:
+      key = (patch.address, patch.prooftype)
+      if key not in self.proofs and key not in created:
+        verify(patch.create, 'Missing required proof for this entrypoint')
+        created.add(key)
+    for patch in patches:
+      key = (patch.address, patch.prooftype)
+      proof = self.proofs.get(key)
+      if proof is None:
+        proof = Proof(None, False, {})
+        self.identities.setdefault(patch.address, set()).add(patch.prooftype)
+      meta = dict(proof.meta)
+      for k, v in patch.meta.items():
+        if v is None:
+          meta.pop(k, None)
+        else:
+          meta[k] = v
+      self.proofs[key] = Proof(
+        proof.register_date if patch.register_date is None else patch.register_date,
+        proof.verified if patch.verified is None else patch.verified,
+        meta
+      )
+
+  def delProof(self, sender, address, prooftype):
+    self.checkAdmin(sender)
+    verify((address, prooftype) in self.proofs, 'Missing required proof for this entrypoint')
+    self.identities[address].discard(prooftype)
+    if not self.identities[address]:
+      del self.identities[address]
+    del self.proofs[address, prooftype]
+
+  def removeIdentity(self, sender, address):
+    self.checkAdmin(sender)
+    self.clearIdentity(address)
+
+  def setProofs(self, sender, proofs):
+    self.checkAdmin(sender)
+    for address, typed in proofs.items():
+      self.clearIdentity(address)
+      for prooftype, proof in typed.items():
+        self.writeProof(address, prooftype, proof)
+
+  ## Views
+  #
+
+  def getProofsForAddress(self, address):
+    return {prooftype: self.proofs[address, prooftype] for prooftype in self.identities.get(address, ())}
+
+  def getProof(self, address, prooftype):
+    return self.proofs.get((address, prooftype))
+
+  def checkProofs(self, address, prooftypes, max_age, now):
+    for prooftype in prooftypes:
+      proof = self.proofs.get((address, prooftype))
+      if proof is None or not proof.verified:
+        return False
+      if max_age is not None and now - proof.register_date > max_age:
+        return False
+    return True
+
+## Controller
+#
+
+class Controller:
+  def __init__(self, address, admin, store):
+    self.address = address
+    self.admins = {admin}
+    self.store = store
+    self.cost = {'default': DEFAULT_COST}
+    self.kycPlatforms = set()
+
+  def checkAdmin(self, sender):
+    verify(sender in self.admins, 'Only admin can call this entrypoint')
+
+  def checkCost(self, proofType, amount):
+    verify('default' in self.cost, 'Missing default cost')
+    verify(amount >= self.cost.get(proofType, self.cost['default']), 'Amount too low')
+
+  def sendPatches(self, patches):
+    self.store.patchProofs(self.address, patches)
+
+  def addAdmin(self, sender, admin):
+    self.checkAdmin(sender)
+    self.admins.add(admin)
+
+  def delAdmin(self, sender, admin):
+    self.checkAdmin(sender)
+    self.admins.discard(admin)
+
+  def setCost(self, sender, proofType, cost):
+    self.checkAdmin(sender)
+    self.cost[proofType] = cost
+
+  def delCost(self, sender, proofType):
+    self.checkAdmin(sender)
+    self.cost.pop(proofType, None)
+
+  def setKycPlatforms(self, sender, kycPlatforms):
+    self.checkAdmin(sender)
+    self.kycPlatforms = set(kycPlatforms)
+
+  def registerProof(self, sender, proofType, amount, now):
+    self.checkCost(proofType, amount)
+    self.sendPatches([Patch(sender, proofType, True, now, False, {})])
+
+  def enableKYC(self, sender):
+    self.sendPatches([Patch(sender, 'gov', False, None, False, {'kyc': 'true'})])
+
+  def enableKYCPlatform(self, sender, platform):
+    verify(platform in self.kycPlatforms, 'KYC platform not supported')
+    self.sendPatches([Patch(sender, 'gov', False, None, None, {platform: 'true'})])
+
+  def registerProofAdmin(self, sender, address, proofType, now):
+    self.checkAdmin(sender)
+    self.sendPatches([Patch(address, proofType, True, now, False, {})])
+
+  def verifyProof(self, sender, address, prooftype):
+    self.checkAdmin(sender)
+    self.sendPatches([Patch(address, prooftype, False, None, True, {})])
+
+  def verifyProofs(self, sender, proofs):
+    self.checkAdmin(sender)
+    # The controller pushes onto a list, so the store sees them reversed
+    self.sendPatches([Patch(address, prooftype, False, None, True, {}) for address, prooftype in reversed(proofs)])
+
+  def setProofMeta(self, sender, address, prooftype, key, value):
+    self.checkAdmin(sender)
+    self.sendPatches([Patch(address, prooftype, False, None, None, {key: value})])
+
+  def removeProof(self, sender, prooftype, address):
+    self.checkAdmin(sender)
+    self.store.delProof(self.address, address, prooftype)
+
+  def removeIdentity(self, sender, address):
+    self.checkAdmin(sender)
+    self.store.removeIdentity(self.address, address)
+
+## Operations
+#
+
+# contract is 'store' or 'ctrl'; args are keyword arguments of the method
+Op = namedtuple('Op', ['contract', 'entrypoint', 'sender', 'args', 'amount', 'now'])
+
+ADMIN = 'admin'
+CONTROLLER = 'controller'
+USERS = ['user0', 'user1', 'user2']
+PROOFTYPES = ['email', 'phone', 'gov', 'twitter']
+PLATFORMS = ['kyc_crunchy', 'kyc_yaynay']
+
+class System:
+  """A store administered by `admin` and by a controller, as in tests/tezid.py."""
+
+  def __init__(self):
+    self.store = Store([ADMIN])
+    self.ctrl = Controller(CONTROLLER, ADMIN, self.store)
+    self.store.admins.add(CONTROLLER)
+
+  def apply(self, op):
+    """Run `op`; return None on success or the ModelError message."""
+    contract = self.store if op.contract == 'store' else self.ctrl
+    args = dict(op.args)
+    if op.entrypoint in ('registerProof', 'registerProofAdmin'):
+      args['now'] = op.now
+    if op.entrypoint == 'registerProof':
+      args['amount'] = op.amount
+    try:
+      getattr(contract, op.entrypoint)(op.sender, **args)
+    except ModelError as e:
+      return str(e)
+    return None
+
+def random_proof(rng, now):
+  meta = {k: rng.choice(['true', 'x']) for k in rng.sample(['kyc', 'handle'], rng.randint(0, 2))}
+  return Proof(now - rng.randint(0, 1000), rng.random() < 0.5, meta)
+
+def random_op(rng, now):
+  """A random call, mostly valid, sometimes from the wrong sender."""
+  user = rng.choice(USERS)
+  prooftype = rng.choice(PROOFTYPES)
+  admin = ADMIN if rng.random() < 0.9 else user
+  choices = [
+    (8, lambda: Op('ctrl', 'registerProof', user, {'proofType': prooftype}, rng.choice([DEFAULT_COST, DEFAULT_COST, 1000000, 9000000]), now)),
+    (2, lambda: Op('ctrl', 'registerProofAdmin', admin, {'address': user, 'proofType': prooftype}, 0, now)),
+    (6, lambda: Op('ctrl', 'verifyProof', admin, {'address': user, 'prooftype': prooftype}, 0, now)),
+    (2, lambda: Op('ctrl', 'verifyProofs', admin, {'proofs': [(rng.choice(USERS), rng.choice(PROOFTYPES)) for _ in range(rng.randint(1, 3))]}, 0, now)),
+    (3, lambda: Op('ctrl', 'setProofMeta', admin, {'address': user, 'prooftype': prooftype, 'key': rng.choice(['handle', 'kyc']), 'value': rng.choice(['a', 'b'])}, 0, now)),
+    (3, lambda: Op('ctrl', 'enableKYC', user, {}, 0, now)),
+    (2, lambda: Op('ctrl', 'enableKYCPlatform', user, {'platform': rng.choice(PLATFORMS)}, 0, now)),
+    (1, lambda: Op('ctrl', 'setKycPlatforms', admin, {'kycPlatforms': set(rng.sample(PLATFORMS, rng.randint(0, 2)))}, 0, now)),
+    (1, lambda: Op('ctrl', 'setCost', admin, {'proofType': prooftype, 'cost': rng.choice([1000000, 9000000])}, 0, now)),
+    (1, lambda: Op('ctrl', 'delCost', admin, {'proofType': prooftype}, 0, now)),
+    (2, lambda: Op('ctrl', 'removeProof', admin, {'prooftype': prooftype, 'address': user}, 0, now)),
+    (1, lambda: Op('ctrl', 'removeIdentity', admin, {'address': user}, 0, now)),
+    (1, lambda: Op('ctrl', rng.choice(['addAdmin', 'delAdmin']), admin, {'admin': rng.choice(USERS)}, 0, now)),
+    (2, lambda: Op('store', 'setProof', admin, {'address': user, 'prooftype': prooftype, 'proof': random_proof(rng, now)}, 0, now)),
+    (1, lambda: Op('store', 'setProofBatch', admin, {'proofs': [(rng.choice(USERS), rng.choice(PROOFTYPES), random_proof(rng, now)) for _ in range(rng.randint(0, 3))]}, 0, now)),
+    (1, lambda: Op('store', 'setProofs', admin, {'proofs': {user: {t: random_proof(rng, now) for t in rng.sample(PROOFTYPES, rng.randint(0, 2))}}}, 0, now)),
+    (1, lambda: Op('store', 'delProof', admin, {'address': user, 'prooftype': prooftype}, 0, now)),
+    (1, lambda: Op('store', 'removeIdentity', admin, {'address': user}, 0, now)),
+    (1, lambda: Op('store', rng.choice(['addAdmin', 'delAdmin']), admin, {'admin': rng.choice(USERS)}, 0, now)),
+  ]
+  weights = [weight for weight, _ in choices]
+  return rng.choices([make for _, make in choices], weights)[0]()
+
+def random_ops(seed, count, start=1640995200):
+  rng = random.Random(seed)
+  now = start
+  for _ in range(count):
+    now += rng.randint(1, 600)
+    yield random_op(rng, now)
+
+## SmartPy scenario
+#
+
+def timestamp(value):
+  return 'sp.timestamp(%d)' % value
+
+def sp_proof(proof):
+  return 'sp.record(register_date = %s, verified = %s, meta = sp.map(%r, tkey = sp.TString, tvalue = sp.TString))' % (
+    timestamp(proof.register_date), proof.verified, dict(sorted(proof.meta.items()))
+  )
+
+def sp_args(op, accounts):
+  a = op.args
+  address = lambda name: accounts[name]
+  if op.entrypoint in ('addAdmin', 'delAdmin'):
+    return address(a['admin'])
+  if op.entrypoint in ('removeIdentity',):
+    return address(a['address'])
+  if op.entrypoint in ('registerProof', 'delCost'):
+    return repr(a['proofType'])
+  if op.entrypoint in ('enableKYC',):
+    return ''
+  if op.entrypoint == 'enableKYCPlatform':
+    return repr(a['platform'])
+  if op.entrypoint == 'setKycPlatforms':
+    return 'sp.set(%r, t = sp.TString)' % sorted(a['kycPlatforms'])
+  if op.entrypoint == 'setCost':
+    return 'sp.record(proofType = %r, cost = sp.mutez(%d))' % (a['proofType'], a['cost'])
+  if op.entrypoint == 'registerProofAdmin':
+    return 'sp.record(address = %s, proofType = %r)' % (address(a['address']), a['proofType'])
+  if op.entrypoint in ('verifyProof', 'delProof'):
+    return 'sp.record(address = %s, prooftype = %r)' % (address(a['address']), a['prooftype'])
+  if op.entrypoint == 'removeProof':
+    return 'sp.record(prooftype = %r, address = %s)' % (a['prooftype'], address(a['address']))
+  if op.entrypoint == 'verifyProofs':
+    return '[%s]' % ', '.join('proofKey(%s, %r)' % (address(u), t) for u, t in a['proofs'])
+  if op.entrypoint == 'setProofMeta':
+    return 'sp.record(address = %s, prooftype = %r, key = %r, value = %r)' % (address(a['address']), a['prooftype'], a['key'], a['value'])
+  if op.entrypoint == 'setProof':
+    return 'sp.record(address = %s, prooftype = %r, proof = %s)' % (address(a['address']), a['prooftype'], sp_proof(a['proof']))
+  if op.entrypoint == 'setProofBatch':
+    return 'sp.list([%s], t = Types.TSetProofPayload)' % ', '.join(
+      'sp.record(address = %s, prooftype = %r, proof = %s)' % (address(u), t, sp_proof(p)) for u, t, p in a['proofs'])
+  if op.entrypoint == 'setProofs':
+    return 'sp.map({%s}, tkey = sp.TAddress, tvalue = Types.TProofs)' % ', '.join(
+      '%s: sp.map({%s}, tkey = sp.TString, tvalue = Types.TProof)' % (address(u), ', '.join('%r: %s' % (t, sp_proof(p)) for t, p in sorted(typed.items())))
+      for u, typed in a['proofs'].items())
+  raise ValueError('No SmartPy arguments for %s' % op.entrypoint)
+
+def scenario(ops, name='Differential'):
+  """SmartPy source replaying `ops` and checking the final storage against the model."""
+  system = System()
+  accounts = {ADMIN: 'admin.address', CONTROLLER: 'ctrl.address'}
+  accounts.update({user: '%s.address' % user for user in USERS})
+  lines = [
+    'import os',
+    'import smartpy as sp',
+    '',
+    'cwd = os.getcwd()',
+    'Types = sp.io.import_script_from_url("file://%s/contracts/types.py" % cwd)',
+    'TezIDTests = sp.io.import_script_from_url("file://%s/tests/tezid.py" % cwd)',
+    'Targets = sp.io.import_script_from_url("file://%s/tests/targets.py" % cwd)',
+    'proofKey = TezIDTests.proofKey',
+    '',
+    '## Generated by tools/model.py, do not edit',
+    '#',
+    '',
+    '@Targets.addTarget(name = %r, kind = TezIDTests.allKind)' % name,
+    'def test():',
+    '  admin = sp.test_account("admin")',
+  ]
+  lines += ['  %s = sp.test_account(%r)' % (user, user) for user in USERS]
+  lines += ['  scenario = sp.test_scenario()', '  store, ctrl = TezIDTests.init(admin, scenario)']
+  for op in ops:
+    error = system.apply(op)
+    run = 'sender = %s, now = %s' % (accounts[op.sender], timestamp(op.now))
+    if op.amount:
+      run += ', amount = sp.mutez(%d)' % op.amount
+    if error is not None:
+      run += ', valid = False'
+    lines.append('  scenario += %s.%s(%s).run(%s)' % (op.contract, op.entrypoint, sp_args(op, accounts), run))
+
+  store, ctrl = system.store, system.ctrl
+  lines.append('  ## Final storage')
+  for user in USERS:
+    if user in store.identities:
+      lines.append('  scenario.verify(store.data.identities[%s] == sp.set(%r, t = sp.TString))' % (accounts[user], sorted(store.identities[user])))
+    else:
+      lines.append('  scenario.verify(~store.data.identities.contains(%s))' % accounts[user])
+    for prooftype in PROOFTYPES:
+      key = 'proofKey(%s, %r)' % (accounts[user], prooftype)
+      proof = store.proofs.get((user, prooftype))
+      if proof is None:
+        lines.append('  scenario.verify(~store.data.proofs.contains(%s))' % key)
+      else:
+        lines.append('  scenario.verify(store.data.proofs[%s] == %s)' % (key, sp_proof(proof)))
+    lines.append('  scenario.verify(store.checkProofs(sp.record(address = %s, prooftypes = %r, max_age = sp.none)) == %s)' % (
+      accounts[user], PROOFTYPES[:2], store.checkProofs(user, PROOFTYPES[:2], None, 0)))
+  for label, admins in (('store', store.admins), ('ctrl', ctrl.admins)):
+    lines.append('  scenario.verify(%s.data.admins == sp.set([%s]))' % (label, ', '.join(accounts[a] for a in sorted(admins))))
+  lines.append('  scenario.verify(ctrl.data.cost == sp.map({%s}, tkey = sp.TString, tvalue = sp.TMutez))' % ', '.join(
+    '%r: sp.mutez(%d)' % item for item in sorted(ctrl.cost.items())))
+  lines.append('  scenario.verify(ctrl.data.kycPlatforms == sp.set(%r, t = sp.TString))' % sorted(ctrl.kycPlatforms))
+  return '\n'.join(lines) + '\n'
+
+def differential(seed, count, keep=None):
+  """Run the generated scenario with spy; return (passed, output)."""
+  source = scenario(random_ops(seed, count), name='Differential %d' % seed)
+  with tempfile.TemporaryDirectory(prefix='tezid-model-') as tmp:
+    path = keep or os.path.join(tmp, 'differential.py')
+    with open(path, 'w') as f:
+      f.write(source)
+    env = dict(os.environ, TEZID_TEST_TARGET='Differential %d' % seed)
+    proc = subprocess.run(
+      [SMARTPY, 'kind', 'all', os.path.abspath(path), os.path.join(tmp, 'output')],
+      cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+    )
+  return proc.returncode == 0, proc.stdout
+
+## CLI
+#
+
+def bench(count, seed=0):
+  ops = list(random_ops(seed, count))
+  system = System()
+  start = time.perf_counter()
+  for op in ops:
+    system.apply(op)
+  return count / (time.perf_counter() - start)
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('mode', choices=['bench', 'diff'])
+  parser.add_argument('--seed', type=int, default=1)
+  parser.add_argument('--ops', type=int, help='operations to run (default: 1000000 for bench, 200 for diff)')
+  parser.add_argument('--keep', help='diff: write the generated scenario to this file')
+  args = parser.parse_args(argv)
+  if args.mode == 'bench':
+    rate = bench(args.ops or 1000000, args.seed)
+    print('%.0f operations per second (%.1fM per minute)' % (rate, rate * 60 / 1e6))
+    return 0
+  passed, output = differential(args.seed, args.ops or 200, args.keep)
+  print(output)
+  print('SmartPy agrees with the model' if passed else 'SmartPy and the model disagree')
+  return 0 if passed else 1
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,178 @@
+"""Thin wrapper around `octez-client` in mockup mode.
+
+Used to originate the compiled contracts and read consumed gas and storage
+figures from operation receipts.
+"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from collections import namedtuple
+
+CLIENT = os.environ.get('OCTEZ_CLIENT', 'octez-client')
+
+BOOTSTRAP = {
+  'bootstrap1': 'tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx',
+  'bootstrap2': 'tz1gjaF81ZRRvdzjobyfVNsAeSC6PScjfQwN',
+  'bootstrap3': 'tz1faswCTDciRzE4oJ9jn2Vm2dvjeyA9fUzU',
+  'bootstrap4': 'tz1b7tUupMgCNw2cCLpKTkSD1NZzB5TkP2sv',
+  'bootstrap5': 'tz1ddb9NMYHZi5UzPdzTZMYQQZoMub195zgv',
+}
+
+class ClientError(Exception):
+  pass
+
+OperationResult = namedtuple('OperationResult', [
+  'kind', 'destination', 'entrypoint', 'consumed_gas', 'storage_size', 'paid_storage_size_diff'
+])
+
+class Receipt:
+  def __init__(self, operations, originated=None, text=''):
+    self.operations = operations
+    self.originated = originated or []
+    self.text = text
+
+  @property
+  def consumed_gas(self):
+    return sum(op.consumed_gas for op in self.operations)
+
+  @property
+  def paid_storage_size_diff(self):
+    return sum(op.paid_storage_size_diff for op in self.operations)
+
+  def storage_size(self, destination):
+    sizes = [op.storage_size for op in self.operations if op.destination == destination and op.storage_size is not None]
+    return sizes[-1] if sizes else None
+
+RESULTS = 'This sequence of operations was run:'
+OPERATION = re.compile(r'^(Internal )?(Transaction|Origination|Event):$')
+FIELDS = {
+  'To': re.compile(r'^To: (\S+)$'),
+  'Entrypoint': re.compile(r'^Entrypoint: (\S+)$'),
+  'Storage size': re.compile(r'^Storage size: (\d+) bytes$'),
+  'Paid storage size diff': re.compile(r'^Paid storage size diff: (\d+) bytes$'),
+  'Consumed gas': re.compile(r'^Consumed gas: ([\d.]+)$'),
+  'Originated': re.compile(r'^(KT1\w{33})$'),
+}
+
+def parse_receipt(text):
+  """Parse the human readable receipt printed by `octez-client`.
+
+  Only the applied results are read; the signed operations echoed before
+  them carry no gas figures.
+  """
+  full = text
+  if RESULTS in text:
+    text = text.split(RESULTS, 1)[1]
+  operations = []
+  originated = []
+  current = None
+  in_originated = False
+
+  def flush():
+    if current is not None:
+      operations.append(OperationResult(**current))
+
+  for line in text.splitlines():
+    line = line.strip()
+    match = OPERATION.match(line)
+    if match:
+      flush()
+      current = dict(kind=match.group(2).lower(), destination=None, entrypoint=None,
+                     consumed_gas=0.0, storage_size=None, paid_storage_size_diff=0)
+      in_originated = False
+      continue
+    if current is None:
+      continue
+    if line == 'Originated contracts:':
+      in_originated = True
+      continue
+    if in_originated:
+      match = FIELDS['Originated'].match(line)
+      if match:
+        originated.append(match.group(1))
+        current['destination'] = match.group(1)
+        continue
+      in_originated = False
+    for name, key in (('To', 'destination'), ('Entrypoint', 'entrypoint')):
+      match = FIELDS[name].match(line)
+      if match:
+        current[key] = match.group(1)
+    match = FIELDS['Storage size'].match(line)
+    if match:
+      current['storage_size'] = int(match.group(1))
+    match = FIELDS['Paid storage size diff'].match(line)
+    if match:
+      current['paid_storage_size_diff'] = int(match.group(1))
+    match = FIELDS['Consumed gas'].match(line)
+    if match:
+      current['consumed_gas'] = float(match.group(1))
+  flush()
+  return Receipt(operations, originated, full)
+
+class Mockup:
+  """A throwaway mockup client directory."""
+
+  def __init__(self, protocol=None, base_dir=None):
+    self.protocol = protocol
+    self.owned = base_dir is None
+    self.base_dir = base_dir or tempfile.mkdtemp(prefix='tezid-mockup-')
+
+  def __enter__(self):
+    self.create()
+    return self
+
+  def __exit__(self, *exc):
+    if self.owned:
+      shutil.rmtree(self.base_dir, ignore_errors=True)
+
+  def run(self, *args):
+    cmd = [CLIENT, '--base-dir', self.base_dir, '--mode', 'mockup'] + list(args)
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+      raise ClientError('%s\n%s' % (' '.join(cmd), proc.stderr or proc.stdout))
+    return proc.stdout
+
+  def create(self):
+    args = ['create', 'mockup']
+    if self.protocol:
+      args = ['--protocol', self.protocol] + args
+    cmd = [CLIENT, '--base-dir', self.base_dir] + args
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+      raise ClientError('%s\n%s' % (' '.join(cmd), proc.stderr))
+
+  def originate(self, alias, code, storage, sender='bootstrap1', balance=0):
+    out = self.run(
+      'originate', 'contract', alias,
+      'transferring', tez(balance), 'from', sender,
+      'running', code, '--init', storage,
+      '--burn-cap', '100', '--force'
+    )
+    receipt = parse_receipt(out)
+    match = re.search(r'New contract (KT1\w{33}) originated', out)
+    if match is None:
+      raise ClientError('No contract originated:\n%s' % out)
+    return match.group(1), receipt
+
+  def transfer(self, sender, destination, entrypoint, arg, amount=0):
+    out = self.run(
+      'transfer', tez(amount), 'from', sender, 'to', destination,
+      '--entrypoint', entrypoint, '--arg', arg, '--burn-cap', '100'
+    )
+    return parse_receipt(out)
+
+  def multiple_transfers(self, sender, transfers):
+    """Inject `transfers` [(destination, entrypoint, arg, amount)] as one batch."""
+    batch = [
+      dict(destination=destination, entrypoint=entrypoint, arg=arg, amount=tez(amount))
+      for destination, entrypoint, arg, amount in transfers
+    ]
+    out = self.run('multiple', 'transfers', 'from', sender, 'using', json.dumps(batch), '--burn-cap', '100')
+    return parse_receipt(out)
+
+def tez(mutez):
+  return '%d.%06d' % divmod(int(mutez), 1000000)
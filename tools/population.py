@@ -0,0 +1,98 @@
+"""Deterministic synthetic identities for scale tests.
+
+Identity `i` of a seed depends only on (seed, i), so a population streams
+in constant memory and any slice can be regenerated on its own.
+
+  python -m tools.population 10000 [--seed 1] [--format json|smartpy]
+    [--prooftypes email=0.95,phone=0.6] [--meta 0=70,1=20,4=10] [--output FILE]
+
+`--prooftypes` gives the probability of each proof type and `--meta` the
+weights of the number of meta entries per proof. JSON output is a snapshot
+(see snapshot.py); SmartPy output is a TSetProofs literal for scenarios.
+"""
+
+import argparse
+import random
+import sys
+
+from tools import snapshot
+from tools.encoding import make_address
+from tools.model import Proof
+
+PROOFTYPES = {'email': 0.95, 'phone': 0.6, 'twitter': 0.3, 'gov': 0.15, 'instagram': 0.1}
+META_SIZES = {0: 70, 1: 20, 2: 6, 4: 4}
+META_KEYS = ['kyc', 'handle', 'kyc_crunchy', 'kyc_yaynay', 'domain', 'country']
+START = 1609459200  # 2021-01-01
+END = 1704067200    # 2024-01-01
+
+def meta_key(i):
+  return META_KEYS[i] if i < len(META_KEYS) else 'meta%02d' % i
+
+def identity(index, seed=1, prooftypes=PROOFTYPES, meta_sizes=META_SIZES):
+  rng = random.Random('%s:%d' % (seed, index))
+  chosen = [prooftype for prooftype in sorted(prooftypes) if rng.random() < prooftypes[prooftype]]
+  if not chosen:
+    chosen = [max(sorted(prooftypes), key=prooftypes.get)]
+  sizes = sorted(meta_sizes)
+  proofs = {}
+  for prooftype in chosen:
+    size = rng.choices(sizes, [meta_sizes[s] for s in sizes])[0]
+    meta = {meta_key(i): rng.choice(['true', '@%x' % rng.getrandbits(32)]) for i in range(size)}
+    proofs[prooftype] = Proof(rng.randrange(START, END), rng.random() < 0.7, meta)
+  return snapshot.Identity(make_address('population-%s-%d' % (seed, index)), proofs)
+
+def population(count, seed=1, start=0, prooftypes=PROOFTYPES, meta_sizes=META_SIZES):
+  for index in range(start, start + count):
+    yield identity(index, seed, prooftypes, meta_sizes)
+
+## SmartPy
+#
+
+def smartpy_proof(proof):
+  return 'sp.record(register_date = sp.timestamp(%d), verified = %s, meta = sp.map(%r, tkey = sp.TString, tvalue = sp.TString))' % (
+    proof.register_date, proof.verified, dict(sorted(proof.meta.items())))
+
+def smartpy_lines(identities):
+  """Lines of a TSetProofs literal, e.g. for TezIDStore.setProofs."""
+  yield 'sp.map({'
+  for identity in identities:
+    yield '  sp.address("%s"): sp.map({' % identity.address
+    for prooftype, proof in sorted(identity.proofs.items()):
+      yield '    "%s": %s,' % (prooftype, smartpy_proof(proof))
+    yield '  }, tkey = sp.TString, tvalue = Types.TProof),'
+  yield '}, tkey = sp.TAddress, tvalue = Types.TProofs)'
+
+## CLI
+#
+
+def distribution(text, key=str, value=float):
+  items = [item.split('=', 1) for item in text.split(',') if item]
+  return {key(k): value(v) for k, v in items}
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('count', type=int)
+  parser.add_argument('--seed', default='1')
+  parser.add_argument('--start', type=int, default=0, help='index of the first identity')
+  parser.add_argument('--format', choices=['json', 'smartpy'], default='json')
+  parser.add_argument('--prooftypes', type=distribution, default=PROOFTYPES)
+  parser.add_argument('--meta', type=lambda text: distribution(text, int, float), default=META_SIZES)
+  parser.add_argument('--output', help='file to write (default: stdout)')
+  args = parser.parse_args(argv)
+
+  identities = population(args.count, args.seed, args.start, args.prooftypes, args.meta)
+  if args.format == 'json':
+    lines = (snapshot.dumps(identity) for identity in identities)
+  else:
+    lines = smartpy_lines(identities)
+  out = open(args.output, 'w') if args.output else sys.stdout
+  try:
+    for line in lines:
+      out.write(line + '\n')
+  finally:
+    if args.output:
+      out.close()
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,147 @@
+"""Reconcile the store with a desired snapshot.
+
+Diffs two store snapshots (JSON lines, see snapshot.py), the current one
+and the desired one, and emits the fewest store calls turning the first
+into the second:
+
+  - removeIdentity for an address missing from, or without proofs in, the
+    desired snapshot;
+  - delProof for a prooftype it no longer holds;
+  - setProof for a proof that is new or differs.
+
+Calls are packed into operation groups by tools.batcher, under the same
+gas and size model, one JSON line each in the format of `octez-client
+multiple transfers`:
+
+  python -m tools.reconcile current.jsonl desired.jsonl --store KT1... --output groups.jsonl [--baseline tools/bench_baseline.json]
+  octez-client multiple transfers from admin using "$(sed -n 1p groups.jsonl)" --burn-cap 1
+
+Both snapshots are sorted by address with an external merge sort (runs of
+--run identities spilled to temporary files) and then merge-joined, so
+memory stays bounded by the run size whatever the number of addresses;
+only the packed calls are held until the groups are written.
+"""
+
+import argparse
+import heapq
+import json
+import os
+import sys
+import tempfile
+from collections import namedtuple
+
+from tools import batcher, snapshot
+from tools import michelson as m
+from tools.encoding import address_bytes
+
+Call = namedtuple('Call', ['entrypoint', 'address', 'prooftype', 'proof'])
+
+class ReconcileError(Exception):
+  pass
+
+## Sorting
+#
+
+def order(identity):
+  return address_bytes(identity.address)
+
+def sorted_identities(path, run=50000, tmpdir=None):
+  """Identities of the snapshot at `path` in address order, `run` at a time in memory."""
+  with tempfile.TemporaryDirectory(dir=tmpdir) as spill:
+    runs, current = [], []
+    for identity in snapshot.read(path):
+      current.append(identity)
+      if len(current) == run:
+        runs.append(os.path.join(spill, '%d.jsonl' % len(runs)))
+        snapshot.write(runs[-1], sorted(current, key=order))
+        current = []
+    current.sort(key=order)
+    previous = None
+    for identity in heapq.merge(current, *(snapshot.read(r) for r in runs), key=order):
+      if previous is not None and identity.address == previous:
+        raise ReconcileError('%s appears twice in %s' % (previous, path))
+      previous = identity.address
+      yield identity
+
+## Diff
+#
+
+def identity_changes(address, current, desired):
+  """Calls turning the proofs `current` of `address` into `desired`."""
+  if not desired:
+    if current is not None:
+      yield Call('removeIdentity', address, None, None)
+    return
+  current = current or {}
+  for prooftype in sorted(set(current) - set(desired)):
+    yield Call('delProof', address, prooftype, None)
+  for prooftype in sorted(desired):
+    if current.get(prooftype) != desired[prooftype]:
+      yield Call('setProof', address, prooftype, desired[prooftype])
+
+def changes(current, desired):
+  """Merge-join two address-ordered identity streams into calls."""
+  end = object()
+  current, desired = iter(current), iter(desired)
+  old, new = next(current, end), next(desired, end)
+  while old is not end or new is not end:
+    if new is end or (old is not end and order(old) < order(new)):
+      yield from identity_changes(old.address, old.proofs, None)
+      old = next(current, end)
+    elif old is end or order(new) < order(old):
+      yield from identity_changes(new.address, None, new.proofs)
+      new = next(desired, end)
+    else:
+      yield from identity_changes(new.address, old.proofs, new.proofs)
+      old, new = next(current, end), next(desired, end)
+
+## Operation groups
+#
+
+def arg(call):
+  if call.entrypoint == 'setProof':
+    proof = m.proof(call.proof.register_date, call.proof.verified, call.proof.meta)
+    return m.set_proof_payload(call.address, call.prooftype, proof)
+  if call.entrypoint == 'delProof':
+    return m.proof_key(call.address, call.prooftype)
+  return m.address(call.address)
+
+def batch_call(call):
+  return batcher.Call('Store', call.entrypoint, arg(call), call.address, 0)
+
+def reconcile(current_path, desired_path, store, output, run=50000, limits=batcher.LIMITS, costs=batcher.COSTS):
+  """Write the operation groups to `output`; return {entrypoint: calls} and the group count."""
+  counts = {'setProof': 0, 'delProof': 0, 'removeIdentity': 0}
+
+  def counted(calls):
+    for call in calls:
+      counts[call.entrypoint] += 1
+      yield batch_call(call)
+
+  calls = changes(sorted_identities(current_path, run), sorted_identities(desired_path, run))
+  groups = batcher.pack(counted(calls), limits, costs)
+  with open(output, 'w') as f:
+    for group in groups:
+      f.write(json.dumps(batcher.transfers(group, {'Store': store})) + '\n')
+  return counts, len(groups)
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('current', help='snapshot of the store as it is')
+  parser.add_argument('desired', help='snapshot of the store as it should be')
+  parser.add_argument('--store', required=True)
+  parser.add_argument('--output', default='groups.jsonl')
+  parser.add_argument('--run', type=int, default=50000, help='identities sorted in memory at once (default: %(default)s)')
+  parser.add_argument('--baseline', help='benchmark baseline to calibrate the cost table with')
+  args = parser.parse_args(argv)
+
+  try:
+    counts, written = reconcile(args.current, args.desired, args.store, args.output, args.run, costs=batcher.load_costs(args.baseline))
+  except (ReconcileError, batcher.BatchError) as e:
+    print(e, file=sys.stderr)
+    return 1
+  print('%s in %d operation groups' % (', '.join('%d %s' % (n, e) for e, n in counts.items()), written))
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main())
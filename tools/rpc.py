@@ -0,0 +1,75 @@
+"""Minimal client for the Tezos node RPC.
+
+Covers what the operation tools need: the head and blocks, counters,
+simulation through run_operation, forging and injection.
+"""
+
+import json
+import urllib.error
+import urllib.request
+
+# Accepted by run_operation, which does not check signatures
+ZERO_SIGNATURE = 'sigUHx32f9wesZ1n2BWpixXz4AQaZggEtchaQNHYGRCoWNAXx45WGW2ua3apUUUAGMLPwAU41QoaFCzVSL61VaessLg4YZbP'
+
+class RpcError(Exception):
+  pass
+
+class Node:
+  def __init__(self, url):
+    self.url = url.rstrip('/')
+
+  def request(self, path, body=None):
+    data = None if body is None else json.dumps(body).encode()
+    request = urllib.request.Request(self.url + path, data=data, headers={'Content-Type': 'application/json'})
+    try:
+      with urllib.request.urlopen(request) as response:
+        return json.load(response)
+    except urllib.error.HTTPError as e:
+      raise RpcError('%s: %s %s' % (path, e.code, e.read().decode(errors='replace')))
+    except OSError as e:
+      raise RpcError('%s: %s' % (path, e))
+
+  def head(self):
+    return self.request('/chains/main/blocks/head/header')
+
+  def branch(self):
+    return self.head()['hash']
+
+  def block(self, level):
+    return self.request('/chains/main/blocks/%d' % level)
+
+  def chain_id(self):
+    return self.request('/chains/main/chain_id')
+
+  def counter(self, address):
+    return int(self.request('/chains/main/blocks/head/context/contracts/%s/counter' % address))
+
+  def run_operation(self, contents, branch=None):
+    """operation_result of every content of an unsigned group."""
+    operation = {'branch': branch or self.branch(), 'contents': contents, 'signature': ZERO_SIGNATURE}
+    result = self.request('/chains/main/blocks/head/helpers/scripts/run_operation',
+      {'operation': operation, 'chain_id': self.chain_id()})
+    return [content['metadata']['operation_result'] for content in result['contents']]
+
+  def forge(self, branch, contents):
+    """Hex of the unsigned operation, as the node forges it."""
+    return self.request('/chains/main/blocks/head/helpers/forge/operations', {'branch': branch, 'contents': contents})
+
+  def inject(self, signed):
+    """Inject the hex of a forged operation followed by its signature; return its hash."""
+    return self.request('/injection/operation', signed)
+
+def transaction(source, destination, entrypoint, value, counter, gas_limit, storage_limit, fee=0, amount=0):
+  return {
+    'kind': 'transaction', 'source': source, 'fee': str(fee), 'counter': str(counter),
+    'gas_limit': str(gas_limit), 'storage_limit': str(storage_limit), 'amount': str(amount),
+    'destination': destination, 'parameters': {'entrypoint': entrypoint, 'value': value},
+  }
+
+def consumed_gas(result):
+  return -(-int(result['consumed_milligas']) // 1000)
+
+def check_applied(results):
+  for result in results:
+    if result['status'] != 'applied':
+      raise RpcError('Operation %s: %s' % (result['status'], json.dumps(result.get('errors', []))))
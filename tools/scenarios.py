@@ -0,0 +1,107 @@
+"""Parallel runner for the SmartPy scenarios in tests/.
+
+Targets declared with `Targets.addTarget(name = "...")` are discovered in
+every scenario module and each one runs as its own `spy kind all` process
+with TEZID_TEST_TARGET set to its name, so the pool keeps every core busy.
+
+  python -m tools.scenarios [-k SUBSTRING] [--jobs N] [--json report.json]
+
+Needs `spy` on PATH (or SMARTPY).
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+SMARTPY = os.environ.get('SMARTPY', 'spy')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGET = re.compile(r'''^@Targets\.addTarget\(\s*name\s*=\s*(["'])(.+?)\1''', re.M)
+
+Scenario = namedtuple('Scenario', ['module', 'name'])
+Result = namedtuple('Result', ['module', 'name', 'passed', 'seconds', 'output'])
+
+## Discovery
+#
+
+def discover(root=ROOT):
+  """Scenarios of tests/*.py, in file order."""
+  scenarios = []
+  for path in sorted(glob.glob(os.path.join(root, 'tests', '*.py'))):
+    module = os.path.relpath(path, root)
+    with open(path) as f:
+      scenarios += [Scenario(module, match.group(2)) for match in TARGET.finditer(f.read())]
+  return scenarios
+
+def slug(name):
+  return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+
+## Run
+#
+
+def run_scenario(scenario, outdir, root=ROOT):
+  output = os.path.join(outdir, slug(os.path.basename(scenario.module)), slug(scenario.name))
+  env = dict(os.environ, TEZID_TEST_TARGET=scenario.name)
+  start = time.monotonic()
+  proc = subprocess.run(
+    [SMARTPY, 'kind', 'all', scenario.module, output],
+    cwd=root, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+  )
+  return Result(scenario.module, scenario.name, proc.returncode == 0, time.monotonic() - start, proc.stdout)
+
+def run(scenarios, outdir, jobs=None, root=ROOT, runner=run_scenario):
+  """Run `scenarios` in parallel and return their results in order."""
+  # Each scenario is a separate spy process; threads only wait on them
+  with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+    return list(pool.map(lambda scenario: runner(scenario, outdir, root), scenarios))
+
+## Report
+#
+
+def report(results, wall):
+  lines = []
+  for result in results:
+    lines.append('%s  %6.1fs  %s :: %s' % ('PASS' if result.passed else 'FAIL', result.seconds, result.module, result.name))
+  failed = [result for result in results if not result.passed]
+  for result in failed:
+    lines.append('')
+    lines.append('---- %s :: %s' % (result.module, result.name))
+    lines.append(result.output.rstrip())
+  lines.append('')
+  lines.append('%d passed, %d failed in %.1fs (%.1fs of scenario time)' % (
+    len(results) - len(failed), len(failed), wall, sum(result.seconds for result in results)
+  ))
+  return '\n'.join(lines)
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('-k', dest='match', help='only run scenarios whose module or name contains this')
+  parser.add_argument('--jobs', type=int, help='parallel scenarios (default: CPU count)')
+  parser.add_argument('--output', help='keep the SmartPy output in this directory')
+  parser.add_argument('--json', help='also write the results to this file')
+  args = parser.parse_args(argv)
+
+  scenarios = discover()
+  if args.match:
+    scenarios = [s for s in scenarios if args.match in s.module or args.match in s.name]
+  start = time.monotonic()
+  if args.output:
+    results = run(scenarios, args.output, args.jobs)
+  else:
+    with tempfile.TemporaryDirectory(prefix='tezid-scenarios-') as outdir:
+      results = run(scenarios, outdir, args.jobs)
+  print(report(results, time.monotonic() - start))
+  if args.json:
+    with open(args.json, 'w') as f:
+      json.dump([result._asdict() for result in results], f, indent=2)
+  return 0 if results and all(result.passed for result in results) else 1
+
+if __name__ == '__main__':
+  sys.exit(main())
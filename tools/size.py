@@ -0,0 +1,219 @@
+"""Script size report and budget check for the compile.py targets.
+
+Compiles the targets with tools/build.py (reusing its cache) and reports
+the binary size of each script and initial storage, with an approximate
+breakdown of the code: every entrypoint branch of the IF_LEFT dispatch,
+every private lambda (`checkAdmin`, `checkCost`, ...) and every onchain
+view. Whatever is left is dispatch and shared code.
+
+  python -m tools.size [--env mainnet.env] [--budget tools/size_budget.json] [--update [--headroom 0.05]]
+
+The budget file maps a target to limits on `script`, `storage` or any row
+of the report, e.g. {"controller": {"script": 12000, "registerProof": 900}}.
+The run exits non-zero when a limit is exceeded, and when the budget file
+is missing and no --max-script is given. --update sets the limits of the
+reported targets, their `script`, `storage` and every named row, to their
+current sizes plus --headroom (5% by default).
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+
+from tools import micheline
+from tools.build import ROOT, TARGETS, BuildError, build, read_profile
+
+BUDGET = os.path.join(os.path.dirname(__file__), 'size_budget.json')
+LAMBDA = re.compile(r'@sp\.private_lambda\([^)]*\)\s*def (\w+)\(.*?\):\n(.*?)(?=\n  @|\n  def |\Z)', re.S)
+STRING = re.compile(r'''(["'])(.+?)\1''')
+
+## Michelson
+#
+
+def prim(node, name=None):
+  return isinstance(node, dict) and 'prim' in node and (name is None or node['prim'] == name)
+
+def section(script, name):
+  return next(node for node in script if prim(node, name))
+
+def failures(node):
+  """Strings pushed right before a FAILWITH anywhere in `node`."""
+  found = []
+  if isinstance(node, list):
+    for before, instr in zip(node, node[1:]):
+      if prim(instr, 'FAILWITH') and prim(before, 'PUSH') and 'string' in before['args'][1]:
+        found.append(before['args'][1]['string'])
+    for instr in node:
+      found += failures(instr)
+  elif prim(node):
+    for arg in node.get('args', []):
+      found += failures(arg)
+  return found
+
+def entrypoint_tree(node, root=True):
+  """Entrypoint names of a parameter type, as nested (left, right) pairs."""
+  names = [a[1:] for a in node.get('annots', []) if a.startswith('%')]
+  if prim(node, 'or') and (root or not names):
+    return (entrypoint_tree(node['args'][0], False), entrypoint_tree(node['args'][1], False))
+  return names[0] if names else 'default'
+
+def leaves(tree):
+  return [tree] if isinstance(tree, str) else leaves(tree[0]) + leaves(tree[1])
+
+def first_if_left(code):
+  if prim(code, 'IF_LEFT'):
+    return code
+  if isinstance(code, list) and code and prim(code[0], 'IF_LEFT'):
+    return code[0]
+  return None
+
+def split_dispatch(tree, code, sizes):
+  """Attribute the branches of nested IF_LEFTs to the entrypoints of `tree`."""
+  if isinstance(tree, str):
+    sizes[tree] = micheline.size(code)
+    return
+  node = first_if_left(code)
+  if node is None:
+    sizes['|'.join(leaves(tree))] = micheline.size(code)
+    return
+  split_dispatch(tree[0], node['args'][0], sizes)
+  split_dispatch(tree[1], node['args'][1], sizes)
+
+## Report
+#
+
+def lambda_names(source):
+  """{FAILWITH message: private lambda name} from a contract source."""
+  names = {}
+  for name, body in LAMBDA.findall(source):
+    for _, message in STRING.findall(body):
+      names.setdefault(message, name)
+  return names
+
+def breakdown(script, names=None):
+  """[(label, bytes)] for the lambdas, entrypoints and views of `script`."""
+  names = names or {}
+  code = section(script, 'code')['args'][0]
+  rows = []
+  dispatch = None
+  for i, instr in enumerate(code):
+    if prim(instr, 'LAMBDA'):
+      messages = failures(instr)
+      name = next((names[m] for m in messages if m in names), None)
+      if name is None:
+        name = '#%d%s' % (i, ' (%s)' % messages[0] if messages else '')
+      rows.append(('lambda %s' % name, micheline.size(instr)))
+    elif prim(instr, 'IF_LEFT') and dispatch is None:
+      dispatch = instr
+  tree = entrypoint_tree(section(script, 'parameter')['args'][0])
+  sizes = {}
+  if isinstance(tree, str):
+    sizes[tree] = micheline.size(code) - sum(size for _, size in rows)
+  elif dispatch is not None:
+    split_dispatch(tree, dispatch, sizes)
+  rows += sorted(sizes.items())
+  for node in script:
+    if prim(node, 'view'):
+      rows.append(('view %s' % node['args'][0]['string'], micheline.size(node)))
+  return rows
+
+def analyse(target, outdir, root=ROOT):
+  code = glob.glob(os.path.join(outdir, target, '*_contract.json'))
+  storage = glob.glob(os.path.join(outdir, target, '*_storage.json'))
+  if not code or not storage:
+    raise BuildError('No compiled %s in %s' % (target, outdir))
+  with open(code[0]) as f:
+    script = json.load(f)
+  with open(storage[0]) as f:
+    initial = json.load(f)
+  names = {}
+  for path in TARGETS[target].sources if target in TARGETS else ():
+    with open(os.path.join(root, path)) as f:
+      names.update(lambda_names(f.read()))
+  rows = breakdown(script, names)
+  total = micheline.size(script)
+  rows.append(('dispatch and shared code', total - sum(size for _, size in rows)))
+  return {'script': total, 'storage': micheline.size(initial), 'rows': rows}
+
+def over_budget(target, result, budget):
+  limits = budget.get(target, {})
+  values = dict(result['rows'], script=result['script'], storage=result['storage'])
+  return ['%s %s: %d > %d bytes' % (target, label, values[label], limit)
+    for label, limit in sorted(limits.items()) if label in values and values[label] > limit]
+
+def load_budget(path, missing_ok=False):
+  """Limits in the budget file at `path`; a missing file is an error unless `missing_ok`."""
+  if not os.path.exists(path):
+    if missing_ok:
+      return {}
+    raise BuildError('No size budget at %s, write one with --update or give --max-script' % path)
+  with open(path) as f:
+    return json.load(f)
+
+def update_budget(budget, target, result, headroom=0.0):
+  """Set the limits of `target` to the sizes in `result` plus `headroom`, keeping limits on other rows."""
+  limit = lambda size: int(math.ceil(size * (1 + headroom)))
+  # Unnamed lambdas are labelled by position, which moves with any change
+  rows = {label: limit(size) for label, size in result['rows'] if '#' not in label}
+  budget.setdefault(target, {}).update(rows, script=limit(result['script']), storage=limit(result['storage']))
+
+def report(target, result):
+  lines = ['%s: script %d bytes, storage %d bytes' % (target, result['script'], result['storage'])]
+  width = max(len(label) for label, _ in result['rows'])
+  for label, size in sorted(result['rows'], key=lambda row: -row[1]):
+    lines.append('  %s  %6d  %5.1f%%' % (label.ljust(width), size, size * 100.0 / result['script']))
+  return '\n'.join(lines)
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--env', default=os.path.join(ROOT, 'mainnet.env'), help='network profile to compile with (default: %(default)s)')
+  parser.add_argument('--from', dest='outdir', help='read already compiled targets from this directory')
+  parser.add_argument('--target', action='append', choices=sorted(TARGETS), help='target to report (default: all)')
+  parser.add_argument('--budget', default=BUDGET, help='budget file (default: %(default)s)')
+  parser.add_argument('--max-script', type=int, help='script size limit for every target')
+  parser.add_argument('--update', action='store_true', help='set the budget of the targets to their current sizes')
+  parser.add_argument('--headroom', type=float, default=0.05, help='growth allowed above the current sizes by --update (default: %(default)s)')
+  args = parser.parse_args(argv)
+  targets = sorted(args.target or TARGETS)
+
+  try:
+    # Without limits nothing would be checked
+    budget = load_budget(args.budget, missing_ok=args.update or args.max_script is not None)
+  except BuildError as e:
+    print(e, file=sys.stderr)
+    return 1
+  if args.max_script is not None:
+    for target in targets:
+      budget.setdefault(target, {})['script'] = args.max_script
+
+  errors = []
+  with tempfile.TemporaryDirectory(prefix='tezid-size-') as tmp:
+    outdir = args.outdir
+    try:
+      if outdir is None:
+        outdir = tmp
+        build(outdir, targets, dict(os.environ, **read_profile(args.env)))
+      for target in targets:
+        result = analyse(target, outdir)
+        print(report(target, result))
+        if args.update:
+          update_budget(budget, target, result, args.headroom)
+        else:
+          errors += over_budget(target, result, budget)
+    except BuildError as e:
+      errors.append(str(e))
+  for error in errors:
+    print(error, file=sys.stderr)
+  if args.update and not errors:
+    with open(args.budget, 'w') as f:
+      json.dump(budget, f, indent=2, sort_keys=True)
+    print('Budget written to %s' % args.budget)
+  return 1 if errors else 0
+
+if __name__ == '__main__':
+  sys.exit(main())
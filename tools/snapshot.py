@@ -0,0 +1,49 @@
+"""Store snapshots as JSON lines, one identity per line.
+
+  {"address": "tz1...", "proofs": {"email": {"register_date": "2021-05-05T07:22:17Z", "verified": true, "meta": {}}}}
+
+Used by the population generator, the migration tool and the snapshot
+diff. Snapshots stream: neither reading nor writing holds more than one
+identity in memory.
+"""
+
+import json
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from tools.model import Proof
+
+Identity = namedtuple('Identity', ['address', 'proofs'])
+
+def iso(timestamp):
+  return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def seconds(text):
+  return int(datetime.strptime(text, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc).timestamp())
+
+def dumps(identity):
+  return json.dumps({'address': identity.address, 'proofs': {
+    prooftype: {'register_date': iso(proof.register_date), 'verified': proof.verified, 'meta': proof.meta}
+    for prooftype, proof in sorted(identity.proofs.items())
+  }}, sort_keys=True)
+
+def loads(line):
+  data = json.loads(line)
+  return Identity(data['address'], {
+    prooftype: Proof(seconds(proof['register_date']), proof['verified'], proof['meta'])
+    for prooftype, proof in data['proofs'].items()
+  })
+
+def read(path):
+  with open(path) as f:
+    for line in f:
+      if line.strip():
+        yield loads(line)
+
+def write(path, identities):
+  count = 0
+  with open(path, 'w') as f:
+    for identity in identities:
+      f.write(dumps(identity) + '\n')
+      count += 1
+  return count